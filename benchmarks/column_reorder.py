@@ -0,0 +1,87 @@
+#!/usr/bin/python
+"""Time syncdb.sync_modified_columns() on synthetic wide tables.
+
+usage: column_reorder.py [--widths=50,100,200,400,800,1600] [--moves=10]
+
+For every width a table of identical columns is built in memory (no
+database is needed) and a copy with --moves columns moved to random
+positions. The previous quadratic implementation is timed next to the
+current one, along with the number of MODIFY statements each emits.
+"""
+
+import sys
+import time
+import random
+import optparse
+
+from schemasync import syncdb
+
+from synthetic import make_columns
+
+
+def quadratic(from_cols, to_cols, sync_comments=False):
+    """The index/remove/insert implementation replaced by the
+       longest increasing subsequence one, kept for comparison.
+    """
+    from_names = [c for c in from_cols.keys() if c in to_cols]
+    to_names = [c for c in to_cols.keys() if c in from_cols]
+
+    for from_idx, name in enumerate(from_names):
+        to_idx = to_names.index(name)
+
+        if ((from_idx != to_idx) or
+                (to_cols[name] != from_cols[name]) or
+                (sync_comments and (from_cols[name].comment != to_cols[name].comment))):
+
+            if from_names.index(to_names[from_idx]) > to_idx:
+                name = to_names[from_idx]
+                from_names.remove(name)
+                from_names.insert(from_idx, name)
+            else:
+                to_names.remove(name)
+                to_names.insert(from_idx, name)
+
+            fprev = syncdb.get_previous_item(from_cols.keys(), name)
+            tprev = syncdb.get_previous_item(to_cols.keys(), name)
+            yield (from_cols[name].modify(after=fprev, with_comment=sync_comments),
+                   to_cols[name].modify(after=tprev, with_comment=sync_comments))
+
+
+def run(fn, from_cols, to_cols, rounds):
+    """Return (statements, seconds per round)"""
+    start = time.time()
+    for _ in range(rounds):
+        statements = len(list(fn(from_cols, to_cols)))
+    return statements, (time.time() - start) / rounds
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--widths", dest="widths", default="50,100,200,400,800,1600",
+                      help="comma separated column counts, default: 50,100,200,400,800,1600")
+    parser.add_option("--moves", dest="moves", type="int", default=10,
+                      help="number of columns moved in the target, default: 10")
+    parser.add_option("--rounds", dest="rounds", type="int", default=3,
+                      help="number of times to run each implementation, default: 3")
+    parser.add_option("--seed", dest="seed", type="int", default=1,
+                      help="random seed, default: 1")
+    options, args = parser.parse_args(sys.argv[1:])
+
+    random.seed(options.seed)
+    print("%-6s %12s %12s %12s %12s" % ("width", "old stmts", "old seconds",
+                                        "new stmts", "new seconds"))
+    for width in [int(w) for w in options.widths.split(',')]:
+        names = ['col_%d' % i for i in range(width)]
+        moved = names[:]
+        for _ in range(options.moves):
+            moved.insert(random.randrange(width), moved.pop(random.randrange(width)))
+
+        from_cols, to_cols = make_columns(names), make_columns(moved)
+        old = run(quadratic, from_cols, to_cols, options.rounds)
+        new = run(syncdb.sync_modified_columns, from_cols, to_cols, options.rounds)
+        print("%-6d %12d %12.4f %12d %12.4f" % ((width,) + old + new))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+"""Time the normalization of a large patch by PatchBuffer.save().
+
+usage: PYTHONPATH=schemasync patch_filters.py [--size=100] [--rounds=3]
+
+A patch of --size MB is built from the statements syncdb emits for a
+synthetic schema (see synthetic.py) with drifted tables, views, triggers
+and procedures, whose comments and routine bodies hold quoted strings
+and indented lines. The three whole-buffer regex passes the patch filters
+used to make are timed next to utils.normalize_patch(), along with the
+number of statements whose output differs.
+"""
+
+import sys
+import time
+import optparse
+
+from schemasync import snapshot, syncdb, utils
+
+import synthetic
+
+
+def three_pass(data):
+    """The REGEX_MULTI_SPACE, REGEX_DISTANT_SEMICOLIN and
+       REGEX_SEMICOLON_EXPLODE_TO_NEWLINE passes replaced by
+       utils.normalize_patch(), kept for comparison.
+    """
+    data = utils.REGEX_MULTI_SPACE.sub(' ', data)
+    data = utils.REGEX_DISTANT_SEMICOLIN.sub(';', data)
+    return utils.REGEX_SEMICOLON_EXPLODE_TO_NEWLINE.sub(";\n", data)
+
+
+def statements(seed):
+    """Return the patch statements of a drifted synthetic schema"""
+    source = synthetic.generate(tables=200, views=20, triggers=20, routines=20, seed=seed)
+    for i, proc in enumerate(source['database']['procedures']):
+        body = ("(IN p_id INT)\nBEGIN\n  -- keep the  alignment\n"
+                "  SELECT 'a;  b' AS `x`, p_id;\n  SELECT %d;\nEND" % i)
+        proc['raw_definition'] = body
+        proc['definition'] = body.replace('\n', ' ')
+    for table in source['database']['tables'][::10]:
+        table['columns'][-1]['comment'] = "note:  two spaces;  one semicolon"
+    target = synthetic.drift(source, 30, seed + 1)
+
+    fromdb = snapshot.SnapshotObject(source).selected
+    todb = snapshot.SnapshotObject(target).selected
+    options = dict(sync_auto_inc=False, sync_comments=True)
+    result = list(syncdb.sync_schema(fromdb, todb, options))
+    result.extend(syncdb.sync_views(fromdb, todb))
+    result.extend(syncdb.sync_triggers(fromdb, todb))
+    result.extend(syncdb.sync_procedures(fromdb, todb))
+    return [p for p, r in result if p]
+
+
+def build_patch(stmts, size):
+    """Return a patch of about size bytes repeating statements"""
+    chunk = ''.join(p + '\n' for p in stmts)
+    return chunk * max(1, size // len(chunk))
+
+
+def measure(fn, data, rounds):
+    """Return (result, list of seconds per round)"""
+    times = []
+    result = None
+    for _ in range(rounds):
+        start = time.time()
+        result = fn(data)
+        times.append(time.time() - start)
+    return result, times
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--size", dest="size", type="int", default=100,
+                      help="size of the patch in MB, default: 100")
+    parser.add_option("--rounds", dest="rounds", type="int", default=3,
+                      help="number of times to run each filter, default: 3")
+    options, args = parser.parse_args(sys.argv[1:])
+
+    stmts = statements(1)
+    data = build_patch(stmts, options.size * 1024 * 1024)
+    print("patch: %.1f MB, %d distinct statements" % (len(data) / 1048576.0, len(stmts)))
+
+    print("%-18s %12s %12s %10s" % ("filter", "best", "mean", "MB/s"))
+    for name, fn in (('three_pass', three_pass), ('normalize_patch', utils.normalize_patch)):
+        _, times = measure(fn, data, options.rounds)
+        print("%-18s %12.4f %12.4f %10.1f" % (name, min(times), sum(times) / len(times),
+                                              len(data) / 1048576.0 / min(times)))
+
+    differ = [p for p in stmts if three_pass(p + '\n') != utils.normalize_patch(p + '\n')]
+    print("outputs: %d of %d distinct statements differ (quoted strings, "
+          "comments and routine bodies left as is)" % (len(differ), len(stmts)))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
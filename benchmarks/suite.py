@@ -0,0 +1,147 @@
+#!/usr/bin/python
+"""Time the Schema Sync phases on synthetic schemas.
+
+usage: PYTHONPATH=schemasync suite.py [--tables=1000] [--columns=20]
+                                     [--drift=10] [--output=results.json]
+
+A source and a drifted target model are generated in memory (see
+synthetic.py, no database is needed). syncdb.sync_schema(), sync_views(),
+sync_triggers(), sync_procedures() and PatchBuffer.save() of the
+resulting patch are timed independently. The best and mean times of
+--rounds runs are printed and written to --output as JSON, to track
+regressions between versions.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import optparse
+
+import schemasync as app
+from schemasync import snapshot, syncdb, utils
+
+import synthetic
+
+
+def phases(source, target):
+    """Return a list of (phase name, function) timed by the suite"""
+    fromdb, todb = source.selected, target.selected
+    options = dict(sync_auto_inc=False, sync_comments=False)
+
+    def schema():
+        return list(syncdb.sync_schema(fromdb, todb, options))
+
+    def views():
+        return list(syncdb.sync_views(fromdb, todb))
+
+    def triggers():
+        return list(syncdb.sync_triggers(fromdb, todb))
+
+    def procedures():
+        return list(syncdb.sync_procedures(fromdb, todb))
+
+    return [('sync_schema', schema), ('sync_views', views),
+            ('sync_triggers', triggers), ('sync_procedures', procedures)]
+
+
+def save(statements, directory):
+    """Return a function writing statements with PatchBuffer.save()"""
+    ctx = dict(app_version=app.APPLICATION_VERSION, type="Patch Script",
+               server_version='8.0.32', apply_to='bench/bench',
+               created='')
+
+    def run():
+        buf = utils.PatchBuffer(name=os.path.join(directory, 'bench.patch.sql'),
+                                filters=app.PATCH_FILTERS, tpl=app.PATCH_TPL,
+                                ctx=dict(ctx), version_filename=False)
+        for patch, revert in statements:
+            buf.write(patch + '\n')
+        buf.save()
+        return statements
+    return run
+
+
+def measure(fn, rounds):
+    """Return (result, list of seconds per round)"""
+    times = []
+    for _ in range(rounds):
+        start = time.time()
+        result = fn()
+        times.append(time.time() - start)
+    return result, times
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--tables", dest="tables", type="int", default=1000,
+                      help="number of tables, default: 1000")
+    parser.add_option("--columns", dest="columns", type="int", default=20,
+                      help="columns per table, default: 20")
+    parser.add_option("--indexes", dest="indexes", type="int", default=3,
+                      help="secondary indexes per table, default: 3")
+    parser.add_option("--fks", dest="fks", type="int", default=1,
+                      help="foreign keys per table, default: 1")
+    parser.add_option("--views", dest="views", type="int", default=100,
+                      help="number of views, default: 100")
+    parser.add_option("--triggers", dest="triggers", type="int", default=50,
+                      help="number of triggers, default: 50")
+    parser.add_option("--routines", dest="routines", type="int", default=100,
+                      help="number of procedures, default: 100")
+    parser.add_option("--drift", dest="drift", type="float", default=10,
+                      help="percentage of objects changed in the target, default: 10")
+    parser.add_option("--rounds", dest="rounds", type="int", default=3,
+                      help="number of times to run each phase, default: 3")
+    parser.add_option("--seed", dest="seed", type="int", default=1,
+                      help="random seed, default: 1")
+    parser.add_option("--output", dest="output",
+                      help="write the results to this JSON file")
+    options, args = parser.parse_args(sys.argv[1:])
+
+    params = dict(tables=options.tables, columns=options.columns, indexes=options.indexes,
+                  fks=options.fks, views=options.views, triggers=options.triggers,
+                  routines=options.routines, seed=options.seed)
+    source_data = synthetic.generate(**params)
+    target_data = synthetic.drift(source_data, options.drift, options.seed + 1)
+    params.update(drift=options.drift, rounds=options.rounds)
+
+    results = {}
+    statements = []
+    print("%-16s %10s %12s %12s" % ("phase", "statements", "best", "mean"))
+    for name, fn in phases(snapshot.SnapshotObject(source_data),
+                           snapshot.SnapshotObject(target_data)):
+        result, times = measure(fn, options.rounds)
+        statements.extend(result)
+        results[name] = dict(statements=len(result), best=min(times),
+                             mean=sum(times) / len(times), times=times)
+        print("%-16s %10d %12.4f %12.4f" % (name, len(result), min(times), results[name]['mean']))
+
+    directory = tempfile.mkdtemp()
+    try:
+        result, times = measure(save(statements, directory), options.rounds)
+    finally:
+        shutil.rmtree(directory)
+    results['PatchBuffer.save'] = dict(statements=len(result), best=min(times),
+                                       mean=sum(times) / len(times), times=times)
+    print("%-16s %10d %12.4f %12.4f" % ('PatchBuffer.save', len(result), min(times),
+                                        results['PatchBuffer.save']['mean']))
+
+    if options.output:
+        report = dict(version=app.APPLICATION_VERSION, python=platform.python_version(),
+                      created=time.strftime('%Y-%m-%dT%H:%M:%S'), params=params,
+                      results=results)
+        fh = open(options.output, 'w')
+        try:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        finally:
+            fh.close()
+        print("Results written to %s" % options.output)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Synthetic schema models for the Schema Sync benchmarks.
+
+generate() builds the serialized model of a database (the snapshot
+format) of a configurable size, drift() returns a copy with a share of
+its objects changed. snapshot.SnapshotObject turns either into the
+in-memory model syncdb compares, no database is needed.
+"""
+
+import copy
+import random
+
+from schemaobject.collections import OrderedDict
+from schemaobject.column import ColumnSchema
+from schemasync import snapshot
+
+COLUMN_TYPES = ('int(11)', 'bigint(20) unsigned', 'varchar(64)', 'varchar(255)',
+                'datetime', 'decimal(10,2)', 'text', 'tinyint(1)')
+TABLE_OPTIONS = [['engine', 'ENGINE', 'InnoDB'],
+                 ['charset', 'CHARSET', 'utf8mb4'],
+                 ['collation', 'COLLATE', 'utf8mb4_general_ci'],
+                 ['row_format', 'ROW_FORMAT', 'Dynamic'],
+                 ['auto_increment', 'AUTO_INCREMENT', 1],
+                 ['create_options', None, ''],
+                 ['comment', 'COMMENT', '']]
+
+
+def make_column(name, position, type_, key='', extra=''):
+    text = type_ in ('text', 'varchar(64)', 'varchar(255)')
+    return {'name': name, 'ordinal_position': position, 'type': type_,
+            'charset': 'utf8mb4' if text else None,
+            'collation': 'utf8mb4_general_ci' if text else None,
+            'null': not key, 'key': key, 'default': None, 'extra': extra,
+            'comment': ''}
+
+
+def make_columns(names):
+    """Return an OrderedDict of identical int ColumnSchema Instances,
+       without a table
+    """
+    cols = OrderedDict()
+    for name in names:
+        col = ColumnSchema(name=name, parent=None)
+        col.field = name
+        col.type = 'int(11)'
+        col.null = False
+        col.default = None
+        col.extra = ''
+        col.comment = ''
+        col.charset = None
+        col.collation = None
+        cols[name] = col
+    return cols
+
+
+def make_index(table, name, fields, kind='INDEX'):
+    return {'name': name, 'table_name': table, 'non_unique': kind == 'INDEX',
+            'type': 'BTREE', 'kind': kind, 'collation': 'A', 'comment': '',
+            'fields': [[f, 0] for f in fields]}
+
+
+def make_table(name, columns, indexes, references, rand):
+    cols = [make_column('id', 1, 'int(11)', 'PRI', 'auto_increment')]
+    for i in range(1, columns):
+        cols.append(make_column('%s_c%d' % (name, i), i + 1, rand.choice(COLUMN_TYPES)))
+
+    idx = [make_index(name, 'PRIMARY', ['id'], 'PRIMARY')]
+    for i in range(min(indexes, columns - 1)):
+        idx.append(make_index(name, 'idx_%s_%d' % (name, i), [cols[i + 1]['name']]))
+
+    fks = []
+    for i, ref in enumerate(references):
+        column = 'fk_%s_%d' % (ref, i)
+        cols.append(make_column(column, len(cols) + 1, 'int(11)', 'MUL'))
+        idx.append(make_index(name, column, [column]))
+        fks.append({'name': column, 'symbol': column, 'table_schema': 'bench',
+                    'table_name': name, 'referenced_table_schema': 'bench',
+                    'referenced_table_name': ref, 'columns': [column],
+                    'referenced_columns': ['id'], 'match_option': None,
+                    'update_rule': 'CASCADE', 'delete_rule': 'RESTRICT'})
+
+    return {'name': name, 'create': create_sql(name, cols),
+            'options': copy.deepcopy(TABLE_OPTIONS),
+            'columns': cols, 'indexes': idx, 'foreign_keys': fks}
+
+
+def create_sql(name, columns):
+    return ("CREATE TABLE `%s` ( %s, PRIMARY KEY (`id`)) ENGINE=InnoDB "
+            "DEFAULT CHARSET=utf8mb4;" % (name, ", ".join("`%s` %s" % (c['name'], c['type'])
+                                                          for c in columns)))
+
+
+def generate(tables=100, columns=20, indexes=3, fks=1, views=10, triggers=5,
+             routines=10, seed=1):
+    """Return the serialized model of a synthetic database.
+
+        Args:
+            tables: Integer, number of tables
+            columns: Integer, columns per table (before foreign key columns)
+            indexes: Integer, secondary indexes per table
+            fks: Integer, foreign keys per table, referencing earlier tables
+            views: Integer, number of views, each joining two tables
+            triggers: Integer, number of triggers
+            routines: Integer, number of procedures
+            seed: Integer, random seed
+    """
+    rand = random.Random(seed)
+    names = ['t%05d' % i for i in range(tables)]
+    data_tables = []
+    for i, name in enumerate(names):
+        references = [names[rand.randrange(i)] for _ in range(fks)] if i else []
+        data_tables.append(make_table(name, columns, indexes, references, rand))
+
+    data_views = []
+    for i in range(views):
+        a, b = rand.choice(names), rand.choice(names)
+        data_views.append({'name': 'v%05d' % i,
+                           'definition': "select `bench`.`%s`.`id` AS `a_id`,`bench`.`%s`.`id` AS `b_id` "
+                                         "from (`bench`.`%s` join `bench`.`%s` on((`bench`.`%s`.`id` = "
+                                         "`bench`.`%s`.`id`)))" % (a, b, a, b, a, b)})
+
+    data_triggers = []
+    for i in range(triggers):
+        data_triggers.append({'name': 'trg%05d' % i, 'timing': 'BEFORE', 'event': 'INSERT',
+                              'table': names[i % len(names)],
+                              'statement': "SET NEW.id = NEW.id + %d" % i})
+
+    data_routines = []
+    for i in range(routines):
+        body = "(IN p_id INT)\nBEGIN\n  SELECT * FROM `%s` WHERE id = p_id;\nEND" % rand.choice(names)
+        data_routines.append({'name': 'proc%05d' % i, 'definition': body.replace('\n', ' '),
+                              'raw_definition': body})
+
+    return {'format': snapshot.SNAPSHOT_FORMAT,
+            'host': 'bench', 'port': 3306, 'user': 'bench', 'version': '8.0.32',
+            'database': {'name': 'bench',
+                         'options': [['charset', 'CHARACTER SET', 'utf8mb4'],
+                                     ['collation', 'COLLATE', 'utf8mb4_general_ci']],
+                         'tables': data_tables, 'views': data_views,
+                         'triggers': data_triggers, 'procedures': data_routines}}
+
+
+def drift(data, percent=10, seed=2):
+    """Return a copy of a serialized model with percent % of its tables,
+       views, triggers and procedures changed: columns modified, added,
+       dropped and moved, indexes dropped, tables and objects dropped.
+    """
+    rand = random.Random(seed)
+    data = copy.deepcopy(data)
+    db = data['database']
+
+    def sample(items):
+        return rand.sample(range(len(items)), int(len(items) * percent / 100.0))
+
+    dropped = set()
+    for i in sample(db['tables']):
+        table = db['tables'][i]
+        cols = table['columns']
+        change = rand.randrange(6)
+        if change == 0 and len(cols) > 2:
+            cols[-1]['type'] = 'bigint(20)'
+        elif change == 1:
+            cols.append(make_column('added', len(cols) + 1, 'int(11)'))
+        elif change == 2 and len(cols) > 3 and not cols[-1]['key']:
+            cols.pop()
+        elif change == 3 and len(cols) > 3:
+            cols.insert(1, cols.pop(rand.randrange(2, len(cols))))
+        elif change == 4 and len(table['indexes']) > 1:
+            table['indexes'].pop()
+        else:
+            dropped.add(i)
+    db['tables'] = [t for i, t in enumerate(db['tables']) if i not in dropped]
+
+    for i in sample(db['views']):
+        db['views'][i]['definition'] = 'select 1 AS `one`'
+    for i in sample(db['triggers']):
+        db['triggers'][i]['statement'] = 'SET NEW.id = NEW.id'
+    for i in sample(db['procedures']):
+        db['procedures'][i]['raw_definition'] = '()\nBEGIN\nEND'
+        db['procedures'][i]['definition'] = '() BEGIN END'
+
+    return data
@@ -0,0 +1,163 @@
+"""Migration cost estimates for Schema Sync
+
+The sizes of the target tables (TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH) are
+read with one information_schema query. Every ALTER TABLE planned by the
+planner is then given an estimate of the bytes it rewrites:
+
+    table rebuild (INPLACE rebuild or COPY): data and indexes
+    secondary index build without rebuild: the data, which is scanned
+    anything else (metadata changes): nothing
+
+and a duration at a configurable rewrite rate. ALTER TABLE statements
+over the --max-rebuild-bytes budget are moved out of the patch into
+separate over budget scripts.
+"""
+
+from planner import INSTANT
+
+SQL_TABLE_SIZES = """
+    SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH
+    FROM information_schema.`TABLES`
+    WHERE TABLE_SCHEMA = %s
+    AND TABLE_TYPE = 'BASE TABLE'
+    """
+
+INDEX_BUILDS = ("ADD INDEX ", "ADD UNIQUE ", "ADD FULLTEXT ", "ADD SPATIAL ")
+
+MB = 1024 * 1024
+
+
+def format_bytes(n):
+    """Return a human readable size"""
+    if n is None:
+        return "?"
+    if n < 1024:
+        return "%d B" % n
+    for unit in ('KB', 'MB', 'GB', 'TB'):
+        n /= 1024.0
+        if n < 1024 or unit == 'TB':
+            return "%.1f %s" % (n, unit)
+
+
+class TableSize(object):
+    """The size of a table as reported by information_schema.TABLES"""
+
+    def __init__(self, rows, data_length, index_length):
+        self.rows = int(rows or 0)
+        self.data_length = int(data_length or 0)
+        self.index_length = int(index_length or 0)
+
+    @property
+    def total(self):
+        return self.data_length + self.index_length
+
+
+def table_sizes(instance):
+    """Return a dictionary of table name => TableSize for the selected
+       database of a SchemaObject, read with one query.
+
+       Snapshots have no sizes, an empty dictionary is returned.
+    """
+    if instance.connection is None:
+        return {}
+
+    rows = instance.connection.execute(SQL_TABLE_SIZES, (instance.selected.name,))
+    return dict((row['TABLE_NAME'], TableSize(row['TABLE_ROWS'], row['DATA_LENGTH'],
+                                              row['INDEX_LENGTH']))
+                for row in rows or [])
+
+
+class Estimate(object):
+    """The estimated cost of an ALTER TABLE statement.
+
+        Attributes:
+            plan: the planner.Plan of the statement
+            size: the TableSize of the table, None if unknown
+            bytes: Integer, estimated bytes rewritten (None if unknown)
+            seconds: Float, estimated duration (None if unknown)
+            over_budget: Bool, is bytes over the --max-rebuild-bytes budget?
+            online: Bool, is the table migrated online with a shadow table?
+    """
+
+    def __init__(self, plan, size, rate, max_bytes=None):
+        self.plan = plan
+        self.size = size
+
+        if plan.algorithm == INSTANT:
+            self.bytes = 0
+        elif size is None:
+            self.bytes = None
+        elif plan.rebuild:
+            self.bytes = size.total
+        elif any(c.sql.startswith(INDEX_BUILDS) for c in plan.clauses):
+            self.bytes = size.data_length
+        else:
+            self.bytes = 0
+
+        self.seconds = None if self.bytes is None else self.bytes / (rate * MB)
+        self.over_budget = (max_bytes is not None and self.bytes is not None
+                            and self.bytes > max_bytes)
+        self.online = False
+
+
+class CostEstimator(object):
+    """Estimates the cost of the planned ALTER TABLE statements.
+
+        Attributes:
+            sizes: dictionary of table name => TableSize
+            rate: Float, the rewrite rate in MB/s
+            max_bytes: Integer, the --max-rebuild-bytes budget or None
+            estimates: list of Estimate, in the order of the patch
+    """
+
+    def __init__(self, sizes, rate=50.0, max_bytes=None):
+        self.sizes = sizes
+        self.rate = rate
+        self.max_bytes = max_bytes
+        self.estimates = []
+
+    def estimate(self, plan):
+        """Estimate and record the cost of a planner.Plan"""
+        est = Estimate(plan, self.sizes.get(plan.table), self.rate, self.max_bytes)
+        self.estimates.append(est)
+        return est
+
+    def report(self):
+        """Return the cost report as a list of lines"""
+        lines = ["%-32s %12s %10s %-8s %-8s %10s %10s"
+                 % ("table", "rows", "size", "algo", "rebuild", "rewrite", "seconds")]
+        total_bytes = 0
+        total_seconds = 0.0
+        for est in self.estimates:
+            rows = est.size.rows if est.size else "?"
+            size = format_bytes(est.size.total if est.size else None)
+            seconds = "?" if est.seconds is None else "%.1f" % est.seconds
+            line = ("%-32s %12s %10s %-8s %-8s %10s %10s"
+                    % ("`%s`" % est.plan.table, rows, size, est.plan.algorithm,
+                       "yes" if est.plan.rebuild else "no",
+                       format_bytes(est.bytes), seconds))
+            if est.over_budget:
+                line += "  OVER BUDGET"
+            else:
+                total_bytes += est.bytes or 0
+                total_seconds += est.seconds or 0
+            if est.online:
+                line += "  ONLINE"
+            lines.append(line)
+
+        lines.append("")
+        lines.append("%d tables altered, %s rewritten, estimated %.1fs at %g MB/s"
+                     % (len(self.estimates) - len(self.over_budget()),
+                        format_bytes(total_bytes), total_seconds, self.rate))
+        unknown = [e for e in self.estimates if e.bytes is None]
+        if unknown:
+            lines.append("%d tables of unknown size (not included)" % len(unknown))
+        if self.max_bytes is not None:
+            lines.append("%d tables over the %s budget (--max-rebuild-bytes=%d)"
+                         % (len(self.over_budget()), format_bytes(self.max_bytes),
+                            self.max_bytes))
+        return lines
+
+    def over_budget(self):
+        """Return the estimates over the budget"""
+        return [e for e in self.estimates if e.over_budget]
@@ -0,0 +1,183 @@
+"""Dependency ordered, parallel patch plans
+
+The statements of a patch are written in a fixed, serial order: database
+options, tables, views, triggers, then procedures. A statement only has to
+follow the earlier statements on the objects it is related to:
+
+    tables: the tables they reference with foreign keys (and the tables
+            referencing them). Concurrent DDL on tables linked by a foreign
+            key waits on the metadata locks of the other table.
+    views: the tables and views their definition selects from
+    triggers: the table they are defined on
+    same object: every earlier statement on the object
+
+ALTER DATABASE and statements which can not be classified are barriers,
+they follow every earlier statement and precede every later one.
+
+Statements are grouped into waves: a wave only depends on the waves
+before it, the statements of a wave are independent and can be executed
+concurrently.
+"""
+
+import re
+import json
+
+DATABASE = 'database'
+TABLE = 'table'
+VIEW = 'view'
+TRIGGER = 'trigger'
+PROCEDURE = 'procedure'
+
+NAME = r"`(?P<name>(?:[^`]|``)+)`"
+
+REGEX_OBJECTS = (
+    (DATABASE, re.compile(r"^ALTER DATABASE " + NAME)),
+    (TABLE, re.compile(r"^(?:CREATE|ALTER|DROP) TABLE " + NAME)),
+    (VIEW, re.compile(r"^(?:CREATE|ALTER|DROP) VIEW " + NAME)),
+    (TRIGGER, re.compile(r"^(?:DELIMITER ;; )?(?:CREATE|DROP) TRIGGER " + NAME)),
+    (PROCEDURE, re.compile(r"^(?:DELIMITER ;; )?(?:CREATE|DROP) PROCEDURE " + NAME)),
+)
+
+REGEX_IDENTIFIER = re.compile(r"`((?:[^`]|``)+)`")
+
+
+def statement_object(statement):
+    """Return the (kind, name) of the object changed by a statement,
+       None if the statement can not be classified.
+    """
+    for kind, regex in REGEX_OBJECTS:
+        m = regex.match(statement.lstrip())
+        if m:
+            return kind, m.group('name').replace('``', '`')
+    return None
+
+
+def object_dependencies(*databases):
+    """Return a dictionary of (kind, name) => set of the (kind, name) of
+       the objects it depends on, in any of the given databases.
+    """
+    deps = {}
+    for db in databases:
+        relations = set(db.tables) | set(db.views)
+        for t in db.tables:
+            refs = deps.setdefault((TABLE, t), set())
+            for fk in db.tables[t].foreign_keys:
+                ref = db.tables[t].foreign_keys[fk].referenced_table_name
+                if ref != t:
+                    refs.add((TABLE, ref))
+
+        for v in db.views:
+            refs = deps.setdefault((VIEW, v), set())
+            for name in REGEX_IDENTIFIER.findall(db.views[v].definition or ''):
+                name = name.replace('``', '`')
+                if name in relations and name != v:
+                    refs.add((VIEW if name in db.views else TABLE, name))
+
+        for t in db.triggers:
+            deps.setdefault((TRIGGER, t), set()).add((TABLE, db.triggers[t].table))
+
+    return deps
+
+
+class Node(object):
+    """A (patch, revert) statement of the plan.
+
+        Attributes:
+            index: Integer, the position of the statement in the serial patch
+            patch: String, the patch statement
+            revert: String, the revert statement
+            object: tuple (kind, name) or None
+            depends: set of the indexes of the statements it follows
+            wave: Integer, the wave of the statement
+    """
+
+    def __init__(self, index, patch, revert):
+        self.index = index
+        self.patch = patch
+        self.revert = revert
+        self.object = statement_object(patch)
+        self.depends = set()
+        self.wave = 0
+
+    @property
+    def barrier(self):
+        return self.object is None or self.object[0] == DATABASE
+
+
+def build_graph(statements, fromdb, todb):
+    """Return the Nodes of a list of (patch, revert) statements, in order,
+       with their dependencies and waves.
+
+        Args:
+            statements: list of (patch, revert), in the serial patch order
+            fromdb: the source SchemaObject DatabaseSchema Instance
+            todb: the target SchemaObject DatabaseSchema Instance
+    """
+    deps = object_dependencies(fromdb, todb)
+    related = {}
+    for key, refs in deps.items():
+        related.setdefault(key, set()).update(refs)
+        for ref in refs:
+            related.setdefault(ref, set()).add(key)
+
+    nodes = []
+    last = {}
+    barrier = None
+    since_barrier = []
+    for i, (patch, revert) in enumerate(statements):
+        node = Node(i, patch, revert)
+        if node.barrier:
+            node.depends.update(since_barrier)
+            if barrier is not None:
+                node.depends.add(barrier)
+            barrier = node.index
+            since_barrier = []
+            last = {}
+        else:
+            for key in related.get(node.object, set()) | set([node.object]):
+                if key in last:
+                    node.depends.add(last[key])
+            if barrier is not None:
+                node.depends.add(barrier)
+            last[node.object] = node.index
+            since_barrier.append(node.index)
+
+        node.wave = max([nodes[d].wave + 1 for d in node.depends] or [0])
+        nodes.append(node)
+
+    return nodes
+
+
+def waves(nodes):
+    """Group Nodes into a list of waves, each a list of Nodes"""
+    grouped = []
+    for node in nodes:
+        while len(grouped) <= node.wave:
+            grouped.append([])
+        grouped[node.wave].append(node)
+    return grouped
+
+
+def write_plan(filename, nodes, database):
+    """Write the waves of a plan to a JSON file.
+
+        Args:
+            filename: String, the plan file
+            nodes: list of Nodes returned by build_graph
+            database: String, the target database name
+    """
+    plan = dict(database=database, statements=len(nodes), waves=[])
+    for wave in waves(nodes):
+        plan['waves'].append([dict(index=n.index,
+                                   object=list(n.object) if n.object else None,
+                                   depends=sorted(n.depends),
+                                   patch=n.patch,
+                                   revert=n.revert)
+                              for n in wave])
+
+    fh = open(filename, 'w')
+    try:
+        json.dump(plan, fh, indent=2)
+        fh.write('\n')
+    finally:
+        fh.close()
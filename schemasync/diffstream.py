@@ -0,0 +1,276 @@
+"""Structured diff records, streamed as NDJSON
+
+syncdb generates the statements of the migration scripts, grouping the
+changes of a table into a single ALTER TABLE. records() walks the same
+comparisons and yields a record per change instead:
+
+    {"kind": "column", "table": "rental", "name": "staff_id",
+     "change": "create", "before": null,
+     "after": "`staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`",
+     "patch": "ALTER TABLE `rental` ADD COLUMN ...;",
+     "revert": "ALTER TABLE `rental` DROP COLUMN `staff_id`;"}
+
+    kind: database_option, table, column, index, foreign_key,
+          table_option, view, trigger or procedure
+    table: the table of a column, index, foreign key, table option or
+           trigger, null otherwise
+    change: create, drop or modify
+    before, after: the definition in the target (before the patch) and
+                   in the source (after the patch), null if absent.
+                   A column definition ends with its position.
+    patch, revert: the statements of this change alone
+
+The records are produced lazily and write() flushes each line as soon as
+it is generated, so a consumer can process the diff while it runs.
+"""
+
+import json
+
+from collections import OrderedDict
+
+import syncdb
+from utils import REGEX_TABLE_AUTO_INC, REGEX_TABLE_COMMENT
+
+
+def record(kind, change, name, table=None, before=None, after=None,
+           patch='', revert=''):
+    """Return a diff record (an OrderedDict, serialized in this order)"""
+    return OrderedDict([('kind', kind), ('table', table), ('name', name),
+                        ('change', change), ('before', before), ('after', after),
+                        ('patch', patch), ('revert', revert)])
+
+
+def records(fromdb, todb, options):
+    """Yield a record for every change needed to migrate todb to fromdb,
+       in the order of the migration scripts.
+
+    Args:
+        fromdb: A SchemaObject Schema Instance.
+        todb: A SchemaObject Schema Instance.
+        options: dictionary of options, as for syncdb.sync_schema()
+            sync_auto_inc, sync_comments, skip_tables, table_digests
+    """
+    for r in database_option_records(fromdb, todb):
+        yield r
+
+    for r in table_list_records(fromdb.tables, todb.tables, options):
+        yield r
+
+    skip_tables = options.get('skip_tables') or ()
+    from_digests, to_digests = options.get('table_digests') or ({}, {})
+
+    for t in fromdb.tables:
+        if t not in todb.tables or t in skip_tables:
+            continue
+
+        if t in from_digests and from_digests[t] == to_digests.get(t):
+            continue
+
+        for r in table_records(fromdb.tables[t], todb.tables[t], options):
+            yield r
+
+    for r in object_records('view', fromdb.views, todb.views):
+        yield r
+
+    for r in object_records('trigger', fromdb.triggers, todb.triggers):
+        yield r
+
+    for r in object_records('procedure', fromdb.procedures, todb.procedures):
+        yield r
+
+
+def database_option_records(fromdb, todb):
+    """Yield the records of the changed database options"""
+    for opt in fromdb.options:
+        if fromdb.options[opt] != todb.options[opt]:
+            p, r = fromdb.options[opt].create(), todb.options[opt].create()
+            yield record('database_option', 'modify', opt, before=r, after=p,
+                         patch="%s %s;" % (todb.alter(), p),
+                         revert="%s %s;" % (todb.alter(), r))
+
+
+def object_diff(kind, name, fromdb, todb, options):
+    """Return the records of a single table, view, trigger or routine
+       (objectfilter.KINDS), as records() would yield them.
+    """
+    if kind == 'table':
+        src, dest = only(name, fromdb.tables), only(name, todb.tables)
+        if src and dest:
+            return list(table_records(src[name], dest[name], options))
+        return list(table_list_records(src, dest, options))
+
+    attr, record_kind = {'view': ('views', 'view'),
+                         'trigger': ('triggers', 'trigger'),
+                         'routine': ('procedures', 'procedure')}[kind]
+    return list(object_records(record_kind, only(name, getattr(fromdb, attr)),
+                               only(name, getattr(todb, attr))))
+
+
+def only(name, objects):
+    """Return a dictionary of the object of objects named name, if any"""
+    return {name: objects[name]} if name in objects else {}
+
+
+def table_list_records(from_tables, to_tables, options):
+    """Yield the records of the created and dropped tables"""
+    for t in from_tables:
+        if t not in to_tables:
+            sql = table_sql(from_tables[t].create(), options)
+            yield record('table', 'create', t, after=sql,
+                         patch=sql, revert=from_tables[t].drop())
+
+    for t in to_tables:
+        if t not in from_tables:
+            sql = table_sql(to_tables[t].create(), options)
+            yield record('table', 'drop', t, before=sql,
+                         patch=to_tables[t].drop(), revert=sql)
+
+
+def table_records(from_table, to_table, options):
+    """Yield a record for every change of the columns, indexes, foreign
+       keys and options of a table, in the order of syncdb.sync_table().
+    """
+    t = to_table.name
+    sync_comments = options['sync_comments']
+
+    def alter(sql):
+        return "%s %s;" % (to_table.alter(), sql)
+
+    from_cols = from_table.columns
+    to_cols = to_table.columns
+    from_prev = syncdb.get_previous_items(from_cols.keys())
+    to_prev = syncdb.get_previous_items(to_cols.keys())
+
+    for c in from_cols:
+        if c not in to_cols:
+            yield record('column', 'create', c, t,
+                         after=from_cols[c].define(after=from_prev[c], with_comment=sync_comments),
+                         patch=alter(from_cols[c].create(after=from_prev[c],
+                                                         with_comment=sync_comments)),
+                         revert=alter(from_cols[c].drop()))
+
+    for c in to_cols:
+        if c not in from_cols:
+            yield record('column', 'drop', c, t,
+                         before=to_cols[c].define(after=to_prev[c], with_comment=sync_comments),
+                         patch=alter(to_cols[c].drop()),
+                         revert=alter(to_cols[c].create(after=to_prev[c],
+                                                        with_comment=sync_comments)))
+
+    for c in syncdb.modified_columns(from_cols, to_cols, sync_comments):
+        yield record('column', 'modify', c, t,
+                     before=to_cols[c].define(after=to_prev[c], with_comment=sync_comments),
+                     after=from_cols[c].define(after=from_prev[c], with_comment=sync_comments),
+                     patch=alter(from_cols[c].modify(after=from_prev[c],
+                                                     with_comment=sync_comments)),
+                     revert=alter(to_cols[c].modify(after=to_prev[c],
+                                                    with_comment=sync_comments)))
+
+    # same order as the ALTER TABLE: indexes are dropped after the foreign keys
+    indexes = constraint_records('index', t, from_table.indexes, to_table.indexes, alter)
+    foreign_keys = constraint_records('foreign_key', t, from_table.foreign_keys,
+                                      to_table.foreign_keys, alter)
+    for r in indexes['create'] + indexes['modify']:
+        yield r
+    for r in foreign_keys['create'] + foreign_keys['modify'] + foreign_keys['drop']:
+        yield r
+    for r in indexes['drop']:
+        yield r
+
+    for opt in from_table.options:
+        if ((opt == 'auto_increment' and not options['sync_auto_inc']) or
+                (opt == 'comment' and not sync_comments)):
+            continue
+
+        if from_table.options[opt] != to_table.options[opt]:
+            p, r = from_table.options[opt].create(), to_table.options[opt].create()
+            yield record('table_option', 'modify', opt, t, before=r, after=p,
+                         patch=alter(p), revert=alter(r))
+
+
+def constraint_records(kind, table, src, dest, alter):
+    """Return the records of the created, modified and dropped indexes or
+       foreign keys of a table, a dictionary of change => list of records.
+       A constraint is modified by dropping and re-adding it.
+    """
+    changes = {'create': [], 'modify': [], 'drop': []}
+    for c in src:
+        if c not in dest:
+            changes['create'].append(record(kind, 'create', c, table,
+                                            after=definition(src[c]),
+                                            patch=alter(src[c].create()),
+                                            revert=alter(src[c].drop())))
+        elif src[c] != dest[c]:
+            changes['modify'].append(record(kind, 'modify', c, table,
+                                            before=definition(dest[c]),
+                                            after=definition(src[c]),
+                                            patch=alter("%s, %s" % (dest[c].drop(), src[c].create())),
+                                            revert=alter("%s, %s" % (dest[c].drop(), dest[c].create()))))
+    for c in dest:
+        if c not in src:
+            changes['drop'].append(record(kind, 'drop', c, table,
+                                          before=definition(dest[c]),
+                                          patch=alter(dest[c].drop()),
+                                          revert=alter(dest[c].create())))
+    return changes
+
+
+def object_records(kind, src, dest):
+    """Yield the records of the created, dropped and modified views,
+       triggers or procedures, in the order of syncdb.
+    """
+    def table(obj):
+        return getattr(obj, 'table', None) if kind == 'trigger' else None
+
+    for name in src:
+        if name not in dest:
+            yield record(kind, 'create', name, table(src[name]), after=src[name].define(),
+                         patch=src[name].create(), revert=src[name].drop())
+
+    for name in dest:
+        if name not in src:
+            yield record(kind, 'drop', name, table(dest[name]), before=dest[name].define(),
+                         patch=dest[name].drop(), revert=dest[name].create())
+
+    for name in src:
+        if name in dest and src[name] != dest[name]:
+            if kind == 'view':
+                patch, revert = src[name].modify(), dest[name].modify()
+            else:
+                patch = "%s\n%s" % (dest[name].drop(), src[name].create())
+                revert = "%s\n%s" % (src[name].drop(), dest[name].create())
+            yield record(kind, 'modify', name, table(src[name]),
+                         before=dest[name].define(), after=src[name].define(),
+                         patch=patch, revert=revert)
+
+
+def definition(constraint):
+    """Return the definition of an index or foreign key"""
+    sql = constraint.create()
+    return sql[4:] if sql.startswith('ADD ') else sql
+
+
+def table_sql(sql, options):
+    """Remove AUTO_INCREMENT and COMMENT from a CREATE TABLE statement
+       unless they are synced, as syncdb.sync_created_tables() does.
+    """
+    if not options['sync_auto_inc']:
+        sql = REGEX_TABLE_AUTO_INC.sub('', sql)
+    if not options['sync_comments']:
+        sql = REGEX_TABLE_COMMENT.sub('', sql)
+    return sql
+
+
+def write(fh, fromdb, todb, options):
+    """Write the records of a diff to a file object as NDJSON, one line
+       per record, flushed as it is generated.
+
+        Returns:
+            the number of records written
+    """
+    count = 0
+    for r in records(fromdb, todb, options):
+        fh.write(json.dumps(r) + '\n')
+        fh.flush()
+        count += 1
+    return count
@@ -0,0 +1,121 @@
+"""Drift clusters of a multi-target Schema Sync run
+
+When one source is synced to many near-identical shards, most targets
+drift from the source in exactly the same way. The diff of each target,
+the ordered (patch, revert) statements syncdb generates, is canonicalized
+(whitespace outside of quoted strings, identifiers and routine bodies
+collapsed, as in the patch scripts) and hashed with the database name:
+targets with the same hash form a drift cluster.
+
+A single patch and revert script is written per cluster, from the diff
+of the first target of the cluster, once every target is synced: the
+script header lists all of the targets of the cluster. A manifest maps
+each cluster to its scripts and targets:
+
+    {"clusters": [{"name": "drift-3f0a9c12", "digest": "3f0a9c12...",
+                   "database": "sakila", "statements": 2,
+                   "patch": "...", "revert": "...",
+                   "targets": ["mysql://shard1/sakila", ...]}],
+     "in_sync": [...], "failed": [...]}
+"""
+
+import json
+import hashlib
+import threading
+
+from schemaobject.collections import OrderedDict
+
+from utils import normalize_patch
+
+
+def canonical(statements):
+    """Return the canonical form of a list of (patch, revert) tuples"""
+    return [[normalize_patch(statement).strip() for statement in pair]
+            for pair in statements]
+
+
+def digest(database, statements):
+    """Return the SHA1 of a diff, the database name and its canonical
+       statements in order.
+    """
+    data = json.dumps([database, canonical(statements)], separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class Cluster(object):
+    """The targets sharing the same drift from the source.
+
+        Attributes:
+            digest: String, the digest() of the drift
+            name: String, drift-<first 8 characters of the digest>
+            database: String, the database name of the targets
+            statements: Integer, number of (patch, revert) statements
+            targets: list of the target urls
+            patch, revert: String, the scripts written for the cluster,
+                           None until they are written
+            buffers: tuple of the patch and revert utils.PatchBuffers of
+                     the first target, None until its diff is done
+    """
+
+    def __init__(self, digest, database, statements):
+        self.digest = digest
+        self.name = "drift-%s" % digest[:8]
+        self.database = database
+        self.statements = statements
+        self.targets = []
+        self.patch = None
+        self.revert = None
+        self.buffers = None
+
+
+class DriftClusters(object):
+    """Groups the targets of a run by their drift, thread safe."""
+
+    def __init__(self):
+        self.clusters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, target, database, statements):
+        """Add a drifted target.
+
+            Args:
+                target: string, the target url
+                database: string, the target database name
+                statements: list of the (patch, revert) tuples of its diff
+
+            Returns:
+                tuple (Cluster, Bool), the cluster of the target and whether
+                the target is the first of its cluster, which writes
+                the scripts.
+        """
+        key = digest(database, statements)
+        with self._lock:
+            first = key not in self.clusters
+            if first:
+                self.clusters[key] = Cluster(key, database, len(statements))
+            cluster = self.clusters[key]
+            cluster.targets.append(target)
+        return cluster, first
+
+    def manifest(self, in_sync=(), failed=()):
+        """Return the manifest of the clusters, the largest first"""
+        clusters = sorted(self.clusters.values(),
+                          key=lambda c: (-len(c.targets), c.name))
+        return {'clusters': [{'name': c.name,
+                              'digest': c.digest,
+                              'database': c.database,
+                              'statements': c.statements,
+                              'patch': c.patch,
+                              'revert': c.revert,
+                              'targets': sorted(c.targets)} for c in clusters],
+                'in_sync': sorted(in_sync),
+                'failed': sorted(failed)}
+
+    def write_manifest(self, filename, in_sync=(), failed=()):
+        """Write the manifest to a JSON file"""
+        fh = open(filename, 'w')
+        try:
+            json.dump(self.manifest(in_sync, failed), fh, indent=2)
+            fh.write('\n')
+        finally:
+            fh.close()
@@ -0,0 +1,382 @@
+"""Table fingerprints for incremental Schema Sync runs
+
+A table fingerprint is the pair (markers, hash):
+    markers: CREATE_TIME, UPDATE_TIME and the table digest (see below)
+             of the table, read for every table with one
+             information_schema query.
+    hash: MD5 of the table's SHOW CREATE TABLE statement
+          (AUTO_INCREMENT removed unless it is synced).
+
+The hash of a table is only recomputed when its markers changed since the
+previous run, so the markers must change with everything the hash covers.
+The digest does: an added, dropped, renamed or modified column (type,
+nullability, default, extra, collation, comment), an added, dropped or
+changed index or foreign key and the table options all change it, even
+when an INSTANT or INPLACE ALTER leaves CREATE_TIME alone. Generated
+column expressions, index comments and partitioning are not part of it.
+On MySQL 8.0 the information_schema table statistics are cached for
+information_schema_stats_expiry seconds (a day by default), the cache is
+disabled for the session before the markers are read.
+
+A table is not compared again if it was in sync during the previous run
+and the hashes on both sides are unchanged.
+
+A table digest is a canonical MD5 of everything syncdb.sync_table()
+compares (columns, indexes, foreign keys and table options). Tables with
+identical digests on both sides are in sync and are not compared.
+
+A schema checksum is an MD5 of the database options, the table digests
+and the view, trigger and routine definitions, computed by the server
+with one aggregate query. Two databases with the same checksum are in
+sync and need not be loaded at all.
+"""
+
+import re
+import os
+import json
+import hashlib
+
+from utils import REGEX_TABLE_AUTO_INC, REGEX_TABLE_COMMENT, compare_version
+
+REGEX_ALTER_TABLE = re.compile(r"^ALTER TABLE `(?P<name>(?:[^`]|``)+)`")
+
+SQL_GROUP_CONCAT_MAX_LEN = "SET SESSION group_concat_max_len = 67108864"
+
+SQL_STATS_EXPIRY = "SET SESSION information_schema_stats_expiry = 0"
+
+# QUOTE() keeps NULL and '' apart and escapes the separators
+SQL_TABLE_DIGESTS = """
+    SELECT T.TABLE_NAME,
+           MD5(CONCAT_WS('|', QUOTE(T.ENGINE), QUOTE(T.ROW_FORMAT),
+                         QUOTE(T.TABLE_COLLATION), QUOTE(T.CREATE_OPTIONS),
+                         IF(%(sync_auto_inc)s, QUOTE(T.AUTO_INCREMENT), ''),
+                         IF(%(sync_comments)s, QUOTE(T.TABLE_COMMENT), ''),
+                         IFNULL(C.COLS, ''), IFNULL(S.IDX, ''), IFNULL(F.FKS, ''))) AS DIGEST
+    FROM information_schema.`TABLES` T
+    LEFT JOIN (
+        SELECT TABLE_NAME,
+               GROUP_CONCAT(CONCAT_WS(',', QUOTE(COLUMN_NAME), QUOTE(COLUMN_TYPE),
+                                      QUOTE(IS_NULLABLE), QUOTE(COLUMN_DEFAULT),
+                                      QUOTE(EXTRA), QUOTE(COLLATION_NAME),
+                                      IF(%(sync_comments)s, QUOTE(COLUMN_COMMENT), ''))
+                            ORDER BY ORDINAL_POSITION SEPARATOR ';') AS COLS
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = %(db)s
+        GROUP BY TABLE_NAME
+    ) C ON C.TABLE_NAME = T.TABLE_NAME
+    LEFT JOIN (
+        SELECT TABLE_NAME,
+               GROUP_CONCAT(CONCAT_WS(',', QUOTE(INDEX_NAME), NON_UNIQUE, SEQ_IN_INDEX,
+                                      QUOTE(COLUMN_NAME), QUOTE(SUB_PART),
+                                      QUOTE(INDEX_TYPE), QUOTE(COLLATION))
+                            ORDER BY INDEX_NAME, SEQ_IN_INDEX SEPARATOR ';') AS IDX
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %(db)s
+        GROUP BY TABLE_NAME
+    ) S ON S.TABLE_NAME = T.TABLE_NAME
+    LEFT JOIN (
+        SELECT K.TABLE_NAME,
+               GROUP_CONCAT(CONCAT_WS(',', QUOTE(K.CONSTRAINT_NAME), QUOTE(K.COLUMN_NAME),
+                                      QUOTE(K.REFERENCED_TABLE_NAME),
+                                      QUOTE(K.REFERENCED_COLUMN_NAME),
+                                      QUOTE(R.UPDATE_RULE), QUOTE(R.DELETE_RULE))
+                            ORDER BY K.CONSTRAINT_NAME, K.ORDINAL_POSITION SEPARATOR ';') AS FKS
+        FROM information_schema.KEY_COLUMN_USAGE K
+        JOIN information_schema.REFERENTIAL_CONSTRAINTS R
+          ON R.CONSTRAINT_SCHEMA = K.CONSTRAINT_SCHEMA
+         AND R.TABLE_NAME = K.TABLE_NAME
+         AND R.CONSTRAINT_NAME = K.CONSTRAINT_NAME
+        WHERE K.CONSTRAINT_SCHEMA = %(db)s
+        AND K.REFERENCED_TABLE_NAME IS NOT NULL
+        GROUP BY K.TABLE_NAME
+    ) F ON F.TABLE_NAME = T.TABLE_NAME
+    WHERE T.TABLE_SCHEMA = %(db)s
+    AND NOT ISNULL(T.ENGINE)
+    """
+
+# the digest covers the structure, which INSTANT/INPLACE ALTERs change
+# without changing CREATE_TIME; comments are always part of SHOW CREATE TABLE
+SQL_TABLE_MARKERS = """
+    SELECT T.TABLE_NAME, T.CREATE_TIME, T.UPDATE_TIME, D.DIGEST
+    FROM information_schema.`TABLES` T
+    JOIN (""" + SQL_TABLE_DIGESTS + """) D ON D.TABLE_NAME = T.TABLE_NAME
+    WHERE T.TABLE_SCHEMA = %(db)s
+    AND NOT ISNULL(T.ENGINE)
+    """
+
+SQL_SCHEMA_CHECKSUM = """
+    SELECT MD5(CONCAT_WS('#',
+        (SELECT CONCAT_WS(',', QUOTE(DEFAULT_CHARACTER_SET_NAME), QUOTE(DEFAULT_COLLATION_NAME))
+         FROM information_schema.SCHEMATA
+         WHERE SCHEMA_NAME = %(db)s),
+        IF(%(tables)s, (
+            SELECT GROUP_CONCAT(CONCAT(QUOTE(D.TABLE_NAME), D.DIGEST)
+                                ORDER BY D.TABLE_NAME SEPARATOR ';')
+            FROM (""" + SQL_TABLE_DIGESTS + """) D), ''),
+        IF(%(views)s, (
+            SELECT GROUP_CONCAT(CONCAT_WS(',', QUOTE(TABLE_NAME), QUOTE(VIEW_DEFINITION),
+                                          QUOTE(CHECK_OPTION), QUOTE(DEFINER),
+                                          QUOTE(SECURITY_TYPE))
+                                ORDER BY TABLE_NAME SEPARATOR ';')
+            FROM information_schema.VIEWS
+            WHERE TABLE_SCHEMA = %(db)s), ''),
+        IF(%(triggers)s, (
+            SELECT GROUP_CONCAT(CONCAT_WS(',', QUOTE(TRIGGER_NAME), QUOTE(EVENT_MANIPULATION),
+                                          QUOTE(EVENT_OBJECT_TABLE), QUOTE(ACTION_TIMING),
+                                          QUOTE(ACTION_ORIENTATION), QUOTE(ACTION_STATEMENT),
+                                          QUOTE(DEFINER), QUOTE(SQL_MODE))
+                                ORDER BY TRIGGER_NAME SEPARATOR ';')
+            FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = %(db)s), ''),
+        IF(%(routines)s, (
+            SELECT GROUP_CONCAT(CONCAT_WS(',', QUOTE(R.ROUTINE_TYPE), QUOTE(R.ROUTINE_NAME),
+                                          QUOTE(R.DTD_IDENTIFIER), QUOTE(R.ROUTINE_DEFINITION),
+                                          QUOTE(R.IS_DETERMINISTIC), QUOTE(R.SQL_DATA_ACCESS),
+                                          QUOTE(R.SECURITY_TYPE), QUOTE(R.DEFINER),
+                                          QUOTE(R.ROUTINE_COMMENT), QUOTE(P.PARAMS))
+                                ORDER BY R.ROUTINE_TYPE, R.ROUTINE_NAME SEPARATOR ';')
+            FROM information_schema.ROUTINES R
+            LEFT JOIN (
+                SELECT SPECIFIC_NAME,
+                       GROUP_CONCAT(CONCAT_WS(' ', QUOTE(PARAMETER_MODE), QUOTE(PARAMETER_NAME),
+                                              QUOTE(DTD_IDENTIFIER))
+                                    ORDER BY ORDINAL_POSITION SEPARATOR ',') AS PARAMS
+                FROM information_schema.PARAMETERS
+                WHERE SPECIFIC_SCHEMA = %(db)s
+                AND ORDINAL_POSITION > 0
+                GROUP BY SPECIFIC_NAME
+            ) P ON P.SPECIFIC_NAME = R.SPECIFIC_NAME
+            WHERE R.ROUTINE_SCHEMA = %(db)s), ''))) AS CHECKSUM
+    """
+
+
+def expire_statistics(instance):
+    """Disable the information_schema statistics cache of MySQL 8.0
+       (CREATE_TIME, UPDATE_TIME, ...) for the session of a SchemaObject,
+       so that changes made since it was cached are seen.
+    """
+    version = instance.version or ''
+    if 'mariadb' in version.lower() or compare_version(version, '8.0.3') < 0:
+        return
+    instance.connection.execute(SQL_STATS_EXPIRY)
+
+
+def table_markers(instance, sync_auto_inc=False):
+    """Return a dictionary of table name => change markers (string)
+       for the selected database of a SchemaObject.
+
+       Snapshots have no markers, an empty dictionary is returned.
+    """
+    conn = instance.connection
+    if conn is None:
+        return {}
+
+    expire_statistics(instance)
+    conn.execute(SQL_GROUP_CONCAT_MAX_LEN)
+    rows = conn.execute(SQL_TABLE_MARKERS, dict(db=instance.selected.name,
+                                                sync_auto_inc=bool(sync_auto_inc),
+                                                sync_comments=True))
+    return dict((row['TABLE_NAME'], "%s|%s|%s" % (row['CREATE_TIME'],
+                                                   row['UPDATE_TIME'],
+                                                   row['DIGEST']))
+                for row in rows or [])
+
+
+def create_hash(table, sync_auto_inc=False):
+    """Return the MD5 hex digest of a table's CREATE TABLE statement"""
+    sql = table.create()
+    if not sync_auto_inc:
+        sql = REGEX_TABLE_AUTO_INC.sub('', sql)
+    return hashlib.md5(sql.encode('utf-8')).hexdigest()
+
+
+def fingerprints(instance, previous=None, sync_auto_inc=False):
+    """Return the fingerprints of all tables of the selected database.
+
+        Args:
+            instance: A SchemaObject (or SnapshotObject) Instance.
+            previous: dictionary of fingerprints from the previous run
+            sync_auto_inc: Bool, is the AUTO_INCREMENT value synced?
+
+        Returns:
+            dictionary of table name => [markers, hash]
+    """
+    previous = previous or {}
+    markers = table_markers(instance, sync_auto_inc)
+    tables = instance.selected.tables
+
+    result = {}
+    for t in tables:
+        m = markers.get(t)
+        prev = previous.get(t)
+        if m is not None and prev and prev[0] == m:
+            result[t] = prev
+        else:
+            result[t] = [m, create_hash(tables[t], sync_auto_inc)]
+
+    return result
+
+
+def server_digests(instance, sync_auto_inc=False, sync_comments=False):
+    """Return a dictionary of table name => digest for the selected
+       database of a SchemaObject, computed by the server in one query.
+    """
+    conn = instance.connection
+    conn.execute(SQL_GROUP_CONCAT_MAX_LEN)
+    rows = conn.execute(SQL_TABLE_DIGESTS, dict(db=instance.selected.name,
+                                                sync_auto_inc=bool(sync_auto_inc),
+                                                sync_comments=bool(sync_comments)))
+    return dict((row['TABLE_NAME'], row['DIGEST']) for row in rows or [])
+
+
+def schema_checksum(instance, sync_auto_inc=False, sync_comments=False,
+                    kinds=('table', 'view', 'trigger', 'routine')):
+    """Return the checksum of the database a SchemaObject connection
+       uses, computed by the server in one query.
+
+        Args:
+            instance: A SchemaObject Instance, snapshots have no checksum.
+            sync_auto_inc: Bool, is the AUTO_INCREMENT value synced?
+            sync_comments: Bool, are the COMMENT fields synced?
+            kinds: the kinds of objects compared (objectfilter.KINDS)
+
+        Returns:
+            the MD5 hex digest (string), None for a snapshot.
+    """
+    conn = instance.connection
+    if conn is None:
+        return None
+
+    conn.execute(SQL_GROUP_CONCAT_MAX_LEN)
+    rows = conn.execute(SQL_SCHEMA_CHECKSUM, dict(db=conn.db,
+                                                  sync_auto_inc=bool(sync_auto_inc),
+                                                  sync_comments=bool(sync_comments),
+                                                  tables='table' in kinds,
+                                                  views='view' in kinds,
+                                                  triggers='trigger' in kinds,
+                                                  routines='routine' in kinds))
+    return rows[0]['CHECKSUM'] if rows else None
+
+
+def create_digest(table, sync_auto_inc=False, sync_comments=False):
+    """Return the digest of a table's CREATE TABLE statement, with
+       AUTO_INCREMENT and COMMENT removed unless they are synced.
+    """
+    sql = table.create()
+    if not sync_auto_inc:
+        sql = REGEX_TABLE_AUTO_INC.sub('', sql)
+    if not sync_comments:
+        sql = REGEX_TABLE_COMMENT.sub('', sql)
+    return hashlib.md5(sql.encode('utf-8')).hexdigest()
+
+
+def table_digests(source, target, sync_auto_inc=False, sync_comments=False):
+    """Return the table digests of the source and target databases.
+
+        When both sides are live databases the digests are computed
+        server side, one query per side. Otherwise (snapshots) the
+        digests of the CREATE TABLE statements of the tables common
+        to both sides are used.
+
+        Args:
+            source: A SchemaObject (or SnapshotObject) Instance.
+            target: A SchemaObject (or SnapshotObject) Instance.
+            sync_auto_inc: Bool, is the AUTO_INCREMENT value synced?
+            sync_comments: Bool, are the COMMENT fields synced?
+
+        Returns:
+            tuple of dictionaries (source digests, target digests)
+    """
+    if source.connection is not None and target.connection is not None:
+        return (server_digests(source, sync_auto_inc, sync_comments),
+                server_digests(target, sync_auto_inc, sync_comments))
+
+    from_tables = source.selected.tables
+    to_tables = target.selected.tables
+    common = [t for t in from_tables if t in to_tables]
+    return (dict((t, create_digest(from_tables[t], sync_auto_inc, sync_comments)) for t in common),
+            dict((t, create_digest(to_tables[t], sync_auto_inc, sync_comments)) for t in common))
+
+
+def altered_table(patch):
+    """Return the name of the table altered by a syncdb statement or None"""
+    m = REGEX_ALTER_TABLE.match(patch)
+    if m:
+        return m.group('name').replace('``', '`')
+    return None
+
+
+class IncrementalState(object):
+    """Fingerprints and in sync tables recorded by the previous run
+       of a source/target pair.
+
+        Attributes:
+            filename: String, the state file shared by all pairs
+            key: String, identifies the source/target pair and options
+            source: dictionary of the source table fingerprints
+            target: dictionary of the target table fingerprints
+            in_sync: list of the tables which were in sync
+            hits: Integer, tables skipped in this run
+            misses: Integer, tables compared in this run
+    """
+
+    def __init__(self, filename, key):
+        self.filename = filename
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+
+        state = self._read().get(key, {})
+        self.source = state.get('source', {})
+        self.target = state.get('target', {})
+        self.in_sync = state.get('in_sync', [])
+
+    def _read(self):
+        if not os.path.isfile(self.filename):
+            return {}
+        try:
+            fh = open(self.filename, 'r')
+            try:
+                return json.load(fh)
+            finally:
+                fh.close()
+        except ValueError:
+            return {}
+
+    def unchanged_tables(self, source_fp, target_fp):
+        """Return the set of tables which do not need to be compared,
+           and count the cache hits and misses.
+        """
+        unchanged = set()
+        for t in self.in_sync:
+            if (t in source_fp and t in target_fp and
+                    t in self.source and t in self.target and
+                    source_fp[t][1] == self.source[t][1] and
+                    target_fp[t][1] == self.target[t][1]):
+                unchanged.add(t)
+
+        common = [t for t in source_fp if t in target_fp]
+        self.hits = len(unchanged)
+        self.misses = len(common) - self.hits
+        return unchanged
+
+    def update(self, source_fp, target_fp, altered):
+        """Record the fingerprints and in sync tables of this run"""
+        self.source = source_fp
+        self.target = target_fp
+        self.in_sync = sorted(t for t in source_fp
+                              if t in target_fp and t not in altered)
+
+    def save(self):
+        """Write the state to disk"""
+        state = self._read()
+        state[self.key] = dict(source=self.source, target=self.target,
+                               in_sync=self.in_sync)
+
+        tmp = self.filename + '.tmp'
+        fh = open(tmp, 'w')
+        try:
+            json.dump(state, fh)
+        finally:
+            fh.close()
+        os.rename(tmp, self.filename)
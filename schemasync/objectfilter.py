@@ -0,0 +1,292 @@
+"""Include / exclude filters for the objects Schema Sync compares
+
+A pattern selects tables, views, triggers or routines by name:
+
+    tmp_*               glob, * (or %) matches any characters, ? one
+    /^archive_\d{4}$/   regular expression, between slashes
+    table:_gh_ost_*     restricted to one kind of object
+                        (table, view, trigger or routine)
+
+Names are matched case-insensitively. An object is compared if it matches
+one of the --include patterns of its kind (when there are any) and none
+of the --exclude patterns. Triggers of excluded tables are excluded too.
+
+The filters are turned into SQL predicates on the introspection queries,
+so excluded objects are never fetched, and the fetched names are matched
+again in Python. Models which are not read from information_schema
+(snapshots) are pruned instead.
+
+Regular expressions are Python regular expressions. The server (Henry
+Spencer REGEXP before MySQL 8.0, ICU since) only evaluates the common
+subset: literals, ., [...] classes, anchors, groups, alternation and
+the *, +, ? and {n,m} quantifiers, with \d, \w and \s rewritten as
+classes. A pattern using anything else (lookarounds, (?...) groups,
+lazy quantifiers, back references, \b, ...) is left out of the SQL
+predicate and only matched in Python.
+
+Whole categories of objects are selected with --only / --skip
+(tables, views, triggers, routines). The categories which are not
+compared are not loaded at all: no view definition or routine body is
+read unless views or routines are compared.
+"""
+
+import re
+
+from schemaobject.collections import OrderedDict
+
+KINDS = ('table', 'view', 'trigger', 'routine')
+CATEGORIES = {'tables': 'table', 'views': 'view', 'triggers': 'trigger',
+              'routines': 'routine', 'procedures': 'routine'}
+
+
+class Pattern(object):
+    """A name pattern of an --include or --exclude option.
+
+        Attributes:
+            kind: String, the kind of object the pattern applies to,
+                  None for every kind
+            text: String, the pattern as given
+            regex: Bool, is the pattern a regular expression?
+            compiled: compiled regular expression matching the names
+            like: String, the LIKE pattern of a glob, None for a regex
+            server_source: String, the (lower case) regular expression the
+                           server evaluates, None if the regex is not in
+                           the subset it shares with Python
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.kind = None
+        kind, sep, rest = text.partition(':')
+        if sep and kind.lower() in KINDS:
+            self.kind = kind.lower()
+            text = rest
+
+        if not text:
+            raise ValueError("Empty pattern: %s" % self.text)
+
+        self.regex = len(text) > 1 and text.startswith('/') and text.endswith('/')
+        if self.regex:
+            self.source = text[1:-1]
+            self.like = None
+            self.server_source = server_regex(self.source)
+        else:
+            self.source = glob_to_regex(text)
+            self.like = glob_to_like(text)
+            self.server_source = None
+
+        try:
+            self.compiled = re.compile(self.source, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError("Invalid pattern %s: %s" % (self.text, e))
+
+    def applies(self, kind):
+        return self.kind is None or self.kind == kind
+
+    def match(self, name):
+        return self.compiled.search(name) is not None
+
+    def predicate(self, column):
+        """Return (sql, values) matching the pattern on a name column,
+           None if the server cannot evaluate the pattern.
+        """
+        if self.regex:
+            if self.server_source is None:
+                return None
+            return "LOWER(%s) REGEXP %%s" % column, [self.server_source]
+        return "LOWER(%s) LIKE %%s" % column, [self.like]
+
+
+# escapes rewritten as classes for the server, outside of and inside [...]
+SERVER_ESCAPES = {'d': '[0-9]', 'D': '[^0-9]', 'w': '[a-z0-9_]', 'W': '[^a-z0-9_]',
+                  's': '[[:space:]]', 'S': '[^[:space:]]'}
+SERVER_CLASS_ESCAPES = {'d': '0-9', 'w': 'a-z0-9_', 's': '[:space:]'}
+
+
+def server_regex(source):
+    """Return the lower case regular expression MySQL REGEXP evaluates
+       as Python's re does (case-insensitively) for source, or None if
+       source uses syntax outside of the subset both engines share.
+    """
+    result = []
+    in_class = False
+    class_start = 0     # a ] right after [ or [^ is a literal
+    i = 0
+    while i < len(source):
+        c = source[i]
+        n = source[i + 1:i + 2]
+        if c == '\\':
+            if in_class and n in SERVER_CLASS_ESCAPES:
+                result.append(SERVER_CLASS_ESCAPES[n])
+            elif not in_class and n in SERVER_ESCAPES:
+                result.append(SERVER_ESCAPES[n])
+            elif not in_class and n and not n.isalnum():
+                # an escaped symbol is a literal in both engines
+                result.append(c + n)
+            else:
+                # \b, back references, ... (a backslash is literal in a
+                # POSIX bracket expression)
+                return None
+            i += 2
+            continue
+
+        if in_class:
+            in_class = not (c == ']' and i > class_start)
+        elif c == '[':
+            in_class = True
+            class_start = i + 2 if n == '^' else i + 1
+        elif c == '(' and n == '?':
+            # lookarounds, non-capturing and named groups, inline flags
+            return None
+        elif c in '*+?}' and n in ('?', '+'):
+            # lazy and possessive quantifiers
+            return None
+        result.append(c)
+        i += 1
+
+    return ''.join(result).lower()
+
+
+def glob_to_regex(glob):
+    """Return the anchored regular expression of a glob"""
+    regex = []
+    for c in glob:
+        if c in '*%':
+            regex.append('.*')
+        elif c == '?':
+            regex.append('.')
+        else:
+            regex.append(re.escape(c))
+    return '^%s$' % ''.join(regex)
+
+
+def glob_to_like(glob):
+    """Return the (lower case) LIKE pattern of a glob"""
+    like = []
+    for c in glob.lower():
+        if c in '*%':
+            like.append('%')
+        elif c == '?':
+            like.append('_')
+        elif c in '_\\':
+            like.append('\\' + c)
+        else:
+            like.append(c)
+    return ''.join(like)
+
+
+def categories(names):
+    """Return the set of kinds of a comma separated list of categories
+       (tables,views,triggers,routines), raising ValueError for unknown ones.
+    """
+    kinds = set()
+    for name in (names or '').split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in CATEGORIES and name + 's' not in CATEGORIES:
+            raise ValueError("Unknown object category: %s" % name)
+        kinds.add(CATEGORIES.get(name) or CATEGORIES[name + 's'])
+    return kinds
+
+
+class ObjectFilter(object):
+    """The --include / --exclude patterns and --only / --skip categories
+       of a run.
+
+        An ObjectFilter without patterns or categories selects every
+        object and is false.
+
+        Attributes:
+            include: list of Patterns
+            exclude: list of Patterns
+            kinds: set of the kinds of objects compared (--only / --skip)
+    """
+
+    def __init__(self, include=None, exclude=None, only=None, skip=None):
+        self.include = [Pattern(p) for p in include or []]
+        self.exclude = [Pattern(p) for p in exclude or []]
+        self.kinds = categories(only) if only else set(KINDS)
+        self.kinds -= categories(skip)
+
+    def __bool__(self):
+        return bool(self.include or self.exclude or len(self.kinds) < len(KINDS))
+
+    __nonzero__ = __bool__
+
+    def loads(self, kind):
+        """Is a kind of object compared, and so loaded?"""
+        return kind in self.kinds
+
+    def filters(self, kind):
+        """Is there a pattern applying to a kind of object?"""
+        return any(p.applies(kind) for p in self.include + self.exclude)
+
+    def match(self, kind, name):
+        """Is an object of a kind selected?"""
+        if kind not in self.kinds:
+            return False
+        include = [p for p in self.include if p.applies(kind)]
+        if include and not any(p.match(name) for p in include):
+            return False
+        return not any(p.match(name) for p in self.exclude if p.applies(kind))
+
+    def match_trigger(self, name, table):
+        """Is a trigger selected? The triggers of excluded tables are not."""
+        return (self.match('trigger', name) and
+                ('table' not in self.kinds or self.match('table', table)))
+
+    def predicate(self, kind, column):
+        """Return (sql, values), the SQL predicate selecting the objects
+           of a kind by their name column. sql is empty if no pattern
+           applies to the kind.
+
+           The patterns the server cannot evaluate are left out: an
+           exclude pattern alone, every include pattern of the kind if
+           one of them. The predicate then selects more objects than
+           match(), never fewer.
+        """
+        sql = []
+        values = []
+        for patterns, template in ((self.include, "AND (%s)"), (self.exclude, "AND NOT (%s)")):
+            predicates = [p.predicate(column) for p in patterns if p.applies(kind)]
+            if patterns is self.include and None in predicates:
+                continue
+            predicates = [p for p in predicates if p is not None]
+            if predicates:
+                sql.append(template % " OR ".join(term for term, params in predicates))
+                for term, params in predicates:
+                    values.extend(params)
+        return " ".join(sql), values
+
+    def signature(self):
+        """Return a string identifying the patterns, for cache keys"""
+        if not self:
+            return ''
+        return "include=%s exclude=%s only=%s" % (",".join(p.text for p in self.include),
+                                                  ",".join(p.text for p in self.exclude),
+                                                  ",".join(sorted(self.kinds)))
+
+    def prune(self, database):
+        """Remove the objects which are not selected from a loaded
+           database model.
+
+            Args:
+                database: A SchemaObject DatabaseSchema Instance.
+        """
+        database._tables = self._select('table', database.tables)
+        database._views = self._select('view', database.views)
+        database._procedures = self._select('routine', database.procedures)
+
+        triggers = database.triggers
+        database._triggers = OrderedDict()
+        for name in triggers:
+            if self.match_trigger(name, triggers[name].table):
+                database._triggers[name] = triggers[name]
+
+    def _select(self, kind, objects):
+        selected = OrderedDict()
+        for name in objects:
+            if self.match(kind, name):
+                selected[name] = objects[name]
+        return selected
@@ -0,0 +1,185 @@
+"""Online schema changes for large tables
+
+An ALTER TABLE which rebuilds a large table blocks or slows it for the
+whole rebuild. For tables over the --online-threshold, the change is
+written as a shadow table migration instead (the technique used by
+pt-online-schema-change):
+
+    1. create `_<table>_new` with the source definition
+    2. capture the changes made to the table with AFTER INSERT, UPDATE
+       and DELETE triggers replaying them on the shadow table
+    3. copy the rows in chunks of primary key ranges, each chunk sized
+       from the table's row count and average row length so that it
+       copies in about --online-chunk-time seconds
+    4. swap the tables with one atomic RENAME TABLE, drop the triggers
+       and the old table, then add the foreign keys
+
+Tables without a single column integer primary key, with triggers of
+their own or referenced by foreign keys are altered in place.
+"""
+
+import re
+
+from utils import REGEX_TABLE_AUTO_INC, REGEX_TABLE_COMMENT
+
+MB = 1024 * 1024
+
+INTEGER_TYPES = ('tinyint', 'smallint', 'mediumint', 'int', 'bigint')
+
+# foreign keys are added after the swap, the shadow table is created without them
+REGEX_FOREIGN_KEY = re.compile(r",\s*CONSTRAINT `(?:[^`]|``)+` FOREIGN KEY \([^)]*\) "
+                               r"REFERENCES (?:`(?:[^`]|``)+`\.)?`(?:[^`]|``)+` \([^)]*\)"
+                               r"(?: ON (?:DELETE|UPDATE) (?:RESTRICT|CASCADE|SET NULL|NO ACTION|SET DEFAULT))*",
+                               re.I)
+
+COPY_PROCEDURE = """DELIMITER ;;
+CREATE PROCEDURE %(proc)s()
+BEGIN
+    DECLARE lo, hi, step BIGINT;
+    SELECT MIN(%(pk)s), MAX(%(pk)s) INTO lo, hi FROM %(table)s;
+    SET step = GREATEST(1, CEIL(%(chunk)d * (hi - lo + 1) / %(rows)d));
+    WHILE lo <= hi DO
+        INSERT LOW_PRIORITY IGNORE INTO %(new)s (%(columns)s)
+        SELECT %(columns)s FROM %(table)s FORCE INDEX (PRIMARY)
+        WHERE %(pk)s >= lo AND %(pk)s < lo + step LOCK IN SHARE MODE;
+        SET lo = lo + step;
+    END WHILE;
+END;;
+DELIMITER ;"""
+
+
+def quote(name):
+    return "`%s`" % name.replace('`', '``')
+
+
+def primary_key(table):
+    """Return the name of the single column primary key of a table or None"""
+    if 'PRIMARY' not in table.indexes:
+        return None
+    fields = table.indexes['PRIMARY'].fields
+    if len(fields) != 1:
+        return None
+    return fields[0][0]
+
+
+class OnlineMigrator(object):
+    """Writes shadow table migrations for tables over a size threshold.
+
+        Attributes:
+            threshold: Integer, the minimum bytes rewritten by the ALTER TABLE
+            chunk_time: Float, target duration of a chunk in seconds
+            rate: Float, the rewrite rate in MB/s the chunks are sized with
+            chunk_size: Integer, rows per chunk, overrides chunk_time
+            sync_auto_inc: Bool, keep the AUTO_INCREMENT table option?
+            sync_comments: Bool, keep the COMMENT fields?
+    """
+
+    def __init__(self, threshold, chunk_time=0.5, rate=50.0, chunk_size=None,
+                 sync_auto_inc=False, sync_comments=False):
+        self.threshold = threshold
+        self.chunk_time = chunk_time
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.sync_auto_inc = sync_auto_inc
+        self.sync_comments = sync_comments
+
+    def unsupported(self, from_table, to_table):
+        """Return why a table can not be migrated online, None if it can"""
+        pk = primary_key(to_table)
+        if pk is None or pk != primary_key(from_table):
+            return "no single column primary key common to both tables"
+
+        for table in (from_table, to_table):
+            if not table.columns[pk].type.lower().split('(')[0] in INTEGER_TYPES:
+                return "the primary key is not an integer"
+
+        # the revert migrates the table once patched, check both schemas
+        for db in (from_table.parent, to_table.parent):
+            for t in db.triggers:
+                if db.triggers[t].table == to_table.name:
+                    return "the table has triggers"
+
+            for t in db.tables:
+                if t == to_table.name:
+                    continue
+                for fk in db.tables[t].foreign_keys:
+                    if db.tables[t].foreign_keys[fk].referenced_table_name == to_table.name:
+                        return "the table is referenced by foreign keys"
+
+        return None
+
+    def chunk_rows(self, size):
+        """Return the number of rows copied per chunk"""
+        if self.chunk_size:
+            return self.chunk_size
+        avg_row_length = float(size.data_length) / size.rows if size.rows else 100.0
+        return max(100, int(self.chunk_time * self.rate * MB / max(avg_row_length, 1.0)))
+
+    def migration(self, table, definition, current, size):
+        """Return the shadow table migration of a table to a new definition.
+
+            Args:
+                table: String, the table name
+                definition: TableSchema Instance with the new definition
+                current: TableSchema Instance with the current definition
+                size: cost.TableSize of the table
+        """
+        new = "_%s_new" % table
+        old = "_%s_old" % table
+        pk = primary_key(definition)
+        chunk = self.chunk_rows(size)
+        columns = [c for c in definition.columns if c in current.columns]
+        column_list = ", ".join(quote(c) for c in columns)
+        new_values = ", ".join("NEW.%s" % quote(c) for c in columns)
+        triggers = ["_%s_osc_%s" % (table, event) for event in ('ins', 'upd', 'del')]
+
+        create = definition.create()
+        if not self.sync_auto_inc:
+            create = REGEX_TABLE_AUTO_INC.sub('', create)
+        if not self.sync_comments:
+            create = REGEX_TABLE_COMMENT.sub('', create)
+        create = REGEX_FOREIGN_KEY.sub('', create)
+        create = create.replace("CREATE TABLE %s" % quote(table), "CREATE TABLE %s" % quote(new), 1)
+
+        sql = ["-- Online schema change of %s: %d rows, %d rows per chunk"
+               % (quote(table), size.rows, chunk),
+               create.rstrip(';') + ';',
+               "CREATE TRIGGER %s AFTER INSERT ON %s FOR EACH ROW "
+               "REPLACE INTO %s (%s) VALUES (%s);"
+               % (quote(triggers[0]), quote(table), quote(new), column_list, new_values),
+               "DELIMITER ;;",
+               "CREATE TRIGGER %s AFTER UPDATE ON %s FOR EACH ROW BEGIN "
+               "DELETE IGNORE FROM %s WHERE %s = OLD.%s AND OLD.%s <> NEW.%s; "
+               "REPLACE INTO %s (%s) VALUES (%s); END;;"
+               % (quote(triggers[1]), quote(table), quote(new), quote(pk), quote(pk),
+                  quote(pk), quote(pk), quote(new), column_list, new_values),
+               "DELIMITER ;",
+               "CREATE TRIGGER %s AFTER DELETE ON %s FOR EACH ROW "
+               "DELETE IGNORE FROM %s WHERE %s = OLD.%s;"
+               % (quote(triggers[2]), quote(table), quote(new), quote(pk), quote(pk)),
+               COPY_PROCEDURE % dict(proc=quote("_%s_osc_copy" % table), pk=quote(pk),
+                                     table=quote(table), new=quote(new),
+                                     chunk=chunk, rows=max(size.rows, 1), columns=column_list),
+               "CALL %s();" % quote("_%s_osc_copy" % table),
+               "DROP PROCEDURE %s;" % quote("_%s_osc_copy" % table),
+               "RENAME TABLE %s TO %s, %s TO %s;" % (quote(table), quote(old), quote(new), quote(table))]
+        sql.extend("DROP TRIGGER %s;" % quote(t) for t in triggers)
+        sql.append("DROP TABLE %s;" % quote(old))
+
+        fks = [definition.foreign_keys[fk].create() for fk in definition.foreign_keys]
+        if fks:
+            sql.append("ALTER TABLE %s %s;" % (quote(table), ", ".join(fks)))
+
+        return '\n'.join(sql)
+
+    def migrate(self, from_table, to_table, estimate):
+        """Return the (patch, revert) shadow table migrations of a table,
+           or None if the table is altered in place.
+        """
+        if estimate.bytes is None or estimate.bytes <= self.threshold or not estimate.plan.rebuild:
+            return None
+        if self.unsupported(from_table, to_table):
+            return None
+
+        return (self.migration(to_table.name, from_table, to_table, estimate.size),
+                self.migration(to_table.name, to_table, from_table, estimate.size))
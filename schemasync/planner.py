@@ -0,0 +1,334 @@
+"""ALTER TABLE planner for Schema Sync
+
+syncdb.sync_schema() emits a single ALTER TABLE statement per table, so a
+table is rebuilt at most once. The planner classifies every clause of that
+statement by the algorithm MySQL uses to execute it on the target version:
+
+    INSTANT: metadata only change (MySQL 8.0)
+    INPLACE: the table is changed in place, concurrent DML is allowed.
+             Some INPLACE changes rebuild the table.
+    COPY: the table is copied to a new table, DML is blocked.
+
+The statement runs with the slowest algorithm of its clauses. The planner
+annotates the patch with the expected algorithm and can add the matching
+ALGORITHM= and LOCK= clauses (MySQL 5.6+), so MySQL refuses to run the
+statement rather than silently falling back to a slower algorithm.
+"""
+
+import re
+
+from utils import compare_version
+
+INSTANT = 'INSTANT'
+INPLACE = 'INPLACE'
+COPY = 'COPY'
+ALGORITHMS = (INSTANT, INPLACE, COPY)
+
+LOCK_NONE = 'NONE'
+LOCK_SHARED = 'SHARED'
+
+# maximum bytes per character, used to find the length bytes of a VARCHAR
+CHARSET_MAXLEN = {'ascii': 1, 'latin1': 1, 'binary': 1, 'utf8': 3,
+                  'utf8mb3': 3, 'utf8mb4': 4, 'ucs2': 2, 'utf16': 4, 'utf32': 4}
+
+REGEX_NAME = r"`(?P<name>(?:[^`]|``)+)`"
+REGEX_ADD_COLUMN = re.compile(r"^ADD COLUMN " + REGEX_NAME +
+                              r" .*?(?: AFTER `(?P<after>(?:[^`]|``)+)`| FIRST)$", re.S)
+REGEX_MODIFY_COLUMN = re.compile(r"^MODIFY COLUMN " + REGEX_NAME + r" (?P<type>.*?)"
+                                 r"(?: CHARACTER SET (?P<charset>\S+) COLLATE (?P<collation>\S+))?"
+                                 r" (?P<null>NOT NULL|NULL)(?P<rest>.*?)"
+                                 r" (?P<position>AFTER `(?:[^`]|``)+`|FIRST)$", re.S)
+REGEX_VARCHAR = re.compile(r"^var(?:char|binary)\((?P<length>\d+)\)$", re.I)
+
+
+def version_at_least(version, minimum):
+    """Return True if the server version is minimum or later"""
+    return compare_version(version, minimum) >= 0
+
+
+class Clause(object):
+    """A clause of an ALTER TABLE statement and how MySQL executes it.
+
+        Attributes:
+            sql: String, the clause
+            algorithm: String, INSTANT, INPLACE or COPY
+            rebuild: Bool, does the clause rebuild the table?
+            lock: String, the weakest lock allowed (NONE or SHARED),
+                  None for INSTANT clauses
+    """
+
+    def __init__(self, sql, algorithm, rebuild=False, lock=LOCK_NONE):
+        self.sql = sql
+        self.algorithm = algorithm
+        self.rebuild = rebuild or algorithm == COPY
+        if algorithm == INSTANT:
+            self.lock = None
+        elif algorithm == COPY:
+            self.lock = LOCK_SHARED
+        else:
+            self.lock = lock
+
+
+class Plan(object):
+    """The plan of an ALTER TABLE statement.
+
+        Attributes:
+            table: String, the table name
+            clauses: list of Clause
+            algorithm: String, the algorithm of the statement
+            rebuild: Bool, is the table rebuilt?
+            lock: String, the weakest lock allowed, None for INSTANT
+    """
+
+    def __init__(self, table, clauses):
+        self.table = table
+        self.clauses = clauses
+        self.algorithm = max([c.algorithm for c in clauses] or [INSTANT],
+                             key=ALGORITHMS.index)
+        self.rebuild = any(c.rebuild for c in clauses)
+        if self.algorithm == INSTANT:
+            self.lock = None
+        elif any(c.lock == LOCK_SHARED for c in clauses):
+            self.lock = LOCK_SHARED
+        else:
+            self.lock = LOCK_NONE
+
+    def describe(self):
+        """Return a one line description of the plan"""
+        desc = "ALTER TABLE `%s`: ALGORITHM=%s" % (self.table, self.algorithm)
+        if self.lock:
+            desc += ", LOCK=%s" % self.lock
+        if self.rebuild:
+            desc += ", rebuilds the table"
+        return desc
+
+
+class AlterPlanner(object):
+    """Classifies ALTER TABLE clauses for a target server version.
+
+        Attributes:
+            version: String, the target server version
+            algorithm_clauses: Bool, add ALGORITHM= and LOCK= clauses?
+            estimator: cost.CostEstimator (optional), estimates the cost
+                       of every patch statement
+            notes: dictionary of statement => plan description
+            plans: list of the Plan of every patch statement
+            online: online.OnlineMigrator (optional), migrates the tables
+                    over its threshold with a shadow table instead
+            over_budget: list of (patch, revert) statements held back
+                         because they are over the estimator's budget
+            online_migrations: list of (table name, patch, revert) shadow
+                               table migrations for the online scripts
+    """
+
+    def __init__(self, version, algorithm_clauses=False, estimator=None, online=None):
+        self.version = version
+        self.algorithm_clauses = (algorithm_clauses and
+                                  version_at_least(version, '5.6.0'))
+        self.estimator = estimator
+        self.online = online
+        self.notes = {}
+        self.plans = []
+        self.over_budget = []
+        self.online_migrations = []
+
+    def alter(self, table, plist, rlist, from_table=None, revert_order=None):
+        """Return the (patch, revert) ALTER TABLE statements of a table.
+
+            Args:
+                table: the target SchemaObject TableSchema Instance.
+                plist: list of patch clauses
+                rlist: list of revert clauses, in the order of plist
+                from_table: the source SchemaObject TableSchema Instance,
+                            required for online migrations.
+                revert_order: list of indexes (optional), the order in
+                              which to apply the revert clauses
+                              (syncdb.revert_order()).
+
+            Returns:
+                tuple of strings (patch, revert), both empty if the
+                statement is migrated online or over the estimator's budget.
+        """
+        if revert_order is None:
+            revert_order = range(len(rlist))
+        patch_plan = self.plan(table, plist, rlist)
+        revert_plan = self.plan(table, [rlist[i] for i in revert_order],
+                                [plist[i] for i in revert_order])
+        self.plans.append(patch_plan)
+
+        p = self.statement(table, patch_plan)
+        r = self.statement(table, revert_plan)
+        self.notes[p] = patch_plan.describe()
+        self.notes[r] = revert_plan.describe()
+
+        if self.estimator is None:
+            return p, r
+
+        estimate = self.estimator.estimate(patch_plan)
+        if self.online and from_table is not None:
+            migration = self.online.migrate(from_table, table, estimate)
+            if migration:
+                estimate.online = True
+                estimate.over_budget = False
+                self.online_migrations.append((table.name,) + migration)
+                return '', ''
+
+        if estimate.over_budget:
+            self.over_budget.append((p, r))
+            return '', ''
+        return p, r
+
+    def statement(self, table, plan):
+        """Return the ALTER TABLE statement of a plan"""
+        clauses = [c.sql for c in plan.clauses]
+        if self.algorithm_clauses:
+            clauses.append("ALGORITHM=%s" % plan.algorithm)
+            if plan.lock:
+                clauses.append("LOCK=%s" % plan.lock)
+        return "%s %s;" % (table.alter(), ', '.join(clauses))
+
+    def plan(self, table, clauses, counterparts):
+        """Return the Plan of a list of clauses.
+
+            Args:
+                table: the target SchemaObject TableSchema Instance.
+                clauses: list of clauses to classify
+                counterparts: list of the clauses undoing them
+                              (the previous column definitions)
+        """
+        compressed = str(table.options['row_format'].value).upper() == 'COMPRESSED'
+        fulltext = any(table.indexes[i].kind == 'FULLTEXT' for i in table.indexes)
+        columns = list(table.columns.keys())
+        last = columns[-1] if columns else None
+        drops_primary = any(c.startswith("DROP PRIMARY KEY") for c in clauses)
+        adds_primary = any(c.startswith("ADD PRIMARY KEY") for c in clauses)
+
+        result = []
+        for sql, counterpart in zip(clauses, counterparts):
+            if sql.startswith("ADD COLUMN "):
+                clause = self.add_column(sql, last, fulltext or compressed)
+                m = REGEX_ADD_COLUMN.match(sql)
+                if m and m.group('after') == last:
+                    last = m.group('name')
+            elif sql.startswith("DROP COLUMN "):
+                clause = self.drop_column(sql)
+            elif sql.startswith("MODIFY COLUMN "):
+                clause = self.modify_column(sql, counterpart, table)
+            elif sql.startswith("DROP PRIMARY KEY"):
+                clause = self.primary_key(sql, adds_primary)
+            elif sql.startswith("ADD PRIMARY KEY"):
+                clause = self.primary_key(sql, True)
+            elif sql.startswith("ADD ") or sql.startswith("DROP "):
+                clause = self.index(sql, drops_primary)
+            else:
+                clause = self.table_options(sql)
+            result.append(clause)
+
+        return Plan(table.name, result)
+
+    def add_column(self, sql, last, no_instant):
+        if not version_at_least(self.version, '5.6.0'):
+            return Clause(sql, COPY)
+
+        lock = LOCK_SHARED if 'auto_increment' in sql.lower() else LOCK_NONE
+        if not no_instant and lock == LOCK_NONE:
+            if version_at_least(self.version, '8.0.29'):
+                return Clause(sql, INSTANT)
+            m = REGEX_ADD_COLUMN.match(sql)
+            if (version_at_least(self.version, '8.0.12') and
+                    m and m.group('after') is not None and m.group('after') == last):
+                return Clause(sql, INSTANT)
+        return Clause(sql, INPLACE, rebuild=True, lock=lock)
+
+    def drop_column(self, sql):
+        if not version_at_least(self.version, '5.6.0'):
+            return Clause(sql, COPY)
+        if version_at_least(self.version, '8.0.29'):
+            return Clause(sql, INSTANT)
+        return Clause(sql, INPLACE, rebuild=True)
+
+    def modify_column(self, sql, previous, table):
+        new = REGEX_MODIFY_COLUMN.match(sql)
+        old = REGEX_MODIFY_COLUMN.match(previous or '')
+        if not (new and old) or not version_at_least(self.version, '5.6.0'):
+            return Clause(sql, COPY)
+
+        if new.group('type') != old.group('type'):
+            if self.varchar_extended(old, new, table):
+                return Clause(sql, INPLACE)
+            return Clause(sql, COPY)
+
+        if (new.group('charset'), new.group('collation')) != (old.group('charset'), old.group('collation')):
+            return Clause(sql, COPY)
+
+        auto_inc = ['auto_increment' in m.group('rest').lower() for m in (old, new)]
+        if auto_inc[0] != auto_inc[1]:
+            return Clause(sql, COPY)
+
+        if new.group('null') != old.group('null') or new.group('position') != old.group('position'):
+            return Clause(sql, INPLACE, rebuild=True)
+
+        # only the default value or the comment changed
+        if version_at_least(self.version, '8.0.0'):
+            return Clause(sql, INSTANT)
+        return Clause(sql, INPLACE)
+
+    def varchar_extended(self, old, new, table):
+        """Return True if a VARCHAR is extended without changing the
+           number of length bytes (in place since MySQL 5.7)
+        """
+        if not version_at_least(self.version, '5.7.0'):
+            return False
+
+        old_m = REGEX_VARCHAR.match(old.group('type'))
+        new_m = REGEX_VARCHAR.match(new.group('type'))
+        if not (old_m and new_m):
+            return False
+
+        charset = new.group('charset') or table.options['charset'].value
+        maxlen = CHARSET_MAXLEN.get(str(charset).lower(), 4)
+        old_len = int(old_m.group('length')) * maxlen
+        new_len = int(new_m.group('length')) * maxlen
+        return new_len >= old_len and (new_len <= 255 or old_len > 255)
+
+    def primary_key(self, sql, with_add):
+        if not version_at_least(self.version, '5.6.0'):
+            return Clause(sql, COPY)
+        if sql.startswith("DROP PRIMARY KEY") and not with_add:
+            return Clause(sql, COPY)
+        return Clause(sql, INPLACE, rebuild=True)
+
+    def index(self, sql, drops_primary):
+        """Secondary indexes and foreign keys"""
+        fulltext = sql.startswith("ADD FULLTEXT ")
+        spatial = sql.startswith("ADD SPATIAL ")
+        foreign_key = sql.startswith("ADD CONSTRAINT ") or sql.startswith("DROP FOREIGN KEY ")
+
+        if not version_at_least(self.version, '5.6.0'):
+            # fast index creation (InnoDB plugin) only handles secondary indexes
+            if fulltext or spatial or foreign_key:
+                return Clause(sql, COPY)
+            return Clause(sql, INPLACE)
+
+        if fulltext:
+            return Clause(sql, INPLACE, rebuild=True, lock=LOCK_SHARED)
+        if spatial:
+            if not version_at_least(self.version, '5.7.0'):
+                return Clause(sql, COPY)
+            return Clause(sql, INPLACE, lock=LOCK_SHARED)
+        # the patch disables FOREIGN_KEY_CHECKS, foreign keys are added in place
+        return Clause(sql, INPLACE, rebuild=drops_primary)
+
+    def table_options(self, sql):
+        """Table options (ENGINE=, ROW_FORMAT=, CHARSET=, COMMENT=, ...)"""
+        upper = sql.upper()
+        if not version_at_least(self.version, '5.6.0') or 'ENGINE=' in upper:
+            return Clause(sql, COPY)
+
+        names = re.findall(r"(?:^|\s)([A-Z_]+)=", re.sub(r"'(?:[^']|'')*'", "''", upper))
+        if not names or any(n not in ('CHARSET', 'COLLATE', 'AUTO_INCREMENT', 'COMMENT') for n in names):
+            # ROW_FORMAT, KEY_BLOCK_SIZE and other create options
+            return Clause(sql, INPLACE, rebuild=True)
+        if version_at_least(self.version, '8.0.0') and 'AUTO_INCREMENT' not in names:
+            return Clause(sql, INSTANT)
+        return Clause(sql, INPLACE)
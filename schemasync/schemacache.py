@@ -0,0 +1,206 @@
+"""Persistent introspection cache for Schema Sync
+
+The loaded model of a database is stored in a cache directory as a
+snapshot file, keyed by host, port, database and server version. Before
+a cached model is reused, one validation query reads cheap markers of the
+database from information_schema:
+
+    tables: count, latest CREATE_TIME and UPDATE_TIME
+    columns: count
+    views and triggers: count and CRC32 sum of their definitions
+    routines: count and latest LAST_ALTERED
+
+The cached model is reused if the markers are unchanged and the entry is
+younger than the TTL, the database is not introspected at all. Otherwise
+the database is loaded and the entry replaced. The least recently used
+entries are evicted once the cache holds more than its maximum.
+
+The index of the entries (index.json) is replaced atomically, several
+runs can share a cache directory.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+from schemaobject.collections import OrderedDict
+
+import snapshot
+
+SQL_VALIDATOR = """
+    SELECT
+      (SELECT COUNT(*) FROM information_schema.`TABLES`
+        WHERE TABLE_SCHEMA = %(db)s) AS TABLE_COUNT,
+      (SELECT MAX(CREATE_TIME) FROM information_schema.`TABLES`
+        WHERE TABLE_SCHEMA = %(db)s) AS CREATE_TIME,
+      (SELECT MAX(UPDATE_TIME) FROM information_schema.`TABLES`
+        WHERE TABLE_SCHEMA = %(db)s) AS UPDATE_TIME,
+      (SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = %(db)s) AS COLUMN_COUNT,
+      (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(VIEW_DEFINITION)), 0))
+         FROM information_schema.VIEWS
+        WHERE TABLE_SCHEMA = %(db)s) AS VIEWS,
+      (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(ACTION_STATEMENT)), 0))
+         FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = %(db)s) AS TRIGGERS,
+      (SELECT CONCAT(COUNT(*), ':', COALESCE(MAX(LAST_ALTERED), ''))
+         FROM information_schema.ROUTINES
+        WHERE ROUTINE_SCHEMA = %(db)s) AS ROUTINES
+    """
+
+VALIDATOR_COLUMNS = ('TABLE_COUNT', 'CREATE_TIME', 'UPDATE_TIME', 'COLUMN_COUNT',
+                     'VIEWS', 'TRIGGERS', 'ROUTINES')
+
+INDEX_FILENAME = 'index.json'
+
+
+def cache_key(instance, variant=''):
+    """Return the cache key of the selected database of a SchemaObject,
+       variant tells apart the models loaded with different filters.
+    """
+    key = "%s:%s/%s %s" % (instance.host, instance.port,
+                           instance.connection.db, instance.version)
+    if variant:
+        key += " " + variant
+    return key
+
+
+def validator(instance):
+    """Return the markers of the selected database of a SchemaObject,
+       read with one query, as a list of strings.
+    """
+    rows = instance.connection.execute(SQL_VALIDATOR, dict(db=instance.connection.db))
+    row = rows[0] if rows else {}
+    return [None if row.get(c) is None else str(row[c]) for c in VALIDATOR_COLUMNS]
+
+
+class SchemaCache(object):
+    """On-disk cache of loaded database models.
+
+        Attributes:
+            directory: String, the cache directory
+            ttl: Integer, seconds a cached model can be reused
+            max_entries: Integer, entries kept before evicting the least
+                         recently used ones
+            hits: Integer, models restored from the cache
+            misses: Integer, models loaded from the database
+    """
+
+    def __init__(self, directory, ttl=3600, max_entries=32):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._validators = {}
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def index_filename(self):
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    def _read_index(self):
+        if not os.path.isfile(self.index_filename):
+            return {}
+        try:
+            fh = open(self.index_filename, 'r')
+            try:
+                return json.load(fh)
+            finally:
+                fh.close()
+        except ValueError:
+            return {}
+
+    def _write_index(self, index):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.schemasync-')
+        fh = os.fdopen(fd, 'w')
+        try:
+            json.dump(index, fh)
+        finally:
+            fh.close()
+        os.rename(tmp, self.index_filename)
+
+    def restore(self, instance, variant=''):
+        """Replace the lazily loaded model of a SchemaObject with its
+           cached model, if it is still valid.
+
+            Args:
+                instance: A SchemaObject Instance with a selected database.
+                variant: String, the filters the model was loaded with
+
+            Returns:
+                True if the cached model was restored, False otherwise.
+        """
+        if instance.connection is None:
+            return False
+
+        key = cache_key(instance, variant)
+        markers = validator(instance)
+        with self._lock:
+            self._validators[key] = markers
+            index = self._read_index()
+            entry = index.get(key)
+            now = time.time()
+            if (entry is None or entry['validator'] != markers or
+                    now - entry['created'] > self.ttl):
+                self.misses += 1
+                return False
+
+            try:
+                data = snapshot.read(os.path.join(self.directory, entry['file']))
+            except (IOError, OSError, EOFError, ValueError):
+                self.misses += 1
+                return False
+
+            entry['used'] = now
+            self._write_index(index)
+            self.hits += 1
+
+        # the databases of a SchemaObject are loaded lazily, setting them
+        # saves the SCHEMATA query
+        db = snapshot.build_database(data['database'], instance)
+        instance._databases = OrderedDict()
+        instance._databases[db.name] = db
+        return True
+
+    def store(self, instance, variant=''):
+        """Write the loaded model of a SchemaObject to the cache, evicting
+           the least recently used entries over max_entries.
+
+            Args:
+                instance: A SchemaObject Instance with a fully loaded
+                          selected database.
+                variant: String, the filters the model was loaded with
+        """
+        if instance.connection is None:
+            return
+
+        key = cache_key(instance, variant)
+        filename = hashlib.md5(key.encode('utf-8')).hexdigest() + '.snapshot.gz'
+        with self._lock:
+            markers = self._validators.get(key) or validator(instance)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.schemasync-')
+            os.close(fd)
+            snapshot.dump(instance, tmp)
+            os.rename(tmp, os.path.join(self.directory, filename))
+
+            now = time.time()
+            index = self._read_index()
+            index[key] = dict(file=filename, validator=markers, created=now, used=now)
+
+            lru = sorted(index, key=lambda k: index[k]['used'], reverse=True)
+            for k in lru[self.max_entries:]:
+                try:
+                    os.remove(os.path.join(self.directory, index[k]['file']))
+                except OSError:
+                    pass
+                del index[k]
+
+            self._write_index(index)
+
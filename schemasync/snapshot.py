@@ -0,0 +1,253 @@
+"""Schema snapshot files for Schema Sync
+
+A snapshot is the complete model of a single database (options, tables,
+columns, indexes, foreign keys, views, triggers and procedures) stored as
+gzip compressed JSON. A snapshot can be used in place of a live database
+by passing snapshot://<path> as the source or target url; syncdb then
+runs against it without a single database round trip.
+"""
+
+import gzip
+import json
+
+from schemaobject.collections import OrderedDict
+from schemaobject.option import SchemaOption
+from schemaobject.database import DatabaseSchema
+from schemaobject.table import TableSchema
+from schemaobject.column import ColumnSchema
+from schemaobject.index import IndexSchema
+from schemaobject.foreignkey import ForeignKeySchema
+from schemaobject.view import ViewSchema
+from schemaobject.trigger import TriggerSchema
+from schemaobject.procedure import ProcedureSchema
+
+SNAPSHOT_PROTOCOL = "snapshot://"
+SNAPSHOT_FORMAT = 1
+
+COLUMN_ATTRS = ('name', 'ordinal_position', 'type', 'charset', 'collation',
+                'null', 'key', 'default', 'extra', 'comment')
+INDEX_ATTRS = ('name', 'table_name', 'non_unique', 'type', 'kind',
+               'collation', 'comment')
+FOREIGN_KEY_ATTRS = ('name', 'symbol', 'table_schema', 'table_name',
+                     'referenced_table_schema', 'referenced_table_name',
+                     'columns', 'referenced_columns', 'match_option',
+                     'update_rule', 'delete_rule')
+VIEW_ATTRS = ('name', 'definition')
+TRIGGER_ATTRS = ('name', 'statement', 'timing', 'event', 'table')
+PROCEDURE_ATTRS = ('name', 'definition', 'raw_definition')
+
+
+def is_snapshot_url(url):
+    """Return True if url points to a snapshot file (snapshot://<path>)"""
+    return bool(url) and url.startswith(SNAPSHOT_PROTOCOL)
+
+
+def snapshot_path(url):
+    """Return the filename of a snapshot:// url"""
+    return url[len(SNAPSHOT_PROTOCOL):]
+
+
+class SnapshotTable(TableSchema):
+    """A TableSchema whose CREATE TABLE statement is read from the snapshot
+       instead of SHOW CREATE TABLE.
+    """
+
+    def __init__(self, name, parent, create_sql=None):
+        super(SnapshotTable, self).__init__(name, parent)
+        self.create_sql = create_sql
+
+    def create(self):
+        return self.create_sql
+
+
+class SnapshotObject(object):
+    """Stands in for a SchemaObject Instance loaded from a snapshot.
+
+        Attributes:
+            host, port, user, version: the server the snapshot was taken from
+            loader: the loader which built the model
+                    (introspect.cache_variant()), None if not recorded
+            databases: OrderedDict holding the snapshot's DatabaseSchema
+            selected: the snapshot's DatabaseSchema
+            connection: always None, a snapshot has no connection
+    """
+
+    def __init__(self, data):
+        self.connection = None
+        self.host = data['host']
+        self.port = data['port']
+        self.user = data['user']
+        self.version = data['version']
+        self.loader = data.get('loader')
+        self.databases = OrderedDict()
+
+        db = build_database(data['database'], self)
+        self.databases[db.name] = db
+        self._selected = db.name
+
+    @property
+    def selected(self):
+        return self.databases[self._selected]
+
+
+def _attrs(obj, names):
+    return dict((n, getattr(obj, n)) for n in names)
+
+
+def _set_attrs(obj, data, names):
+    for n in names:
+        setattr(obj, n, data.get(n))
+    return obj
+
+
+def _options(options):
+    return [[k, options[k].name, options[k].value] for k in options]
+
+
+def _set_options(options, data):
+    for key, name, value in data:
+        options[key] = SchemaOption(name, value)
+
+
+def serialize(instance, loader=None):
+    """Return the model of the selected database of a SchemaObject
+       as a dictionary of JSON serializable values.
+
+        Args:
+            instance: A SchemaObject (or SnapshotObject) Instance.
+            loader: string (optional), the loader which built the model
+                    (introspect.cache_variant()). The loader of a
+                    SnapshotObject is kept.
+    """
+    db = instance.selected
+    tables = []
+    for t in db.tables:
+        table = db.tables[t]
+        tables.append({
+            'name': table.name,
+            'create': table.create(),
+            'options': _options(table.options),
+            'columns': [_attrs(table.columns[c], COLUMN_ATTRS) for c in table.columns],
+            'indexes': [dict(_attrs(table.indexes[i], INDEX_ATTRS),
+                             fields=[list(f) for f in table.indexes[i].fields])
+                        for i in table.indexes],
+            'foreign_keys': [_attrs(table.foreign_keys[f], FOREIGN_KEY_ATTRS)
+                             for f in table.foreign_keys],
+        })
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'host': instance.host,
+        'port': instance.port,
+        'user': instance.user,
+        'version': instance.version,
+        'loader': loader or getattr(instance, 'loader', None),
+        'database': {
+            'name': db.name,
+            'options': _options(db.options),
+            'tables': tables,
+            'views': [_attrs(db.views[v], VIEW_ATTRS) for v in db.views],
+            'triggers': [_attrs(db.triggers[t], TRIGGER_ATTRS) for t in db.triggers],
+            'procedures': [_attrs(db.procedures[p], PROCEDURE_ATTRS) for p in db.procedures],
+        },
+    }
+
+
+def build_database(data, parent):
+    """Return a fully loaded DatabaseSchema from serialized data"""
+    db = DatabaseSchema(name=data['name'], parent=parent)
+    _set_options(db.options, data['options'])
+
+    db._tables = OrderedDict()
+    for t in data['tables']:
+        table = SnapshotTable(name=t['name'], parent=db, create_sql=t['create'])
+        _set_options(table.options, t['options'])
+
+        table._columns = OrderedDict()
+        for c in t['columns']:
+            column = _set_attrs(ColumnSchema(name=c['name'], parent=table), c, COLUMN_ATTRS)
+            column.field = column.name
+            table._columns[column.name] = column
+
+        table._indexes = OrderedDict()
+        for i in t['indexes']:
+            index = _set_attrs(IndexSchema(name=i['name'], parent=table), i, INDEX_ATTRS)
+            index.fields = [tuple(f) for f in i['fields']]
+            table._indexes[index.name] = index
+
+        table._foreign_keys = OrderedDict()
+        for f in t['foreign_keys']:
+            fk = _set_attrs(ForeignKeySchema(name=f['name'], parent=table), f, FOREIGN_KEY_ATTRS)
+            table._foreign_keys[fk.name] = fk
+
+        db._tables[table.name] = table
+
+    db._views = OrderedDict()
+    for v in data['views']:
+        db._views[v['name']] = _set_attrs(ViewSchema(name=v['name'], parent=db), v, VIEW_ATTRS)
+
+    db._triggers = OrderedDict()
+    for t in data['triggers']:
+        db._triggers[t['name']] = _set_attrs(TriggerSchema(name=t['name'], parent=db), t, TRIGGER_ATTRS)
+
+    db._procedures = OrderedDict()
+    for p in data['procedures']:
+        db._procedures[p['name']] = _set_attrs(ProcedureSchema(name=p['name'], parent=db), p, PROCEDURE_ATTRS)
+
+    return db
+
+
+def dump(instance, filename, loader=None):
+    """Write the model of the selected database of a SchemaObject
+       to a snapshot file.
+
+        Args:
+            instance: A SchemaObject (or SnapshotObject) Instance.
+            filename: string, the snapshot file to (over)write.
+            loader: string (optional), passed to serialize()
+    """
+    data = json.dumps(serialize(instance, loader), separators=(',', ':'), default=str)
+    fh = gzip.open(filename, 'wb')
+    try:
+        fh.write(data.encode('utf-8'))
+    finally:
+        fh.close()
+
+
+def read(filename):
+    """Read the serialized data of a snapshot file.
+
+        Args:
+            filename: string, the snapshot file to read.
+
+        Returns:
+            A dictionary, as returned by serialize().
+
+        Raises:
+            ValueError if the file is not a supported snapshot.
+    """
+    fh = gzip.open(filename, 'rb')
+    try:
+        data = json.loads(fh.read().decode('utf-8'))
+    finally:
+        fh.close()
+
+    if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError("%s is not a Schema Sync snapshot" % filename)
+
+    return data
+
+
+def load(filename):
+    """Read a snapshot file.
+
+        Args:
+            filename: string, the snapshot file to read.
+
+        Returns:
+            A SnapshotObject Instance.
+
+        Raises:
+            ValueError if the file is not a supported snapshot.
+    """
+    return SnapshotObject(read(filename))
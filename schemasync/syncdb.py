@@ -1,3 +1,6 @@
+import bisect
+import contextlib
+
 from utils import REGEX_TABLE_AUTO_INC, REGEX_TABLE_COMMENT
 
 
@@ -11,6 +14,15 @@ def sync_schema(fromdb, todb, options):
         options: dictionary of options to use when syncing schemas
             sync_auto_inc: Bool, sync auto inc value throughout the schema?
             sync_comments: Bool, sync comment fields trhoughout the schema?
+            skip_tables: set (optional), names of tables known to be in sync.
+                         They are not compared.
+            table_digests: tuple (optional) of dictionaries of table name =>
+                           digest for fromdb and todb. Tables with equal
+                           digests are in sync and are not compared.
+            planner: planner.AlterPlanner (optional), builds the
+                     ALTER TABLE statement of each table.
+            profiler: timing.Profiler (optional), times the comparison
+                      of each table.
 
     Yields:
         A tuple (patch, revert) containing the next SQL statement needed
@@ -35,8 +47,15 @@ def sync_schema(fromdb, todb, options):
                                     sync_comments=options['sync_comments']):
         yield p, r
 
+    skip_tables = options.get('skip_tables') or ()
+    profiler = options.get('profiler')
+    from_digests, to_digests = options.get('table_digests') or ({}, {})
+
     for t in fromdb.tables:
-        if t not in todb.tables:
+        if t not in todb.tables or t in skip_tables:
+            continue
+
+        if t in from_digests and from_digests[t] == to_digests.get(t):
             continue
 
         from_table = fromdb.tables[t]
@@ -44,16 +63,29 @@ def sync_schema(fromdb, todb, options):
 
         plist = []
         rlist = []
-        for p, r in sync_table(from_table, to_table, options):
-            plist.append(p)
-            rlist.append(r)
+        with profiler.table(t) if profiler else untimed():
+            for p, r in sync_table(from_table, to_table, options):
+                plist.append(p)
+                rlist.append(r)
 
         if plist and rlist:
+            order = revert_order(rlist, from_table.columns, to_table.columns,
+                                 sync_comments=options['sync_comments'])
+            if options.get('planner'):
+                yield options['planner'].alter(to_table, plist, rlist, from_table,
+                                               revert_order=order)
+                continue
+
             p = "%s %s;" % (to_table.alter(), ', '.join(plist))
-            r = "%s %s;" % (to_table.alter(), ', '.join(rlist))
+            r = "%s %s;" % (to_table.alter(), ', '.join(rlist[i] for i in order))
             yield p, r
 
 
+@contextlib.contextmanager
+def untimed():
+    yield
+
+
 def sync_table(from_table, to_table, options):
     """Generate the SQL statements needed to sync two Tables and all of their
        children (Columns, Indexes, Foreign Keys)
@@ -249,6 +281,53 @@ def get_previous_item(lst, item):
     return None
 
 
+def get_previous_items(lst):
+    """ Map every item of the list to its previous item
+        If an item appears more than once in the list, its first index is used
+
+        Args:
+            lst: the list to map
+
+        Returns: A dict of item => previous item (None for the first item)
+    """
+    previous = {}
+    for i, item in enumerate(lst):
+        if item not in previous:
+            previous[item] = lst[i - 1] if i > 0 else None
+    return previous
+
+
+def longest_increasing_subsequence(seq):
+    """ Find a longest strictly increasing subsequence in O(n log n)
+
+        Args:
+            seq: the list of comparable values to search
+
+        Returns: The set of indexes of seq making up the subsequence
+    """
+    tails = []          # tails[k]: index ending the best run of length k + 1
+    tail_values = []
+    prev = [None] * len(seq)
+
+    for i, value in enumerate(seq):
+        k = bisect.bisect_left(tail_values, value)
+        if k > 0:
+            prev[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    result = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        result.add(i)
+        i = prev[i]
+    return result
+
+
 def sync_created_columns(from_cols, to_cols, sync_comments=False):
     """Generate the SQL statements needed to ADD Columns to the target
        table (patch) and remove them (revert)
@@ -261,10 +340,10 @@ def sync_created_columns(from_cols, to_cols, sync_comments=False):
     Yields:
         A tuple (patch, revert) containing the next SQL statements
     """
+    from_prev = get_previous_items(from_cols.keys())
     for c in from_cols:
         if c not in to_cols:
-            fprev = get_previous_item(from_cols.keys(), c)
-            yield (from_cols[c].create(after=fprev, with_comment=sync_comments),
+            yield (from_cols[c].create(after=from_prev[c], with_comment=sync_comments),
                    from_cols[c].drop())
 
 
@@ -280,11 +359,11 @@ def sync_dropped_columns(from_cols, to_cols, sync_comments=False):
     Yields:
         A tuple (patch, revert) containing the next SQL statements
     """
+    to_prev = get_previous_items(to_cols.keys())
     for c in to_cols:
         if c not in from_cols:
-            tprev = get_previous_item(to_cols.keys(), c)
             yield (to_cols[c].drop(),
-                   to_cols[c].create(after=tprev, with_comment=sync_comments))
+                   to_cols[c].create(after=to_prev[c], with_comment=sync_comments))
 
 
 def sync_modified_columns(from_cols, to_cols, sync_comments=False):
@@ -297,35 +376,75 @@ def sync_modified_columns(from_cols, to_cols, sync_comments=False):
         sync_comments: Bool (default=False), sync the comment field for each column?
 
     Yields:
-        A tuple (patch, revert) containing the next SQL statements
+        A tuple (patch, revert) containing the next SQL statements,
+        in the order of from_cols. See revert_order() for the order
+        in which to apply the reverts.
+    """
+    from_prev = get_previous_items(from_cols.keys())
+    to_prev = get_previous_items(to_cols.keys())
+
+    for name in modified_columns(from_cols, to_cols, sync_comments):
+        yield (from_cols[name].modify(after=from_prev[name], with_comment=sync_comments),
+               to_cols[name].modify(after=to_prev[name], with_comment=sync_comments))
+
+
+def revert_order(rlist, from_cols, to_cols, sync_comments=False):
+    """Return the indexes of the revert clauses of a table in the order
+       to apply them.
+
+    Each MODIFY COLUMN ... AFTER moves a column after its predecessor, so
+    a sequence of moves only restores an order when it follows that order.
+    The moves of sync_modified_columns() come in the order of from_cols,
+    their reverts are applied in the order of to_cols. The other clauses
+    keep their place.
+
+    Args:
+        rlist: list of the revert clauses of a table, as yielded by sync_table()
+        from_cols: A OrderedDict of SchemaObject.ColumnSchema Instances.
+        to_cols: A OrderedDict of SchemaObject.ColumnSchema Instances.
+        sync_comments: Bool (default=False), sync the comment field for each column?
+
+    Returns: A list of indexes of rlist
+    """
+    order = list(range(len(rlist)))
+    slots = [i for i, r in enumerate(rlist) if r.startswith("MODIFY COLUMN ")]
+    if not slots:
+        return order
+
+    to_position = dict((c, i) for i, c in enumerate(to_cols.keys()))
+    names = modified_columns(from_cols, to_cols, sync_comments)
+    moves = sorted(zip(slots, names), key=lambda move: to_position[move[1]])
+    for slot, (i, name) in zip(slots, moves):
+        order[slot] = i
+    return order
+
+
+def modified_columns(from_cols, to_cols, sync_comments=False):
+    """Return the names of the Columns to MODIFY in the target table,
+       the columns whose definition changed or which moved, in the
+       order of from_cols.
+
+    Args:
+        from_cols: A OrderedDict of SchemaObject.ColumnSchema Instances.
+        to_cols: A OrderedDict of SchemaObject.ColumnSchema Instances.
+        sync_comments: Bool (default=False), sync the comment field for each column?
+
+    Returns: A list of column names
     """
     # find the column names comomon to each table
     # and retain the order in which they appear
     from_names = [c for c in from_cols.keys() if c in to_cols]
-    to_names = [c for c in to_cols.keys() if c in from_cols]
-
-    for from_idx, name in enumerate(from_names):
+    to_position = dict((c, i) for i, c in enumerate(c for c in to_cols.keys() if c in from_cols))
 
-        to_idx = to_names.index(name)
+    # the columns of the longest run appearing in the same order in both
+    # tables stay in place, moving every other column is the minimal
+    # set of moves.
+    in_place = longest_increasing_subsequence([to_position[c] for c in from_names])
 
-        if ((from_idx != to_idx) or
+    return [name for from_idx, name in enumerate(from_names)
+            if ((from_idx not in in_place) or
                 (to_cols[name] != from_cols[name]) or
-                (sync_comments and (from_cols[name].comment != to_cols[name].comment))):
-
-            # move the element to its correct spot as we do comparisons
-            # this will prevent a domino effect of off-by-one false positives.
-            if from_names.index(to_names[from_idx]) > to_idx:
-                name = to_names[from_idx]
-                from_names.remove(name)
-                from_names.insert(from_idx, name)
-            else:
-                to_names.remove(name)
-                to_names.insert(from_idx, name)
-
-            fprev = get_previous_item(from_cols.keys(), name)
-            tprev = get_previous_item(to_cols.keys(), name)
-            yield (from_cols[name].modify(after=fprev, with_comment=sync_comments),
-                   to_cols[name].modify(after=tprev, with_comment=sync_comments))
+                (sync_comments and (from_cols[name].comment != to_cols[name].comment)))]
 
 
 def sync_created_constraints(src, dest):
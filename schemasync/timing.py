@@ -0,0 +1,150 @@
+"""Phase timing for Schema Sync runs (--profile)
+
+A run is split into phases (connect, introspect, fingerprints, diff of
+each object kind, save, apply). The Profiler records the wall-clock and
+CPU time of every phase, and of the comparison of every table. The time
+spent in the PatchBuffer filters is also recorded on its own, as the
+'filter' phase. The connections to the source and target are wrapped in
+QueryCounters, the queries issued during each phase and table are
+recorded with it.
+
+The report is written as JSON next to the patch scripts, optionally along
+with a cProfile dump of the whole run.
+"""
+
+import json
+import time
+import cProfile
+import contextlib
+
+from introspect import QueryCounter
+
+if hasattr(time, 'process_time'):
+    cpu_time = time.process_time
+else:
+    cpu_time = time.clock
+
+
+class Profiler(object):
+    """Records the time and queries of the phases of a run.
+
+        A disabled Profiler records nothing, so the run does not have to
+        check whether it is profiled.
+
+        Attributes:
+            enabled: Bool, record the timings?
+            phases: list of dictionaries (name, wall, cpu, queries)
+            tables: dictionary of table name => dictionary (wall, cpu, queries)
+            counters: dictionary of side ('source', 'target') => QueryCounter
+            cprofile: cProfile.Profile of the run, or None
+    """
+
+    def __init__(self, enabled=True, cprofile=False):
+        self.enabled = enabled
+        self.phases = []
+        self.tables = {}
+        self.counters = {}
+        self.cprofile = None
+        self._open = {}
+        self._start = (time.time(), cpu_time())
+
+        if enabled and cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def _mark(self):
+        return (time.time(), cpu_time(), self.queries())
+
+    def _elapsed(self, mark):
+        wall, cpu, queries = self._mark()
+        return dict(wall=wall - mark[0], cpu=cpu - mark[1], queries=queries - mark[2])
+
+    def queries(self):
+        """Return the number of queries issued so far"""
+        return sum(c.queries for c in self.counters.values())
+
+    def count_queries(self, side, instance):
+        """Wrap the connection of a SchemaObject in a QueryCounter"""
+        if not self.enabled or instance.connection is None:
+            return
+        if not isinstance(instance.connection, QueryCounter):
+            instance.connection = QueryCounter(instance.connection)
+        self.counters[side] = instance.connection
+
+    def start(self, name):
+        """Start timing a phase"""
+        if self.enabled:
+            self._open[name] = self._mark()
+
+    def stop(self, name):
+        """Stop timing a phase, and record it"""
+        if self.enabled and name in self._open:
+            self.phases.append(dict(self._elapsed(self._open.pop(name)), name=name))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block as a phase"""
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    @contextlib.contextmanager
+    def table(self, name):
+        """Time the enclosed block as the comparison of a table"""
+        if not self.enabled:
+            yield
+            return
+        mark = self._mark()
+        try:
+            yield
+        finally:
+            self.tables[name] = self._elapsed(mark)
+
+    def wrap_filters(self, filters):
+        """Return the PatchBuffer filters, timed as the 'filter' phase"""
+        if not self.enabled:
+            return filters
+
+        def timed(fn):
+            def run(data):
+                mark = self._mark()
+                try:
+                    return fn(data)
+                finally:
+                    self._add_phase('filter', self._elapsed(mark))
+            return run
+        return tuple(timed(f) for f in filters)
+
+    def _add_phase(self, name, elapsed):
+        for phase in self.phases:
+            if phase['name'] == name:
+                for k in ('wall', 'cpu', 'queries'):
+                    phase[k] += elapsed[k]
+                return
+        self.phases.append(dict(elapsed, name=name))
+
+    def report(self):
+        """Return the timing report as a dictionary"""
+        return dict(wall=time.time() - self._start[0],
+                    cpu=cpu_time() - self._start[1],
+                    phases=self.phases,
+                    tables=self.tables,
+                    queries=dict((side, dict(count=c.queries, seconds=c.elapsed))
+                                 for side, c in self.counters.items()))
+
+    def write(self, filename, cprofile_filename=None):
+        """Write the JSON report, and the cProfile dump if one was recorded"""
+        if not self.enabled:
+            return
+        if self.cprofile is not None and cprofile_filename:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(cprofile_filename)
+
+        fh = open(filename, 'w')
+        try:
+            json.dump(self.report(), fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        finally:
+            fh.close()
@@ -5,6 +5,9 @@ import os
 import datetime
 import glob
 import io
+import shutil
+import tempfile
+import threading
 
 # REGEX_NO_TICKS = re.compile('`')
 # REGEX_INT_SIZE = re.compile('int\(\d+\)')
@@ -15,6 +18,76 @@ REGEX_TABLE_COMMENT = re.compile(r"COMMENT(?:(?:\s*=\s*)|\s*)'(.*?)'", re.I)
 REGEX_TABLE_AUTO_INC = re.compile(r"AUTO_INCREMENT(?:(?:\s*=\s*)|\s*)(\d+)", re.I)
 REGEX_SEMICOLON_EXPLODE_TO_NEWLINE = re.compile(r';\s+')
 
+# tokens of a patch for normalize_patch(): a routine definition, a run of
+# text left as is (words, single spaces, quoted strings and identifiers,
+# /* */ comments) with the semicolon ending it, a line comment, a
+# semicolon or a run of whitespace
+REGEX_PATCH_TOKEN = re.compile(r"""
+      (?P<body>DELIMITER\ ;;\s+.*?;;\s*)
+    | (?P<plain>(?:[^\s;'"`\#/-]+(?:\s[^\s;'"`\#/-]+)*
+                 |\s(?=[^\s;])
+                 |`[^`]*`
+                 |'[^'\\]*(?:\\.[^'\\]*)*'
+                 |"[^"\\]*(?:\\.[^"\\]*)*"
+                 |/\*.*?\*/
+                 |-(?!-\s)
+                 |/(?!\*))+)(?P<end>;\s*)?
+    | (?P<comment>(?:--(?=\s)|\#)[^\n]*\s*)
+    | (?P<semicolon>;\s*)
+    | (?P<space>\s+)
+""", re.X | re.S)
+
+
+def normalize_patch(data):
+    """Normalize the whitespace of patch data in a single scan.
+
+        Runs of whitespace collapse to a single space, each statement ends
+        with a new line and the whitespace before the final semicolon is
+        removed. Quoted strings and identifiers, comments and the
+        definitions of routines and triggers (DELIMITER ;; ... ;;) are left
+        untouched; any other text comes out as from the REGEX_MULTI_SPACE,
+        REGEX_DISTANT_SEMICOLIN and REGEX_SEMICOLON_EXPLODE_TO_NEWLINE
+        passes.
+
+        Args:
+            data: String, the patch data
+
+        Returns:
+            The normalized string.
+    """
+    last = len(data) - 1
+    while last >= 0 and data[last].isspace():
+        last -= 1
+    # REGEX_DISTANT_SEMICOLIN only matched a semicolon at the very end,
+    # or before a single final new line
+    if last < 0 or data[last] != ';' or data[last + 1:] not in ('', '\n'):
+        last = None
+
+    def token(m):
+        kind = m.lastgroup
+        if kind == 'plain':
+            return m.group(kind)
+        if kind in ('end', 'semicolon'):
+            plain = m.group('plain') if kind == 'end' else ''
+            if m.end() == last or len(m.group(kind)) == 1:
+                return plain + ';'
+            return plain + ';\n'
+        if kind == 'body':
+            body = m.group(kind).rstrip()
+            body = 'DELIMITER ;;\n' + body[len('DELIMITER ;;'):].lstrip()
+            return body + '\n' if len(body) < len(m.group(kind)) else body
+        if kind == 'comment':
+            # a line comment keeps its end of line
+            comment = m.group(kind).rstrip()
+            return comment + '\n' if len(comment) < len(m.group(kind)) else comment
+
+        space = m.group(kind)
+        if m.end() == last:
+            return ''
+        return ' ' if len(space) > 1 else space
+
+    return REGEX_PATCH_TOKEN.sub(token, data)
+
 
 def versioned(filename):
     """Return the versioned name for a file.
@@ -87,12 +160,51 @@ def compare_version(x, y, separator=r'[.-]'):
     for index in range(min(len(x_array), len(y_array))):
         if x_array[index] != y_array[index]:
             try:
-                return cmp(int(x_array[index]), int(y_array[index]))
+                x_int, y_int = int(x_array[index]), int(y_array[index])
+                return (x_int > y_int) - (x_int < y_int)
             except ValueError:
                 return 0
     return 0
 
 
+def parallel_map(fn, items, jobs=1):
+    """Apply fn to every item, using up to ``jobs`` threads.
+
+        Args:
+            fn: function taking a single item
+            items: list of items
+            jobs: integer, the maximum number of concurrent calls to fn
+
+        Returns:
+            list of tuples (result, error) in the order of items.
+            error is the exception raised by fn or None.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    lock = threading.Lock()
+    pending = iter(range(len(items)))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(pending, None)
+            if i is None:
+                return
+            try:
+                results[i] = (fn(items[i]), None)
+            except Exception as e:
+                results[i] = (None, e)
+
+    threads = [threading.Thread(target=worker)
+               for i in range(max(1, min(jobs, len(items))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return results
+
+
 class PatchBuffer(object):
     """Class for creating patch files
 
@@ -150,3 +262,95 @@ class PatchBuffer(object):
 
     def __del__(self):
         self._buffer.close()
+
+
+class StreamingPatchBuffer(PatchBuffer):
+    """PatchBuffer which writes through to a temporary file next to the
+       patch file instead of holding the patch in memory.
+
+       The filters are applied to every write (one statement at a time)
+       and save() renames the temporary file to the patch filename.
+       The header is written with the ctx of the first write; if ctx
+       changed by then, save() copies the data under the new header.
+       The template data variable %(data)s must appear once in tpl.
+       A StreamingPatchBuffer can only be saved once.
+    """
+
+    def __init__(self, name, filters, tpl, ctx, version_filename=False):
+        """Inits the StreamingPatchBuffer class"""
+        super(StreamingPatchBuffer, self).__init__(name, filters, tpl, ctx,
+                                                   version_filename)
+        self._buffer.close()
+        self._buffer = None
+        self._tmp_name = None
+        self._header, self._footer = tpl.split('%(data)s', 1)
+        self._written_header = None
+
+    def write(self, data):
+        """Filter data and write it to the temporary file."""
+        if self._buffer is None:
+            fd, self._tmp_name = tempfile.mkstemp(prefix='.schemasync-',
+                                                  dir=os.path.dirname(self.name) or '.')
+            self._buffer = os.fdopen(fd, 'w')
+            self._written_header = self._header % self.ctx
+            self._buffer.write(self._written_header)
+
+        self.modified = True
+        for f in self.filters:
+            data = f(data)
+        self._buffer.write(data)
+
+    def save(self):
+        """Complete the temporary file and rename it to the patch filename"""
+        if self._buffer is None:
+            return False
+
+        self._buffer.write(self._footer % self.ctx)
+        self._buffer.close()
+        self._buffer = None
+
+        header = self._header % self.ctx
+        if header != self._written_header:
+            self._replace_header(header)
+
+        if self.version_filename:
+            self.name = versioned(self.name)
+        os.rename(self._tmp_name, self.name)
+        self._tmp_name = None
+
+        return True
+
+    def _replace_header(self, header):
+        """Copy the temporary file under a new header"""
+        fd, tmp_name = tempfile.mkstemp(prefix='.schemasync-',
+                                        dir=os.path.dirname(self.name) or '.')
+        dest = os.fdopen(fd, 'w')
+        src = open(self._tmp_name, 'r')
+        try:
+            dest.write(header)
+            src.read(len(self._written_header))
+            shutil.copyfileobj(src, dest)
+        except Exception:
+            os.unlink(tmp_name)
+            raise
+        finally:
+            src.close()
+            dest.close()
+        os.unlink(self._tmp_name)
+        self._tmp_name = tmp_name
+        self._written_header = header
+
+    def delete(self):
+        """Delete the temporary file, or the patch once it has been written to disk"""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        if self._tmp_name and os.path.isfile(self._tmp_name):
+            os.unlink(self._tmp_name)
+            self._tmp_name = None
+        else:
+            super(StreamingPatchBuffer, self).delete()
+
+    def __del__(self):
+        if self._buffer is not None:
+            self.delete()
@@ -0,0 +1,335 @@
+"""Watch mode: continuous drift monitoring for Schema Sync
+
+schemasync watch keeps its connections and the loaded source and target
+models between polls. Every interval one query per server reads cheap
+change markers of the selected database:
+
+    tables      CREATE_TIME, UPDATE_TIME and the table digest
+                (see fingerprint)
+    views       MD5 of the definition
+    triggers    MD5 of the timing, event, table and statement
+    routines    CREATED and LAST_ALTERED
+
+Only the objects whose markers changed (or which appeared or
+disappeared) are introspected again, and only they are compared again.
+A drift event is emitted when an object starts to differ or its
+difference changes, a resolved event when it is back in sync:
+
+    {"event": "drift", "time": "2026-10-18T03:00:00",
+     "source": "mysql://localhost/sakila", "target": "mysql://db2/sakila",
+     "kind": "table", "name": "rental", "records": [...]}
+
+records are the diffstream records of the object. Events are written to
+the log (or an NDJSON file) and can be POSTed to a local HTTP endpoint.
+The database options are compared when the watch starts only.
+
+On MySQL 8.0 the information_schema table statistics are cached per
+session (information_schema_stats_expiry), the cache is disabled on the
+watch connections when the watch starts and whenever they reconnect.
+"""
+
+import re
+import json
+import time
+import logging
+import datetime
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen
+
+import schemaobject
+
+import introspect
+import diffstream
+import fingerprint
+import objectfilter
+
+# the table digest covers the columns, indexes, foreign keys and options,
+# which INSTANT/INPLACE ALTERs change without changing CREATE_TIME
+SQL_MARKERS = """
+    SELECT 'table' AS KIND, T.TABLE_NAME AS NAME,
+           CONCAT_WS('|', T.CREATE_TIME, T.UPDATE_TIME, D.DIGEST) AS MARKER
+    FROM information_schema.`TABLES` T
+    JOIN (""" + fingerprint.SQL_TABLE_DIGESTS + """) D ON D.TABLE_NAME = T.TABLE_NAME
+    WHERE T.TABLE_SCHEMA = %(db)s
+    AND NOT ISNULL(T.ENGINE)
+    UNION ALL
+    SELECT 'view', TABLE_NAME, MD5(VIEW_DEFINITION)
+    FROM information_schema.VIEWS
+    WHERE TABLE_SCHEMA = %(db)s
+    UNION ALL
+    SELECT 'trigger', TRIGGER_NAME,
+           MD5(CONCAT_WS('|', ACTION_TIMING, EVENT_MANIPULATION,
+                         EVENT_OBJECT_TABLE, ACTION_STATEMENT))
+    FROM information_schema.TRIGGERS
+    WHERE TRIGGER_SCHEMA = %(db)s
+    UNION ALL
+    SELECT 'routine', ROUTINE_NAME, CONCAT_WS('|', CREATED, LAST_ALTERED)
+    FROM information_schema.ROUTINES
+    WHERE ROUTINE_SCHEMA = %(db)s
+    AND ROUTINE_TYPE = 'PROCEDURE'
+    """
+
+MODEL_ATTRIBUTES = (('table', '_tables'), ('view', '_views'),
+                    ('trigger', '_triggers'), ('routine', '_procedures'))
+
+
+def markers(instance, object_filter=None):
+    """Return a dictionary of (kind, name) => change marker for the
+       objects of the selected database of a SchemaObject.
+
+       Snapshots do not change, an empty dictionary is returned.
+    """
+    if instance.connection is None:
+        return {}
+
+    rows = instance.connection.execute(SQL_MARKERS, dict(db=instance.selected.name,
+                                                         sync_auto_inc=False,
+                                                         sync_comments=True))
+    return dict(((row['KIND'], row['NAME']), row['MARKER']) for row in rows or []
+                if not object_filter or object_filter.match(row['KIND'], row['NAME']))
+
+
+def prepare(instance):
+    """Set up the session of a SchemaObject connection for markers():
+       no stale information_schema statistics, room for the digests.
+    """
+    if instance.connection is None:
+        return
+
+    fingerprint.expire_statistics(instance)
+    instance.connection.execute(fingerprint.SQL_GROUP_CONCAT_MAX_LEN)
+
+
+def ping(instance):
+    """Reconnect the connection of a SchemaObject if the server closed it
+       (wait_timeout) since the previous poll, and prepare() the new
+       session.
+
+        Returns:
+            True if the connection was reconnected
+    """
+    conn = getattr(instance.connection, '_db', None)
+    if conn is None:
+        return False
+
+    thread_id = getattr(conn, 'server_thread_id', None)
+    conn.ping(reconnect=True)
+    if getattr(conn, 'server_thread_id', None) == thread_id:
+        return False
+    prepare(instance)
+    return True
+
+
+def changes(previous, current):
+    """Return the set of (kind, name) whose markers differ"""
+    return set(k for k in set(previous) | set(current)
+               if previous.get(k) != current.get(k))
+
+
+def object_keys(database):
+    """Return the set of (kind, name) of the objects of a loaded database"""
+    return set((kind, name) for kind, attr in MODEL_ATTRIBUTES
+               for name in getattr(database, attr))
+
+
+def reload(instance, keys, object_filter=None):
+    """Introspect some objects of the selected database of a SchemaObject
+       again and replace them in its (fully loaded) model, in place.
+       Objects which no longer exist are removed.
+
+        Args:
+            instance: A SchemaObject Instance.
+            keys: iterable of (kind, name), kind in objectfilter.KINDS
+            object_filter: objectfilter.ObjectFilter (optional), the objects
+                           it does not select are left out of the model.
+    """
+    conn = instance.connection
+    if conn is None:
+        return
+
+    database = instance.selected
+    loaders = {'table': lambda f: introspect.load_tables(conn, database, f),
+               'view': lambda f: introspect.load_views(conn, database, f),
+               'trigger': lambda f: introspect.load_triggers(conn, database, f),
+               'routine': lambda f: (introspect.load_procedures(conn, database, f)
+                                     if introspect.bulk_procedures(instance)
+                                     else introspect.show_create_procedures(database, f))}
+
+    for kind, attr in MODEL_ATTRIBUTES:
+        names = sorted(name for k, name in keys if k == kind)
+        if not names:
+            continue
+
+        # one query per kind (per list for tables), for the changed names only
+        selected = objectfilter.ObjectFilter(
+            include=["%s:/^%s$/" % (kind, re.escape(name)) for name in names])
+        loaded = loaders[kind](selected)
+
+        objects = getattr(database, attr)
+        for name in names:
+            if name in objects:
+                pos = objects.index(name)
+                del objects[name]
+                if name in loaded:
+                    objects.insert(pos, (name, loaded[name]))
+            elif name in loaded:
+                objects[name] = loaded[name]
+
+    if object_filter:
+        object_filter.prune(database)
+
+
+class LogSink(object):
+    """Writes events to the log, or as NDJSON to a file."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+
+    def emit(self, event):
+        if not self.filename:
+            log = logging.warning if event['event'] == 'drift' else logging.info
+            log("%s: %s %s (%d changes)" % (event['event'], event['kind'],
+                                             event['name'], len(event['records'])))
+            return
+
+        fh = open(self.filename, 'a')
+        try:
+            fh.write(json.dumps(event) + '\n')
+        finally:
+            fh.close()
+
+
+class HttpSink(object):
+    """POSTs each event as JSON to an HTTP endpoint. A failed request is
+       logged, the watch goes on.
+    """
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, event):
+        request = Request(self.url, data=json.dumps(event).encode('utf-8'),
+                          headers={'Content-Type': 'application/json'})
+        try:
+            urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            logging.error("Failed posting the %s event of %s %s to %s: %s"
+                          % (event['event'], event['kind'], event['name'], self.url, e))
+
+
+class Watcher(object):
+    """Compares a source and a target model kept in memory, again for
+       the objects which changed since the previous poll.
+
+        Attributes:
+            source, target: SchemaObject (or SnapshotObject) Instances,
+                            with fully loaded selected databases
+            options: dictionary of options, as for diffstream.records()
+            sinks: list of LogSink / HttpSink, receiving the events
+            object_filter: objectfilter.ObjectFilter (optional)
+            drift: dictionary of (kind, name) => records of the objects
+                   which currently differ
+            markers: tuple of the source and target markers of the last poll
+    """
+
+    def __init__(self, source, target, options, sinks=(), object_filter=None):
+        self.source = source
+        self.target = target
+        self.options = options
+        self.sinks = list(sinks)
+        self.object_filter = object_filter
+        self.drift = {}
+        self.markers = ({}, {})
+
+    def url(self, instance):
+        return "mysql://%s/%s" % (instance.host, instance.selected.name)
+
+    def start(self):
+        """Read the markers and compare every object.
+
+            Returns:
+                the list of events, one per drifted object
+        """
+        prepare(self.source)
+        prepare(self.target)
+        self.markers = (markers(self.source, self.object_filter),
+                        markers(self.target, self.object_filter))
+        keys = object_keys(self.source.selected) | object_keys(self.target.selected)
+
+        events = []
+        records = list(diffstream.database_option_records(self.source.selected,
+                                                          self.target.selected))
+        if records:
+            name = self.target.selected.name
+            self.drift[('database', name)] = records
+            events.append(self._event('drift', 'database', name, records))
+        return self._emit(events + self._compare(keys))
+
+    def poll(self):
+        """Introspect and compare again the objects whose markers changed.
+
+            Returns:
+                the list of events
+        """
+        ping(self.source)
+        ping(self.target)
+        current = (markers(self.source, self.object_filter),
+                   markers(self.target, self.object_filter))
+        changed_source = changes(self.markers[0], current[0])
+        changed_target = changes(self.markers[1], current[1])
+
+        reload(self.source, changed_source, self.object_filter)
+        reload(self.target, changed_target, self.object_filter)
+        self.markers = current
+
+        return self._emit(self._compare(changed_source | changed_target))
+
+    def run(self, interval, polls=None, sleep=time.sleep):
+        """Start, then poll every interval seconds (polls times, forever
+           if None). A failed poll is logged and retried at the next one.
+        """
+        self.start()
+        logging.info("Watching %s and %s every %ss, %d objects drifted."
+                     % (self.url(self.source), self.url(self.target),
+                        interval, len(self.drift)))
+        n = 0
+        while polls is None or n < polls:
+            sleep(interval)
+            n += 1
+            try:
+                self.poll()
+            except schemaobject.connection.DatabaseError as e:
+                logging.error("Poll failed, MySQL Error %d: %s" % (e.args[0], e.args[1]))
+
+    def _compare(self, keys):
+        events = []
+        for kind, name in sorted(keys):
+            records = diffstream.object_diff(kind, name, self.source.selected,
+                                             self.target.selected, self.options)
+            previous = self.drift.get((kind, name))
+            if records and records != previous:
+                self.drift[(kind, name)] = records
+                events.append(self._event('drift', kind, name, records))
+            elif not records and previous:
+                del self.drift[(kind, name)]
+                events.append(self._event('resolved', kind, name, []))
+        return events
+
+    def _emit(self, events):
+        for event in events:
+            for sink in self.sinks:
+                sink.emit(event)
+        return events
+
+    def _event(self, event, kind, name, records):
+        return {'event': event,
+                'time': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+                'source': self.url(self.source),
+                'target': self.url(self.target),
+                'kind': kind,
+                'name': name,
+                'records': records}
@@ -2,9 +2,25 @@
 import unittest
 from test_sync_database import TestSyncDatabase
 from test_sync_tables import TestSyncTables
-from test_sync_columns import TestSyncColumns
+from test_sync_columns import TestSyncColumns, TestColumnOrder
 from test_sync_constraints import TestSyncConstraints
-from test_utils import TestVersioned, TestPNames, TestPatchBuffer
+from test_utils import TestVersioned, TestPNames, TestParallelMap, TestPatchBuffer, TestStreamingPatchBuffer, TestNormalizePatch
+from test_introspect import TestBulkLoad, TestLoadConcurrently
+from test_snapshot import TestSnapshot
+from test_schemacache import TestSchemaCache
+from test_pool import TestConnectionPool, TestLockedConnection
+from test_drift import TestDriftClusters
+from test_diffstream import TestDiffStream
+from test_watch import TestWatch
+from test_schemasync import TestApp
+from test_executor import TestExecutor, TestWaveExecutor
+from test_depgraph import TestDependencyGraph
+from test_planner import TestAlterPlanner
+from test_cost import TestCostEstimator
+from test_online import TestOnlineMigrator
+from test_timing import TestProfiler
+from test_objectfilter import TestObjectFilter, TestObjectCategories
+from test_fingerprint import TestFingerprints, TestIncrementalState
 from test_regex import TestTableCommentRegex, TestTableAutoIncrementRegex, TestMultiSpaceRegex,TestFileCounterRegex,TestDistantSemiColonRegex
 
 def get_database_url():
@@ -26,10 +42,35 @@ def regressionTest():
                   TestSyncDatabase,
                   TestSyncTables,
                   TestSyncColumns,
+                  TestColumnOrder,
                   TestSyncConstraints,
                   TestVersioned,
                   TestPNames,
+                  TestParallelMap,
                   TestPatchBuffer,
+                  TestStreamingPatchBuffer,
+                  TestNormalizePatch,
+                  TestBulkLoad,
+                  TestLoadConcurrently,
+                  TestSnapshot,
+                  TestSchemaCache,
+                  TestConnectionPool,
+                  TestLockedConnection,
+                  TestDriftClusters,
+                  TestDiffStream,
+                  TestWatch,
+                  TestApp,
+                  TestExecutor,
+                  TestWaveExecutor,
+                  TestDependencyGraph,
+                  TestAlterPlanner,
+                  TestCostEstimator,
+                  TestOnlineMigrator,
+                  TestProfiler,
+                  TestObjectFilter,
+                  TestObjectCategories,
+                  TestFingerprints,
+                  TestIncrementalState,
                   ]
     database_url = get_database_url()
 
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+import unittest
+import copy
+from schemasync import snapshot, planner, cost
+from test_snapshot import SAKILA_RENTAL
+
+ADD_COLUMN = "ADD COLUMN `x` int(11) NULL FIRST"
+ADD_INDEX = "ADD INDEX `idx_staff` (`staff_id`) USING BTREE"
+SIZES = {'rental': cost.TableSize(16044, 100 * cost.MB, 50 * cost.MB)}
+
+
+class TestCostEstimator(unittest.TestCase):
+
+    def setUp(self):
+        schema = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        self.table = schema.selected.tables['rental']
+
+    def estimate(self, version, clause, sizes=SIZES, max_bytes=None):
+        plan = planner.AlterPlanner(version).plan(self.table, [clause], [''])
+        return cost.CostEstimator(sizes, rate=10, max_bytes=max_bytes).estimate(plan)
+
+    def test_format_bytes(self):
+        """Test: human readable sizes"""
+        self.assertEqual("?", cost.format_bytes(None))
+        self.assertEqual("512 B", cost.format_bytes(512))
+        self.assertEqual("1.5 MB", cost.format_bytes(1.5 * cost.MB))
+
+    def test_estimates(self):
+        """Test: bytes rewritten by rebuilds, index builds and instant changes"""
+        est = self.estimate('5.7.22', ADD_COLUMN)
+        self.assertEqual(150 * cost.MB, est.bytes)
+        self.assertEqual(15.0, est.seconds)
+        self.assertEqual(100 * cost.MB, self.estimate('5.7.22', ADD_INDEX).bytes)
+        self.assertEqual(0, self.estimate('8.0.32', ADD_COLUMN).bytes)
+        self.assertEqual(None, self.estimate('5.7.22', ADD_COLUMN, sizes={}).bytes)
+
+    def test_budget(self):
+        """Test: statements over budget are held back by the planner"""
+        self.assertTrue(self.estimate('5.7.22', ADD_COLUMN, max_bytes=cost.MB).over_budget)
+        self.assertFalse(self.estimate('5.7.22', ADD_COLUMN, sizes={}, max_bytes=cost.MB).over_budget)
+
+        estimator = cost.CostEstimator(SIZES, max_bytes=cost.MB)
+        alter_planner = planner.AlterPlanner('5.7.22', estimator=estimator)
+        self.assertEqual(('', ''), alter_planner.alter(self.table, [ADD_COLUMN], ["DROP COLUMN `x`"]))
+        self.assertEqual([("ALTER TABLE `rental` ADD COLUMN `x` int(11) NULL FIRST;",
+                           "ALTER TABLE `rental` DROP COLUMN `x`;")], alter_planner.over_budget)
+
+        report = estimator.report()
+        self.assertTrue(report[1].startswith("`rental`"))
+        self.assertTrue(report[1].endswith("OVER BUDGET"))
+        self.assertEqual("1 tables over the 1.0 MB budget (--max-rebuild-bytes=1048576)", report[-1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+import unittest
+import json
+import os
+import tempfile
+from schemasync import depgraph
+
+
+class FakeObject(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def fake_database(tables, views=None, triggers=None):
+    """tables: dict of table name => list of referenced tables"""
+    return FakeObject(
+        tables=dict((t, FakeObject(foreign_keys=dict(
+            ("fk_%s_%s" % (t, r), FakeObject(referenced_table_name=r)) for r in refs)))
+            for t, refs in tables.items()),
+        views=dict((v, FakeObject(definition=d)) for v, d in (views or {}).items()),
+        triggers=dict((t, FakeObject(table=table)) for t, table in (triggers or {}).items()))
+
+
+TRIGGER = ("DELIMITER ;; CREATE TRIGGER `rental_date` BEFORE INSERT ON rental FOR EACH ROW "
+           "SET NEW.rental_date = NOW();; DELIMITER ; SELECT 1;")
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.db = fake_database(
+            {'rental': ['inventory', 'customer'], 'inventory': ['film'],
+             'film': [], 'customer': [], 'staff': []},
+            views={'film_list': "select `sakila`.`film`.`film_id` AS `FID` from `sakila`.`film`"},
+            triggers={'rental_date': 'rental'})
+
+    def waves(self, statements):
+        nodes = depgraph.build_graph([(s, "R" + s) for s in statements], self.db, self.db)
+        return [[n.patch for n in wave] for wave in depgraph.waves(nodes)]
+
+    def test_statement_object(self):
+        """Test: statements are classified by the object they change"""
+        self.assertEqual(('table', 'rental'),
+                         depgraph.statement_object("ALTER TABLE `rental` DROP COLUMN `x`;"))
+        self.assertEqual(('view', 'film_list'),
+                         depgraph.statement_object("ALTER VIEW `film_list` AS select 1;"))
+        self.assertEqual(('trigger', 'rental_date'), depgraph.statement_object(TRIGGER))
+        self.assertEqual(('database', 'sakila'),
+                         depgraph.statement_object("ALTER DATABASE `sakila` CHARACTER SET utf8;"))
+        self.assertEqual(None, depgraph.statement_object("SET @x = 1;"))
+
+    def test_independent_tables(self):
+        """Test: unrelated tables share a wave"""
+        self.assertEqual([["ALTER TABLE `staff` A;", "ALTER TABLE `film` A;",
+                           "ALTER TABLE `customer` A;"]],
+                         self.waves(["ALTER TABLE `staff` A;", "ALTER TABLE `film` A;",
+                                     "ALTER TABLE `customer` A;"]))
+
+    def test_dependencies(self):
+        """Test: foreign keys, views and triggers order the waves"""
+        self.assertEqual([["ALTER TABLE `film` A;", "ALTER TABLE `staff` A;"],
+                          ["ALTER TABLE `inventory` A;", "ALTER VIEW `film_list` AS select 1;"],
+                          ["ALTER TABLE `rental` A;"],
+                          [TRIGGER]],
+                         self.waves(["ALTER TABLE `film` A;", "ALTER TABLE `inventory` A;",
+                                     "ALTER TABLE `rental` A;", "ALTER TABLE `staff` A;",
+                                     "ALTER VIEW `film_list` AS select 1;", TRIGGER]))
+
+    def test_barriers(self):
+        """Test: database statements are executed alone"""
+        self.assertEqual([["ALTER TABLE `film` A;"],
+                          ["ALTER DATABASE `sakila` CHARACTER SET utf8;"],
+                          ["ALTER TABLE `staff` A;", "DROP TABLE `customer`;"]],
+                         self.waves(["ALTER TABLE `film` A;",
+                                     "ALTER DATABASE `sakila` CHARACTER SET utf8;",
+                                     "ALTER TABLE `staff` A;", "DROP TABLE `customer`;"]))
+
+    def test_write_plan(self):
+        """Test: the plan file lists the waves and dependencies"""
+        nodes = depgraph.build_graph([("ALTER TABLE `film` A;", "R1;"),
+                                      ("ALTER TABLE `inventory` A;", "R2;")], self.db, self.db)
+        fd, name = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            depgraph.write_plan(name, nodes, 'sakila')
+            plan = json.load(open(name))
+        finally:
+            os.remove(name)
+        self.assertEqual(2, plan['statements'])
+        self.assertEqual(2, len(plan['waves']))
+        self.assertEqual([0], plan['waves'][1][0]['depends'])
+        self.assertEqual(['table', 'inventory'], plan['waves'][1][0]['object'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+import io
+import json
+import copy
+import unittest
+from schemasync import snapshot, syncdb, diffstream
+from test_snapshot import SAKILA_RENTAL
+
+OPTIONS = dict(sync_auto_inc=False, sync_comments=False)
+
+
+def rental(target):
+    return target.selected.tables['rental']
+
+
+class TestDiffStream(unittest.TestCase):
+
+    def setUp(self):
+        self.source = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        self.target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+
+    def records(self, options=OPTIONS):
+        return list(diffstream.records(self.source.selected, self.target.selected, options))
+
+    def test_in_sync(self):
+        """Test: no record for identical schemas"""
+        self.assertEqual([], self.records())
+
+    def test_column(self):
+        """Test: a column change is a typed record with its own statements"""
+        del rental(self.target).columns['staff_id']
+        records = self.records()
+        self.assertEqual(1, len(records))
+        r = records[0]
+        self.assertEqual(('column', 'rental', 'staff_id', 'create'),
+                         (r['kind'], r['table'], r['name'], r['change']))
+        self.assertEqual(None, r['before'])
+        self.assertEqual("`staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`", r['after'])
+
+        # the same statements as the migration scripts
+        self.assertEqual(list(syncdb.sync_schema(self.source.selected, self.target.selected, OPTIONS)),
+                         [(r['patch'], r['revert'])])
+
+    def test_modified_column(self):
+        """Test: the definitions before and after a change"""
+        rental(self.target).columns['staff_id'].type = 'int(11)'
+        r = self.records()[0]
+        self.assertEqual('modify', r['change'])
+        self.assertTrue(r['before'].startswith("`staff_id` int(11)"))
+        self.assertTrue(r['after'].startswith("`staff_id` tinyint(3) unsigned"))
+        self.assertTrue(r['revert'].startswith("ALTER TABLE `rental` MODIFY COLUMN `staff_id` int(11)"))
+
+    def test_table_options(self):
+        """Test: one record per table option, AUTO_INCREMENT only if synced"""
+        rental(self.target).options['engine'].value = 'MyISAM'
+        rental(self.target).options['auto_increment'].value = 1
+        self.assertEqual([('table_option', 'engine')],
+                         [(r['kind'], r['name']) for r in self.records()])
+        self.assertEqual(2, len(self.records(dict(OPTIONS, sync_auto_inc=True))))
+
+    def test_objects(self):
+        """Test: views and procedures, created, dropped and modified"""
+        self.target.selected.views['staff_list'].definition = 'select 2 AS `ID`'
+        del self.target.selected.procedures['noop']
+        records = self.records()
+        self.assertEqual([('view', 'modify'), ('procedure', 'create')],
+                         [(r['kind'], r['change']) for r in records])
+        self.assertEqual("ALTER VIEW `staff_list` AS select 1 AS `ID`;", records[0]['patch'])
+        self.assertEqual('select 2 AS `ID`', records[0]['before'])
+
+    def test_skip_tables(self):
+        """Test: tables known to be in sync are not compared"""
+        del rental(self.target).columns['staff_id']
+        self.assertEqual([], self.records(dict(OPTIONS, skip_tables=set(['rental']))))
+
+    def test_write(self):
+        """Test: the records are written as NDJSON, one line each"""
+        del rental(self.target).columns['staff_id']
+        self.target.selected.views['staff_list'].definition = 'select 2 AS `ID`'
+        fh = io.StringIO()
+        self.assertEqual(2, diffstream.write(fh, self.source.selected, self.target.selected, OPTIONS))
+        lines = fh.getvalue().splitlines()
+        self.assertEqual(['column', 'view'], [json.loads(l)['kind'] for l in lines])
+        self.assertEqual(['kind', 'table', 'name', 'change', 'before', 'after', 'patch', 'revert'],
+                         list(json.loads(lines[0]).keys()))
+
+if __name__ == "__main__":
+    unittest.main()
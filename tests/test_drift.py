@@ -0,0 +1,85 @@
+#!/usr/bin/python
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from schemasync import drift
+
+ADD_COLUMN = ("ALTER TABLE `rental` ADD COLUMN `staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`;",
+              "ALTER TABLE `rental` DROP COLUMN `staff_id`;")
+ALTER_VIEW = ("ALTER VIEW `staff_list` AS select 1 AS `ID`;",
+              "ALTER VIEW `staff_list` AS select 2 AS `ID`;")
+
+
+class TestDriftClusters(unittest.TestCase):
+
+    def test_digest_canonical(self):
+        """Test: whitespace outside of quoted strings does not change the digest"""
+        spaced = [("ALTER TABLE  `rental`   ADD COLUMN `staff_id` tinyint(3) unsigned "
+                   "NOT NULL AFTER `rental_id` ;", ADD_COLUMN[1])]
+        self.assertEqual(drift.digest('sakila', [ADD_COLUMN]), drift.digest('sakila', spaced))
+
+        quoted = [("ALTER TABLE `rental` COMMENT = 'a  b';", "ALTER TABLE `rental` COMMENT = '';")]
+        requoted = [("ALTER TABLE `rental` COMMENT = 'a b';", "ALTER TABLE `rental` COMMENT = '';")]
+        self.assertNotEqual(drift.digest('sakila', quoted), drift.digest('sakila', requoted))
+
+    def test_digest_order_and_database(self):
+        """Test: the order of the statements and the database name matter"""
+        base = drift.digest('sakila', [ADD_COLUMN, ALTER_VIEW])
+        self.assertNotEqual(base, drift.digest('sakila', [ALTER_VIEW, ADD_COLUMN]))
+        self.assertNotEqual(base, drift.digest('sakila2', [ADD_COLUMN, ALTER_VIEW]))
+
+    def test_add(self):
+        """Test: only the first target of a cluster writes the scripts"""
+        clusters = drift.DriftClusters()
+        a, first_a = clusters.add('mysql://shard1/sakila', 'sakila', [ADD_COLUMN])
+        b, first_b = clusters.add('mysql://shard2/sakila', 'sakila', [ADD_COLUMN])
+        c, first_c = clusters.add('mysql://shard3/sakila', 'sakila', [ALTER_VIEW])
+        self.assertTrue(a is b)
+        self.assertEqual((True, False, True), (first_a, first_b, first_c))
+        self.assertEqual(2, len(clusters.clusters))
+        self.assertEqual("drift-" + a.digest[:8], a.name)
+
+    def test_add_concurrently(self):
+        """Test: a single writer per cluster with concurrent targets"""
+        clusters = drift.DriftClusters()
+        firsts = []
+
+        def add(i):
+            firsts.append(clusters.add('mysql://shard%d/sakila' % i, 'sakila', [ADD_COLUMN])[1])
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, firsts.count(True))
+        self.assertEqual(8, len(list(clusters.clusters.values())[0].targets))
+
+    def test_manifest(self):
+        """Test: the manifest lists the largest clusters first"""
+        clusters = drift.DriftClusters()
+        clusters.add('mysql://shard3/sakila', 'sakila', [ALTER_VIEW])
+        for shard in ('shard2', 'shard1'):
+            cluster = clusters.add('mysql://%s/sakila' % shard, 'sakila', [ADD_COLUMN])[0]
+        cluster.patch = 'sakila_drift.patch.sql'
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'sakila.drift.json')
+            clusters.write_manifest(filename, in_sync=['mysql://shard4/sakila'])
+            manifest = json.load(open(filename))
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(['mysql://shard1/sakila', 'mysql://shard2/sakila'],
+                         manifest['clusters'][0]['targets'])
+        self.assertEqual('sakila_drift.patch.sql', manifest['clusters'][0]['patch'])
+        self.assertEqual(1, manifest['clusters'][1]['statements'])
+        self.assertEqual(['mysql://shard4/sakila'], manifest['in_sync'])
+        self.assertEqual([], manifest['failed'])
+
+if __name__ == "__main__":
+    unittest.main()
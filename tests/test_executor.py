@@ -0,0 +1,136 @@
+#!/usr/bin/python
+import unittest
+import pymysql
+from schemasync import executor
+
+TRIGGER = ("DELIMITER ;; CREATE TRIGGER `t_ins` AFTER INSERT ON `t` FOR EACH ROW "
+           "BEGIN SET @x = 1; END;; DELIMITER ; SELECT 1;")
+
+
+class FakeCursor(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.pending = []
+
+    def execute(self, sql):
+        self.conn.round_trips += 1
+        self.pending = sql.split(";\n")
+        self.nextset()
+
+    def nextset(self):
+        if not self.pending:
+            return None
+        statement = self.pending.pop(0)
+        if 'FAIL' in statement:
+            self.pending = []
+            raise pymysql.err.OperationalError(1064, "syntax error")
+        self.conn.executed.append(statement)
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.executed = []
+        self.round_trips = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class TestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = FakeConnection()
+
+    def test_executable(self):
+        """Test: DELIMITER wrappers and trailing semicolons are removed"""
+        self.assertEqual("DROP TABLE `t`", executor.executable("DROP TABLE `t`;"))
+        self.assertEqual("CREATE TRIGGER `t_ins` AFTER INSERT ON `t` FOR EACH ROW BEGIN SET @x = 1; END",
+                         executor.executable(TRIGGER))
+
+    def test_batches(self):
+        """Test: plain statements are batched, routines are sent alone"""
+        runner = executor.Executor(self.conn, batch_size=2)
+        for p in ("A;", "B;", "C;", TRIGGER, "D;"):
+            runner.add(p, "R" + p)
+        self.assertEqual([["A;", "B;"], ["C;"], [TRIGGER], ["D;"]],
+                         [[s.patch for s in b] for b in runner.batches()])
+
+    def test_run(self):
+        """Test: every statement is applied and timed"""
+        runner = executor.Executor(self.conn, batch_size=10)
+        runner.add("ALTER TABLE `a` ADD COLUMN `x` int;", "ALTER TABLE `a` DROP COLUMN `x`;")
+        runner.add("ALTER TABLE `b` ADD COLUMN `y` int;", "ALTER TABLE `b` DROP COLUMN `y`;")
+        runner.run(session=["USE `sakila`;"])
+        self.assertEqual(["USE `sakila`",
+                          "ALTER TABLE `a` ADD COLUMN `x` int",
+                          "ALTER TABLE `b` ADD COLUMN `y` int"], self.conn.executed)
+        self.assertEqual(2, self.conn.round_trips)
+        self.assertTrue(all(s.seconds is not None for s in runner.steps))
+
+    def test_revert_on_failure(self):
+        """Test: the applied statements are reverted when a statement fails"""
+        runner = executor.Executor(self.conn, batch_size=10)
+        runner.add("A;", "RA;")
+        runner.add("B;", "RB;")
+        runner.add("FAIL;", "RFAIL;")
+        runner.add("C;", "RC;")
+        try:
+            runner.run()
+        except executor.ApplyError as e:
+            self.assertEqual("FAIL;", e.statement)
+            self.assertEqual([], e.revert_errors)
+        else:
+            self.fail("ApplyError not raised")
+        self.assertEqual(["A", "B", "RB", "RA"], self.conn.executed)
+        self.assertEqual([], runner.applied)
+
+
+class TestWaveExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection()
+        conn.closed = False
+        conn.close = lambda: setattr(conn, 'closed', True)
+        self.connections.append(conn)
+        return conn
+
+    def executed(self):
+        return sorted(s for c in self.connections for s in c.executed if s != "USE `sakila`")
+
+    def test_run(self):
+        """Test: waves are applied over concurrent connections"""
+        runner = executor.WaveExecutor(self.connect, jobs=4)
+        runner.add_wave([("A;", "RA;"), ("B;", "RB;"), ("C;", "RC;")])
+        runner.add_wave([("D;", "RD;")])
+        runner.run(session=["USE `sakila`;"])
+        self.assertEqual(3, len(self.connections))
+        self.assertTrue(all(c.executed[0] == "USE `sakila`" for c in self.connections))
+        self.assertTrue(all(c.closed for c in self.connections))
+        self.assertEqual(["A", "B", "C", "D"], self.executed())
+        self.assertEqual(4, len(runner.applied))
+
+    def test_revert_on_failure(self):
+        """Test: a failed wave completes, then every applied step is reverted"""
+        runner = executor.WaveExecutor(self.connect, jobs=2)
+        runner.add_wave([("A;", "RA;")])
+        runner.add_wave([("B;", "RB;"), ("FAIL;", "RFAIL;")])
+        runner.add_wave([("C;", "RC;")])
+        try:
+            runner.run()
+        except executor.ApplyError as e:
+            self.assertEqual("FAIL;", e.statement)
+            self.assertEqual([], e.revert_errors)
+        else:
+            self.fail("ApplyError not raised")
+        self.assertEqual(["A", "B", "RA", "RB"], self.executed())
+        self.assertEqual([], runner.applied)
+
+if __name__ == "__main__":
+    unittest.main()
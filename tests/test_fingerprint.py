@@ -0,0 +1,190 @@
+#!/usr/bin/python
+import unittest
+import os
+import tempfile
+import shutil
+from schemasync import fingerprint
+
+
+class FakeTable(object):
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+
+    def create(self):
+        self.calls += 1
+        return self.sql
+
+
+class FakeDatabase(object):
+    def __init__(self, tables):
+        self.name = 'sakila'
+        self.tables = tables
+
+
+class FakeConnection(object):
+    def __init__(self, rows):
+        self.rows = rows
+        self.db = 'sakila'
+        self.queries = []
+
+    def execute(self, sql, values=None):
+        self.queries.append((sql, values))
+        return self.rows
+
+
+class FakeInstance(object):
+    def __init__(self, tables, rows, version='5.7.22'):
+        self.selected = FakeDatabase(tables)
+        self.connection = FakeConnection(rows)
+        self.version = version
+
+
+def marker_row(name, update_time, digest='d1'):
+    return {'TABLE_NAME': name, 'CREATE_TIME': '2020-01-01 00:00:00',
+            'UPDATE_TIME': update_time, 'DIGEST': digest}
+
+
+class TestFingerprints(unittest.TestCase):
+
+    def test_create_hash_ignores_auto_increment(self):
+        """Test: the AUTO_INCREMENT value is not part of the hash unless it is synced"""
+        a = FakeTable("CREATE TABLE `t` (`id` int) AUTO_INCREMENT=5;")
+        b = FakeTable("CREATE TABLE `t` (`id` int) AUTO_INCREMENT=9;")
+        self.assertEqual(fingerprint.create_hash(a), fingerprint.create_hash(b))
+        self.assertNotEqual(fingerprint.create_hash(a, sync_auto_inc=True),
+                            fingerprint.create_hash(b, sync_auto_inc=True))
+
+    def test_unchanged_markers_reuse_hash(self):
+        """Test: SHOW CREATE TABLE is skipped when the markers did not change"""
+        table = FakeTable("CREATE TABLE `t` (`id` int);")
+        instance = FakeInstance({'t': table}, [marker_row('t', None)])
+
+        first = fingerprint.fingerprints(instance)
+        self.assertEqual(1, table.calls)
+
+        second = fingerprint.fingerprints(instance, previous=first)
+        self.assertEqual(1, table.calls)
+        self.assertEqual(first, second)
+
+        instance.connection.rows = [marker_row('t', '2020-01-02 00:00:00')]
+        third = fingerprint.fingerprints(instance, previous=second)
+        self.assertEqual(2, table.calls)
+        self.assertEqual(first['t'][1], third['t'][1])
+
+    def test_structural_change_rehashes(self):
+        """Test: an INSTANT/INPLACE change (same CREATE_TIME and UPDATE_TIME,
+           e.g. an index added or a column renamed) changes the markers"""
+        table = FakeTable("CREATE TABLE `t` (`id` int);")
+        instance = FakeInstance({'t': table}, [marker_row('t', None)])
+        first = fingerprint.fingerprints(instance)
+
+        table.sql = "CREATE TABLE `t` (`id` int, KEY `i` (`id`));"
+        instance.connection.rows = [marker_row('t', None, digest='d2')]
+        second = fingerprint.fingerprints(instance, previous=first)
+        self.assertEqual(2, table.calls)
+        self.assertNotEqual(first['t'][1], second['t'][1])
+
+    def test_statistics_cache_disabled(self):
+        """Test: the information_schema statistics cache is disabled on 8.0 only"""
+        for version, expected in (('5.7.22', False), ('8.0.21', True),
+                                  ('10.3.12-MariaDB', False)):
+            instance = FakeInstance({}, [], version)
+            fingerprint.table_markers(instance)
+            queries = [q[0] for q in instance.connection.queries]
+            self.assertEqual(expected, fingerprint.SQL_STATS_EXPIRY in queries, version)
+            self.assertEqual(fingerprint.SQL_TABLE_MARKERS, queries[-1])
+
+    def test_create_digest_ignores_comments(self):
+        """Test: COMMENT and AUTO_INCREMENT are not part of the digest unless they are synced"""
+        a = FakeTable("CREATE TABLE `t` (`id` int) AUTO_INCREMENT=5 COMMENT='a';")
+        b = FakeTable("CREATE TABLE `t` (`id` int) AUTO_INCREMENT=9 COMMENT='b';")
+        self.assertEqual(fingerprint.create_digest(a), fingerprint.create_digest(b))
+        self.assertNotEqual(fingerprint.create_digest(a, sync_comments=True),
+                            fingerprint.create_digest(b, sync_comments=True))
+
+    def test_server_digests(self):
+        """Test: digests of live databases are read with one query"""
+        rows = [{'TABLE_NAME': 't', 'DIGEST': 'd1'}]
+        source = FakeInstance({}, rows)
+        target = FakeInstance({}, rows)
+        self.assertEqual(({'t': 'd1'}, {'t': 'd1'}), fingerprint.table_digests(source, target))
+
+    def test_snapshot_digests(self):
+        """Test: digests of the common tables when a side has no connection"""
+        source = FakeInstance({'t': FakeTable("CREATE TABLE `t` (`id` int);"),
+                               'u': FakeTable("CREATE TABLE `u` (`id` int);")}, [])
+        target = FakeInstance({'t': FakeTable("CREATE TABLE `t` (`id` int);")}, [])
+        target.connection = None
+        from_digests, to_digests = fingerprint.table_digests(source, target)
+        self.assertEqual(['t'], list(from_digests))
+        self.assertEqual(from_digests, to_digests)
+
+    def test_schema_checksum(self):
+        """Test: the checksum of a whole schema is read with one query"""
+        instance = FakeInstance({}, [{'CHECKSUM': 'c1'}])
+        self.assertEqual('c1', fingerprint.schema_checksum(instance, kinds=('table', 'view')))
+
+        queries = instance.connection.queries
+        self.assertEqual(fingerprint.SQL_GROUP_CONCAT_MAX_LEN, queries[0][0])
+        self.assertEqual(2, len(queries))
+        values = queries[1][1]
+        self.assertEqual('sakila', values['db'])
+        self.assertEqual((True, True, False, False),
+                         (values['tables'], values['views'], values['triggers'], values['routines']))
+
+    def test_snapshot_checksum(self):
+        """Test: a snapshot has no schema checksum"""
+        instance = FakeInstance({}, [])
+        instance.connection = None
+        self.assertEqual(None, fingerprint.schema_checksum(instance))
+
+    def test_altered_table(self):
+        """Test: find the table name of an ALTER TABLE statement"""
+        self.assertEqual('rental', fingerprint.altered_table("ALTER TABLE `rental` DROP COLUMN `x`;"))
+        self.assertEqual('a`b', fingerprint.altered_table("ALTER TABLE `a``b` DROP COLUMN `x`;"))
+        self.assertEqual(None, fingerprint.altered_table("CREATE TABLE `rental` (`x` int);"))
+
+
+class TestIncrementalState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_first_run(self):
+        """Test: without a previous run every table is compared"""
+        state = fingerprint.IncrementalState(self.filename, 'a>b')
+        fp = {'t1': ['m', 'h1'], 't2': ['m', 'h2']}
+        self.assertEqual(set(), state.unchanged_tables(fp, fp))
+        self.assertEqual((0, 2), (state.hits, state.misses))
+
+    def test_skip_unchanged(self):
+        """Test: tables in sync with unchanged hashes are skipped"""
+        state = fingerprint.IncrementalState(self.filename, 'a>b')
+        fp = {'t1': ['m', 'h1'], 't2': ['m', 'h2'], 't3': ['m', 'h3']}
+        state.update(fp, fp, altered=set(['t3']))
+        state.save()
+
+        state = fingerprint.IncrementalState(self.filename, 'a>b')
+        changed = dict(fp, t2=['m2', 'h2-changed'])
+        self.assertEqual(set(['t1']), state.unchanged_tables(fp, changed))
+        self.assertEqual((1, 2), (state.hits, state.misses))
+
+    def test_keys_are_separate(self):
+        """Test: each source/target pair has its own state"""
+        state = fingerprint.IncrementalState(self.filename, 'a>b')
+        fp = {'t1': ['m', 'h1']}
+        state.update(fp, fp, altered=set())
+        state.save()
+
+        other = fingerprint.IncrementalState(self.filename, 'a>c')
+        self.assertEqual(set(), other.unchanged_tables(fp, fp))
+        state = fingerprint.IncrementalState(self.filename, 'a>b')
+        self.assertEqual(set(['t1']), state.unchanged_tables(fp, fp))
+
+if __name__ == "__main__":
+    unittest.main()
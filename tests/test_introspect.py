@@ -0,0 +1,186 @@
+#!/usr/bin/python
+import unittest
+import threading
+from schemaobject.database import DatabaseSchema
+from schemasync import introspect, objectfilter
+
+
+class FakeConnection(object):
+    """Returns canned information_schema rows for each bulk query"""
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def execute(self, sql, values=None):
+        self.queries.append(sql)
+        return self.results.get(sql)
+
+
+class FakeInstance(object):
+    def __init__(self, results, version='5.7.22'):
+        self.connection = FakeConnection(results)
+        self.version = version
+        self.selected = DatabaseSchema(name='sakila', parent=self)
+
+
+def table_row(name):
+    return {'TABLE_NAME': name, 'ENGINE': 'InnoDB', 'ROW_FORMAT': 'Compact',
+            'AUTO_INCREMENT': 1, 'CREATE_OPTIONS': '',
+            'TABLE_COLLATION': 'utf8_general_ci', 'TABLE_COMMENT': ''}
+
+
+def column_row(table, name, pos, type='int(11)'):
+    return {'TABLE_NAME': table, 'COLUMN_NAME': name, 'ORDINAL_POSITION': pos,
+            'COLUMN_DEFAULT': None, 'IS_NULLABLE': 'NO', 'COLUMN_TYPE': type,
+            'COLUMN_KEY': '', 'CHARACTER_MAXIMUM_LENGTH': None,
+            'CHARACTER_SET_NAME': None, 'COLLATION_NAME': None, 'EXTRA': '',
+            'COLUMN_COMMENT': ''}
+
+
+def index_row(table, name, seq, column, non_unique=1):
+    return {'TABLE_NAME': table, 'NON_UNIQUE': non_unique, 'INDEX_NAME': name,
+            'SEQ_IN_INDEX': seq, 'COLUMN_NAME': column, 'COLLATION': 'A',
+            'SUB_PART': None, 'INDEX_TYPE': 'BTREE', 'COMMENT': ''}
+
+
+class TestBulkLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = FakeInstance({
+            introspect.SQL_TABLES: [table_row('rental'), table_row('staff')],
+            introspect.SQL_COLUMNS: [column_row('rental', 'rental_id', 1),
+                                     column_row('rental', 'staff_id', 2, 'tinyint(3) unsigned'),
+                                     column_row('staff', 'staff_id', 1, 'tinyint(3) unsigned')],
+            introspect.SQL_INDEXES: [index_row('rental', 'idx_multi', 2, 'rental_id'),
+                                     index_row('rental', 'PRIMARY', 1, 'rental_id', 0),
+                                     index_row('rental', 'idx_multi', 1, 'staff_id'),
+                                     index_row('staff', 'PRIMARY', 1, 'staff_id', 0)],
+            introspect.SQL_FOREIGN_KEYS: [{'CONSTRAINT_NAME': 'fk_rental_staff',
+                                           'TABLE_SCHEMA': 'sakila', 'TABLE_NAME': 'rental',
+                                           'COLUMN_NAME': 'staff_id',
+                                           'REFERENCED_TABLE_SCHEMA': 'sakila',
+                                           'REFERENCED_TABLE_NAME': 'staff',
+                                           'REFERENCED_COLUMN_NAME': 'staff_id',
+                                           'POSITION_IN_UNIQUE_CONSTRAINT': 1,
+                                           'UPDATE_RULE': 'CASCADE', 'DELETE_RULE': 'RESTRICT'}],
+            introspect.SQL_VIEWS: [{'TABLE_NAME': 'staff_list',
+                                    'VIEW_DEFINITION': 'select `sakila`.`staff`.`staff_id` AS `ID` from `sakila`.`staff`'}],
+            introspect.SQL_ROUTINES: [{'ROUTINE_NAME': 'film_in_stock',
+                                       'ROUTINE_DEFINITION': 'BEGIN\n  SELECT 1; -- count\nEND',
+                                       'IS_DETERMINISTIC': 'NO', 'SQL_DATA_ACCESS': 'READS SQL DATA',
+                                       'SECURITY_TYPE': 'DEFINER', 'ROUTINE_COMMENT': ''}],
+            introspect.SQL_PARAMETERS: [{'SPECIFIC_NAME': 'film_in_stock', 'ORDINAL_POSITION': 1,
+                                         'PARAMETER_MODE': 'IN', 'PARAMETER_NAME': 'p_film_id',
+                                         'DTD_IDENTIFIER': 'int(11)'}],
+        })
+        self.db = introspect.bulk_load(self.instance)
+
+    def test_fixed_query_count(self):
+        """Test: the whole schema is loaded with one query per information_schema table"""
+        self.assertEqual(8, len(self.instance.connection.queries))
+        self.db.tables['rental'].columns
+        self.db.tables['rental'].foreign_keys
+        self.assertEqual(8, len(self.instance.connection.queries))
+
+    def test_tables(self):
+        """Test: tables, options and columns are hydrated in order"""
+        self.assertEqual(['rental', 'staff'], self.db.tables.keys())
+        rental = self.db.tables['rental']
+        self.assertEqual('utf8', rental.options['charset'].value)
+        self.assertEqual(['rental_id', 'staff_id'], rental.columns.keys())
+        self.assertEqual("ADD COLUMN `staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`",
+                         rental.columns['staff_id'].create(after='rental_id'))
+
+    def test_indexes(self):
+        """Test: index columns are ordered by SEQ_IN_INDEX and PRIMARY comes first"""
+        rental = self.db.tables['rental']
+        self.assertEqual(['PRIMARY', 'idx_multi'], rental.indexes.keys())
+        self.assertEqual([('staff_id', 0), ('rental_id', 0)], rental.indexes['idx_multi'].fields)
+        self.assertEqual("ADD INDEX `idx_multi` (`staff_id`, `rental_id`) USING BTREE",
+                         rental.indexes['idx_multi'].create())
+        self.assertEqual({}, self.db.tables['staff'].foreign_keys)
+
+    def test_foreign_keys(self):
+        """Test: foreign keys carry their reference rules"""
+        fk = self.db.tables['rental'].foreign_keys['fk_rental_staff']
+        self.assertEqual("ADD CONSTRAINT `fk_rental_staff` FOREIGN KEY `fk_rental_staff` (`staff_id`) "
+                         "REFERENCES `staff` (`staff_id`) ON DELETE RESTRICT ON UPDATE CASCADE",
+                         fk.create())
+
+    def test_views(self):
+        """Test: the schema qualifier is removed from view definitions"""
+        self.assertEqual("select `staff`.`staff_id` AS `ID` from `staff`",
+                         self.db.views['staff_list'].definition)
+
+    def test_procedures(self):
+        """Test: procedure definitions are rebuilt from ROUTINES and PARAMETERS"""
+        proc = self.db.procedures['film_in_stock']
+        self.assertEqual("(IN `p_film_id` int(11)) READS SQL DATA BEGIN SELECT 1; END", proc.definition)
+
+    def test_procedures_without_parameters_table(self):
+        """Test: MySQL < 5.5 has no PARAMETERS table, the procedures are
+           left to SHOW CREATE PROCEDURE"""
+        instance = FakeInstance(self.instance.connection.results, version='5.1.73')
+        introspect.bulk_load(instance)
+        self.assertFalse(introspect.SQL_ROUTINES in instance.connection.queries)
+        self.assertFalse(introspect.SQL_PARAMETERS in instance.connection.queries)
+        self.assertEqual(None, instance.selected._procedures)
+
+        # a filter is applied to the procedures SHOW CREATE PROCEDURE loads
+        instance = FakeInstance({}, version='5.1.73')
+        instance.connection.execute = lambda sql, values=None: (
+            [{'ROUTINE_NAME': 'film_in_stock'}, {'ROUTINE_NAME': 'rewards_report'}]
+            if 'information_schema.routines' in sql
+            else [{'Create Procedure': None}] if sql.startswith('SHOW CREATE PROCEDURE')
+            else [])
+        introspect.bulk_load(instance, objectfilter.ObjectFilter(include=['routine:film_*']))
+        self.assertEqual(['film_in_stock'], instance.selected.procedures.keys())
+
+    def test_procedures_order(self):
+        """Test: the procedures are queried in name order"""
+        self.assertTrue("ORDER BY ROUTINE_NAME" in introspect.SQL_ROUTINES)
+
+
+class TestLoadConcurrently(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = introspect.load
+
+    def tearDown(self):
+        introspect.load = self.saved
+
+    def test_loads_in_parallel(self):
+        """Test: both schemas load at the same time and keep their order"""
+        active = [0, 0]  # running loads, most loads seen running at once
+        cond = threading.Condition()
+
+        def slow_load(url, charset, bulk=False, cache=None, instance=None, object_filter=None):
+            with cond:
+                active[0] += 1
+                active[1] = max(active)
+                cond.notify_all()
+                # the first load waits for the second one to start
+                if active[0] < 2:
+                    cond.wait(5)
+                active[0] -= 1
+            return url
+        introspect.load = slow_load
+
+        results = introspect.load_concurrently(['source', 'target'], 'utf8')
+        self.assertEqual(2, active[1])
+        self.assertEqual(['source', 'target'], [r[0] for r in results])
+        self.assertTrue(all(r[1] >= 0 for r in results))
+
+    def test_error_is_raised(self):
+        """Test: an error loading either side is re-raised"""
+        def bad_load(url, charset, bulk=False, cache=None, instance=None, object_filter=None):
+            if url == 'target':
+                raise ValueError(url)
+            return url
+        introspect.load = bad_load
+
+        self.assertRaises(ValueError, introspect.load_concurrently, ['source', 'target'], 'utf8')
+
+if __name__ == "__main__":
+    unittest.main()
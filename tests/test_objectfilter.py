@@ -0,0 +1,168 @@
+#!/usr/bin/python
+import unittest
+from schemaobject.collections import OrderedDict
+from schemaobject.database import DatabaseSchema
+from schemaobject.table import TableSchema
+from schemaobject.view import ViewSchema
+from schemaobject.trigger import TriggerSchema
+from schemasync import objectfilter, introspect
+
+
+class FakeConnection(object):
+    def __init__(self, tables=()):
+        self.tables = tables
+        self.queries = []
+
+    def execute(self, sql, values=None):
+        self.queries.append((sql, values))
+        if 'information_schema.`TABLES`' in sql:
+            return [{'TABLE_NAME': name, 'ENGINE': 'InnoDB', 'ROW_FORMAT': 'Compact',
+                     'AUTO_INCREMENT': 1, 'CREATE_OPTIONS': '',
+                     'TABLE_COLLATION': 'utf8_general_ci', 'TABLE_COMMENT': ''}
+                    for name in self.tables]
+        return []
+
+
+class FakeInstance(object):
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.version = '5.7.22'
+        self.selected = DatabaseSchema(name='sakila', parent=self)
+
+
+class TestObjectFilter(unittest.TestCase):
+
+    def test_globs(self):
+        """Test: globs match whole names, case-insensitively"""
+        f = objectfilter.ObjectFilter(exclude=['tmp_*', '_gh_ost_%'])
+        self.assertFalse(f.match('table', 'tmp_rental'))
+        self.assertFalse(f.match('table', 'TMP_rental'))
+        self.assertFalse(f.match('view', '_gh_ost_rental_del'))
+        self.assertTrue(f.match('table', 'rental_tmp_x'))
+        self.assertTrue(f.match('table', 'tmpxrental'))
+
+    def test_kinds_and_regex(self):
+        """Test: patterns restricted to a kind and regular expressions"""
+        f = objectfilter.ObjectFilter(include=['table:/^(rental|staff)$/'],
+                                      exclude=[r'routine:/_\d{4}$/'])
+        self.assertTrue(f.match('table', 'rental'))
+        self.assertFalse(f.match('table', 'rental_archive'))
+        self.assertTrue(f.match('view', 'sales_by_store'))
+        self.assertFalse(f.match('routine', 'rollup_2019'))
+        self.assertTrue(f.match('routine', 'rollup'))
+
+    def test_empty(self):
+        """Test: a filter without patterns selects everything"""
+        f = objectfilter.ObjectFilter()
+        self.assertFalse(f)
+        self.assertEqual(('', []), f.predicate('table', 'TABLE_NAME'))
+        self.assertEqual('', f.signature())
+
+    def test_invalid(self):
+        """Test: an invalid regular expression is a ValueError"""
+        self.assertRaises(ValueError, objectfilter.ObjectFilter, ['/(/'])
+        self.assertRaises(ValueError, objectfilter.ObjectFilter, ['table:'])
+
+    def test_predicate(self):
+        """Test: the patterns become a SQL predicate on the name column"""
+        f = objectfilter.ObjectFilter(include=['r*', '/^s/'], exclude=['view:v', 'rental_?'])
+        sql, values = f.predicate('table', 'TABLE_NAME')
+        self.assertEqual("AND (LOWER(TABLE_NAME) LIKE %s OR LOWER(TABLE_NAME) REGEXP %s) "
+                         "AND NOT (LOWER(TABLE_NAME) LIKE %s)", sql)
+        self.assertEqual(['r%', '^s', 'rental\\__'], values)
+
+    def test_server_regex(self):
+        """Test: regular expressions are rewritten for MySQL REGEXP, or
+           left to Python outside of the common syntax"""
+        self.assertEqual('^archive_[0-9]{4}$', objectfilter.server_regex(r'^Archive_\d{4}$'))
+        self.assertEqual('[a-z0-9_-]+x[^0-9]', objectfilter.server_regex(r'[\w-]+x\D'))
+        self.assertEqual(r'a\.b', objectfilter.server_regex(r'a\.b'))
+        for source in (r'(?!tmp)', r'_\d+?$', r'\btmp', r'(a)\1', r'[\.]'):
+            self.assertEqual(None, objectfilter.server_regex(source), source)
+
+    def test_predicate_fallback(self):
+        """Test: patterns the server cannot evaluate select more objects
+           in SQL, the loaders match the names in Python"""
+        f = objectfilter.ObjectFilter(include=['r*', r'/^(?!tmp)s/'], exclude=[r'/\btmp/', 'x*'])
+        sql, values = f.predicate('table', 'TABLE_NAME')
+        self.assertEqual("AND NOT (LOWER(TABLE_NAME) LIKE %s)", sql)
+        self.assertEqual(['x%'], values)
+
+        instance = FakeInstance(FakeConnection(tables=['rental', 'staff', 'tmpstaff', 'film']))
+        tables = introspect.load_tables(instance.connection, instance.selected, f, details=False)
+        self.assertEqual(['rental', 'staff'], list(tables.keys()))
+
+    def test_bulk_load_predicates(self):
+        """Test: the bulk load queries carry the filter predicates"""
+        instance = FakeInstance(FakeConnection(tables=['rental']))
+        f = objectfilter.ObjectFilter(exclude=['tmp_*'])
+        introspect.bulk_load(instance, f)
+
+        queries = instance.connection.queries
+        self.assertEqual(7, len(queries))
+        for sql, values in queries:
+            self.assertTrue("NOT (LOWER(" in sql, sql)
+            self.assertEqual(('sakila', 'tmp\\_%'), tuple(values)[:2])
+        columns = [sql for sql, values in queries if 'COLUMNS' in sql][0]
+        self.assertTrue(columns.index("NOT (LOWER(TABLE_NAME)") < columns.index("ORDER BY"))
+
+    def test_restrict(self):
+        """Test: only the lists the filter applies to are queried, the
+           table details stay lazy"""
+        instance = FakeInstance(FakeConnection())
+        introspect.restrict(instance, objectfilter.ObjectFilter(exclude=['view:tmp_*']))
+        self.assertEqual(1, len(instance.connection.queries))
+        self.assertTrue('VIEWS' in instance.connection.queries[0][0])
+        self.assertEqual(None, instance.selected._tables)
+
+    def test_prune(self):
+        """Test: snapshots are pruned, with the triggers of excluded tables"""
+        db = FakeInstance().selected
+        db._tables = OrderedDict()
+        for name in ('rental', 'tmp_rental'):
+            db._tables[name] = TableSchema(name=name, parent=db)
+        db._views = OrderedDict()
+        db._views['tmp_view'] = ViewSchema(name='tmp_view', parent=db)
+        db._triggers = OrderedDict()
+        for name, table in (('ins_rental', 'rental'), ('ins_tmp', 'tmp_rental')):
+            db._triggers[name] = TriggerSchema(name=name, parent=db)
+            db._triggers[name].table = table
+        db._procedures = OrderedDict()
+
+        objectfilter.ObjectFilter(exclude=['table:tmp_*']).prune(db)
+        self.assertEqual(['rental'], list(db.tables.keys()))
+        self.assertEqual(['tmp_view'], list(db.views.keys()))
+        self.assertEqual(['ins_rental'], list(db.triggers.keys()))
+
+
+class TestObjectCategories(unittest.TestCase):
+
+    def test_categories(self):
+        """Test: --only and --skip select categories of objects"""
+        self.assertEqual(set(['table', 'view']),
+                         objectfilter.ObjectFilter(only='tables, view').kinds)
+        self.assertEqual(set(['table', 'view', 'trigger']),
+                         objectfilter.ObjectFilter(skip='procedures').kinds)
+        self.assertTrue(objectfilter.ObjectFilter(skip='routines'))
+        self.assertRaises(ValueError, objectfilter.ObjectFilter, None, None, 'events')
+
+    def test_bulk_load_skips_routines(self):
+        """Test: routine bodies are not read when routines are skipped"""
+        instance = FakeInstance(FakeConnection(tables=['rental']))
+        introspect.bulk_load(instance, objectfilter.ObjectFilter(skip='routines'))
+        sql = [q[0] for q in instance.connection.queries]
+        self.assertFalse(introspect.SQL_ROUTINES in sql)
+        self.assertFalse(introspect.SQL_PARAMETERS in sql)
+        self.assertTrue(introspect.SQL_VIEWS in sql)
+        self.assertEqual({}, instance.selected.procedures)
+
+    def test_restrict_only_tables(self):
+        """Test: the categories which are not compared are never loaded"""
+        instance = FakeInstance(FakeConnection())
+        introspect.restrict(instance, objectfilter.ObjectFilter(only='tables'))
+        db = instance.selected
+        self.assertEqual(({}, {}, {}), (db.views, db.triggers, db.procedures))
+        self.assertEqual([], instance.connection.queries)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+import unittest
+import copy
+from schemasync import snapshot, planner, cost, online
+from test_snapshot import SAKILA_RENTAL
+
+ADD_COLUMN = "ADD COLUMN `x` int(11) NULL FIRST"
+SIZES = {'rental': cost.TableSize(16044, 100 * cost.MB, 50 * cost.MB)}
+
+
+class TestOnlineMigrator(unittest.TestCase):
+
+    def setUp(self):
+        self.source = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        self.target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        del self.target.selected.tables['rental'].columns['staff_id']
+        self.from_table = self.source.selected.tables['rental']
+        self.to_table = self.target.selected.tables['rental']
+
+    def alter(self, threshold, sizes=SIZES):
+        migrator = online.OnlineMigrator(threshold, chunk_size=1000)
+        alter_planner = planner.AlterPlanner('5.7.22', online=migrator,
+                                             estimator=cost.CostEstimator(sizes))
+        result = alter_planner.alter(self.to_table, [ADD_COLUMN], ["DROP COLUMN `x`"],
+                                     self.from_table)
+        return result, alter_planner
+
+    def test_chunk_rows(self):
+        """Test: chunks are sized from the average row length"""
+        migrator = online.OnlineMigrator(0, chunk_time=0.5, rate=10)
+        # 100 byte rows, 5 MB per chunk
+        self.assertEqual(52428, migrator.chunk_rows(cost.TableSize(1000, 100000, 0)))
+        self.assertEqual(100, migrator.chunk_rows(cost.TableSize(10, 10 * cost.MB, 0)))
+        migrator.chunk_size = 2500
+        self.assertEqual(2500, migrator.chunk_rows(cost.TableSize(1000, 100000, 0)))
+
+    def test_threshold(self):
+        """Test: tables over the threshold are migrated online"""
+        (p, r), alter_planner = self.alter(200 * cost.MB)
+        self.assertTrue(p.startswith("ALTER TABLE `rental`"))
+        self.assertEqual([], alter_planner.online_migrations)
+
+        (p, r), alter_planner = self.alter(cost.MB)
+        self.assertEqual(('', ''), (p, r))
+        self.assertEqual(1, len(alter_planner.online_migrations))
+        self.assertEqual('rental', alter_planner.online_migrations[0][0])
+        self.assertTrue(alter_planner.estimator.report()[1].endswith("ONLINE"))
+
+        (p, r), alter_planner = self.alter(cost.MB, sizes={})
+        self.assertTrue(p.startswith("ALTER TABLE `rental`"))
+
+    def test_migration(self):
+        """Test: shadow table, triggers, chunked copy and atomic swap"""
+        (p, r), alter_planner = self.alter(cost.MB)
+        table, patch, revert = alter_planner.online_migrations[0]
+        self.assertTrue("CREATE TABLE `_rental_new` ( `rental_id` int(11) NOT NULL AUTO_INCREMENT, "
+                        "`staff_id` tinyint(3) unsigned NOT NULL" in patch)
+        self.assertFalse("AUTO_INCREMENT=" in patch)
+        for trigger in ('ins', 'upd', 'del'):
+            self.assertTrue("CREATE TRIGGER `_rental_osc_%s`" % trigger in patch)
+            self.assertTrue("DROP TRIGGER `_rental_osc_%s`;" % trigger in patch)
+        # only the columns of both tables are copied
+        self.assertTrue("INSERT LOW_PRIORITY IGNORE INTO `_rental_new` (`rental_id`)" in patch)
+        self.assertTrue("CEIL(1000 * (hi - lo + 1) / 16044)" in patch)
+        self.assertTrue(patch.index("CALL `_rental_osc_copy`();") <
+                        patch.index("RENAME TABLE `rental` TO `_rental_old`, `_rental_new` TO `rental`;") <
+                        patch.index("DROP TABLE `_rental_old`;"))
+        self.assertTrue("RENAME TABLE `rental` TO `_rental_old`, `_rental_new` TO `rental`;" in revert)
+
+    def test_quoted_names(self):
+        """Test: a backtick in the table name is escaped in the copy procedure"""
+        migrator = online.OnlineMigrator(0, chunk_size=1000)
+        patch = migrator.migration('ren`tal', self.from_table, self.to_table, SIZES['rental'])
+        self.assertTrue("CREATE PROCEDURE `_ren``tal_osc_copy`()" in patch)
+        self.assertTrue("INTO lo, hi FROM `ren``tal`;" in patch)
+        self.assertTrue("INSERT LOW_PRIORITY IGNORE INTO `_ren``tal_new` (`rental_id`)" in patch)
+        self.assertTrue("FROM `ren``tal` FORCE INDEX (PRIMARY)" in patch)
+
+    def test_unsupported(self):
+        """Test: tables without an integer primary key or with triggers are altered in place"""
+        migrator = online.OnlineMigrator(0)
+        self.assertEqual(None, migrator.unsupported(self.from_table, self.to_table))
+
+        self.to_table.columns['rental_id'].type = 'varchar(32)'
+        self.assertEqual("the primary key is not an integer",
+                         migrator.unsupported(self.from_table, self.to_table))
+
+        del self.to_table.indexes['PRIMARY']
+        self.assertEqual("no single column primary key common to both tables",
+                         migrator.unsupported(self.from_table, self.to_table))
+
+    def test_foreign_keys(self):
+        """Test: foreign keys are removed from the shadow table definition"""
+        create = ("CREATE TABLE `t` ( `id` int(11) NOT NULL, `c` int(11) NOT NULL, "
+                  "PRIMARY KEY (`id`), CONSTRAINT `fk_c` FOREIGN KEY (`c`) "
+                  "REFERENCES `c` (`id`) ON DELETE CASCADE ON UPDATE CASCADE) ENGINE=InnoDB;")
+        self.assertEqual("CREATE TABLE `t` ( `id` int(11) NOT NULL, `c` int(11) NOT NULL, "
+                         "PRIMARY KEY (`id`)) ENGINE=InnoDB;",
+                         online.REGEX_FOREIGN_KEY.sub('', create))
+
+
+if __name__ == "__main__":
+    unittest.main()
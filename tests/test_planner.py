@@ -0,0 +1,108 @@
+#!/usr/bin/python
+import unittest
+import copy
+from schemasync import snapshot, planner, syncdb
+from test_snapshot import SAKILA_RENTAL
+
+STAFF_ID = "MODIFY COLUMN `staff_id` %s AFTER `rental_id`"
+
+
+class TestAlterPlanner(unittest.TestCase):
+
+    def setUp(self):
+        schema = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        self.table = schema.selected.tables['rental']
+
+    def plan(self, version, patch, revert):
+        return planner.AlterPlanner(version).plan(self.table, [patch], [revert])
+
+    def test_add_column(self):
+        """Test: ADD COLUMN by server version"""
+        last = "ADD COLUMN `x` int(11) NULL AFTER `staff_id`"
+        first = "ADD COLUMN `x` int(11) NULL FIRST"
+        drop = "DROP COLUMN `x`"
+        self.assertEqual(planner.COPY, self.plan('5.5.40', last, drop).algorithm)
+        self.assertEqual(planner.INPLACE, self.plan('5.7.22-log', last, drop).algorithm)
+        self.assertTrue(self.plan('5.7.22-log', last, drop).rebuild)
+        self.assertEqual(planner.INSTANT, self.plan('8.0.20', last, drop).algorithm)
+        self.assertEqual(planner.INPLACE, self.plan('8.0.20', first, drop).algorithm)
+        self.assertEqual(planner.INSTANT, self.plan('8.0.32', first, drop).algorithm)
+
+    def test_modify_column(self):
+        """Test: MODIFY COLUMN by the kind of change"""
+        old = STAFF_ID % "tinyint(3) unsigned NOT NULL"
+        default = STAFF_ID % "tinyint(3) unsigned NOT NULL DEFAULT '1'"
+        null = STAFF_ID % "tinyint(3) unsigned NULL"
+        retype = STAFF_ID % "int(11) NOT NULL"
+
+        plan = self.plan('5.7.22', default, old)
+        self.assertEqual((planner.INPLACE, False), (plan.algorithm, plan.rebuild))
+        self.assertEqual(planner.INSTANT, self.plan('8.0.20', default, old).algorithm)
+        plan = self.plan('5.7.22', null, old)
+        self.assertEqual((planner.INPLACE, True), (plan.algorithm, plan.rebuild))
+        self.assertEqual(planner.COPY, self.plan('8.0.20', retype, old).algorithm)
+
+    def test_varchar_extension(self):
+        """Test: a VARCHAR extended within the same length bytes is changed in place"""
+        old = STAFF_ID % "varchar(20) NOT NULL"
+        self.assertEqual(planner.INPLACE, self.plan('5.7.22', STAFF_ID % "varchar(80) NOT NULL", old).algorithm)
+        self.assertEqual(planner.COPY, self.plan('5.7.22', STAFF_ID % "varchar(100) NOT NULL", old).algorithm)
+        self.assertEqual(planner.COPY, self.plan('5.6.40', STAFF_ID % "varchar(80) NOT NULL", old).algorithm)
+
+    def test_indexes_and_options(self):
+        """Test: indexes, primary keys and table options"""
+        add = "ADD INDEX `idx_staff` (`staff_id`) USING BTREE"
+        drop = "DROP INDEX `idx_staff`"
+        self.assertEqual(planner.INPLACE, self.plan('5.5.40', add, drop).algorithm)
+        plan = self.plan('5.7.22', add, drop)
+        self.assertEqual((planner.INPLACE, False), (plan.algorithm, plan.rebuild))
+        self.assertEqual(planner.COPY, self.plan('5.7.22', "DROP PRIMARY KEY", "ADD PRIMARY KEY (`rental_id`)").algorithm)
+        self.assertEqual(planner.COPY, self.plan('8.0.20', "ENGINE=MyISAM", "ENGINE=InnoDB").algorithm)
+        self.assertTrue(self.plan('5.7.22', "ROW_FORMAT=Dynamic", "ROW_FORMAT=Compact").rebuild)
+        self.assertEqual(planner.INSTANT, self.plan('8.0.20', "COMMENT='x = 1'", "COMMENT=''").algorithm)
+
+    def test_reorder_columns(self):
+        """Test: a reorder of several columns compares each column with its
+           own previous definition, the reverts follow the target order"""
+        def schema(names):
+            data = copy.deepcopy(SAKILA_RENTAL)
+            data['database']['tables'][0]['columns'] = [
+                dict(name=name, ordinal_position=i + 1, type=types[name], charset=None,
+                     collation=None, null=False, key='', default=None, extra='', comment='')
+                for i, name in enumerate(names)]
+            data['database']['tables'][0]['indexes'] = []
+            return snapshot.SnapshotObject(data).selected
+
+        types = dict(a='int(11)', b='varchar(20)', x='int(11)', y='int(11)')
+        options = dict(sync_auto_inc=False, sync_comments=False,
+                       planner=planner.AlterPlanner('5.7.22', algorithm_clauses=True))
+        p, r = list(syncdb.sync_schema(schema('xyba'), schema('abxy'), options))[0]
+        self.assertTrue(p.endswith(", ALGORITHM=INPLACE, LOCK=NONE;"), p)
+        self.assertTrue(r.endswith(", ALGORITHM=INPLACE, LOCK=NONE;"), r)
+        self.assertEqual(["`a` int(11) NOT NULL FIRST", "`b` varchar(20) NOT NULL AFTER `a`"],
+                         r[len("ALTER TABLE `rental` "):].split(", ALGORITHM")[0].replace(
+                             "MODIFY COLUMN ", "").split(", "))
+
+    def test_statement(self):
+        """Test: the slowest clause sets the algorithm of the statement"""
+        alter_planner = planner.AlterPlanner('5.7.22', algorithm_clauses=True)
+        p, r = alter_planner.alter(self.table,
+                                   ["ADD INDEX `idx_staff` (`staff_id`) USING BTREE", "ENGINE=MyISAM"],
+                                   ["DROP INDEX `idx_staff`", "ENGINE=InnoDB"])
+        self.assertEqual("ALTER TABLE `rental` ADD INDEX `idx_staff` (`staff_id`) USING BTREE, "
+                         "ENGINE=MyISAM, ALGORITHM=COPY, LOCK=SHARED;", p)
+        self.assertEqual("ALTER TABLE `rental`: ALGORITHM=COPY, LOCK=SHARED, rebuilds the table",
+                         alter_planner.notes[p])
+        self.assertEqual(1, len(alter_planner.plans))
+
+        alter_planner = planner.AlterPlanner('8.0.32', algorithm_clauses=True)
+        p, r = alter_planner.alter(self.table, ["DROP COLUMN `staff_id`"],
+                                   ["ADD COLUMN `staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`"])
+        self.assertEqual("ALTER TABLE `rental` DROP COLUMN `staff_id`, ALGORITHM=INSTANT;", p)
+
+        alter_planner = planner.AlterPlanner('5.5.40', algorithm_clauses=True)
+        p, r = alter_planner.alter(self.table, ["DROP COLUMN `staff_id`"], ["ADD COLUMN `staff_id` int(11) NULL FIRST"])
+        self.assertEqual("ALTER TABLE `rental` DROP COLUMN `staff_id`;", p)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+import time
+import threading
+import unittest
+from schemasync import pool
+
+
+class FakeDatabaseConnection(object):
+    opened = []
+
+    def __init__(self):
+        self.db = None
+        self.executed = []
+        self.version_queries = 0
+        self.closed = False
+
+    def connect(self, url, charset):
+        self.host, self.port, self.user = 'localhost', 3306, 'root'
+        FakeDatabaseConnection.opened.append(self)
+
+    @property
+    def version(self):
+        self.version_queries += 1
+        return '5.7.22-log'
+
+    def execute(self, sql, values=None):
+        if 'missing' in sql:
+            raise ValueError("Unknown database")
+        self.executed.append(sql)
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.original = pool.DatabaseConnection
+        FakeDatabaseConnection.opened = []
+        pool.DatabaseConnection = FakeDatabaseConnection
+
+    def tearDown(self):
+        pool.DatabaseConnection = self.original
+
+    def test_reuse(self):
+        """Test: databases synced one after the other share a connection"""
+        p = pool.ConnectionPool('mysql://root@localhost/', 'utf8')
+        for db in ('sakila', 'world', 'employees'):
+            instance = p.schema_object(db)
+            self.assertEqual(db, instance.connection.db)
+            self.assertEqual('5.7.22-log', instance.version)
+            p.release(instance.connection)
+
+        self.assertEqual(1, p.connections)
+        conn = FakeDatabaseConnection.opened[0]
+        self.assertEqual(["USE `sakila`", "USE `world`", "USE `employees`"], conn.executed)
+        self.assertEqual(1, conn.version_queries)
+
+        p.close()
+        self.assertTrue(conn.closed)
+
+    def test_concurrent_borrowers(self):
+        """Test: a connection is opened per concurrent borrower"""
+        p = pool.ConnectionPool('mysql://root@localhost/', 'utf8')
+        a = p.acquire('sakila')
+        b = p.acquire('world')
+        self.assertFalse(a is b)
+        p.release(a)
+        p.release(b)
+        self.assertTrue(p.acquire('employees') in (a, b))
+        self.assertEqual(2, p.connections)
+
+    def test_failed_use(self):
+        """Test: the connection is returned when the database does not exist"""
+        p = pool.ConnectionPool('mysql://root@localhost/', 'utf8')
+        self.assertRaises(ValueError, p.acquire, 'missing')
+        p.acquire('sakila')
+        self.assertEqual(1, p.connections)
+
+
+class SlowConnection(object):
+    def __init__(self):
+        self.running = 0
+        self.overlapped = False
+        self.closed = False
+
+    def execute(self, sql, values=None):
+        self.running += 1
+        self.overlapped = self.overlapped or self.running > 1
+        time.sleep(0.01)
+        self.running -= 1
+        return [sql]
+
+    def close(self):
+        self.closed = True
+
+
+class TestLockedConnection(unittest.TestCase):
+
+    def test_serialized(self):
+        """Test: threads sharing a connection never query it at once"""
+        conn = SlowConnection()
+        locked = pool.LockedConnection(conn)
+        threads = [threading.Thread(target=locked.execute, args=("SELECT %d" % i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(conn.overlapped)
+        self.assertEqual(["SELECT 1"], locked.execute("SELECT 1"))
+
+    def test_passthrough(self):
+        """Test: the other attributes are those of the connection"""
+        conn = SlowConnection()
+        locked = pool.LockedConnection(conn)
+        locked.close()
+        self.assertTrue(conn.closed)
+
+if __name__ == "__main__":
+    unittest.main()
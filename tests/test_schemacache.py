@@ -0,0 +1,108 @@
+#!/usr/bin/python
+import unittest
+import os
+import copy
+import time
+import tempfile
+import shutil
+from schemasync import snapshot, schemacache, introspect
+from test_snapshot import SAKILA_RENTAL
+
+
+class FakeConnection(object):
+    def __init__(self, db, markers):
+        self.db = db
+        self.markers = markers
+        self.queries = 0
+
+    def execute(self, sql, values=None):
+        self.queries += 1
+        return [dict(zip(schemacache.VALIDATOR_COLUMNS, self.markers))]
+
+
+class FakeSchemaObject(object):
+    """A connected SchemaObject whose model has not been loaded"""
+
+    def __init__(self, markers, host='localhost', data=SAKILA_RENTAL):
+        self.host = host
+        self.port = 3306
+        self.user = 'root'
+        self.version = '5.7.22-log'
+        self.connection = FakeConnection('sakila', markers)
+        self._databases = None
+        self._data = data
+
+    @property
+    def selected(self):
+        if self._databases is None:
+            # stands in for the introspection of the database
+            self._databases = snapshot.SnapshotObject(copy.deepcopy(self._data)).databases
+        return self._databases[self.connection.db]
+
+
+MARKERS = [16, '2026-10-01 10:00:00', None, 120, '7:123', '6:456', '3:2026-10-01 10:00:00']
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_loader_variants(self):
+        """Test: a model cached by bulk_load() is not restored for a lazy load"""
+        cache = schemacache.SchemaCache(self.tmp)
+        cache.store(FakeSchemaObject(MARKERS), introspect.cache_variant(bulk=True))
+        self.assertFalse(cache.restore(FakeSchemaObject(MARKERS),
+                                       introspect.cache_variant(bulk=False)))
+        self.assertTrue(cache.restore(FakeSchemaObject(MARKERS),
+                                      introspect.cache_variant(bulk=True)))
+
+    def test_store_and_restore(self):
+        """Test: an unchanged database is restored without introspection"""
+        cache = schemacache.SchemaCache(self.tmp)
+        first = FakeSchemaObject(MARKERS)
+        self.assertFalse(cache.restore(first))
+        cache.store(first)
+
+        second = FakeSchemaObject(MARKERS, data=None)
+        self.assertTrue(cache.restore(second))
+        self.assertEqual(['rental'], list(second.selected.tables))
+        self.assertEqual(1, second.connection.queries)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_changed_markers(self):
+        """Test: the cached model is not reused once the database changed"""
+        cache = schemacache.SchemaCache(self.tmp)
+        cache.store(FakeSchemaObject(MARKERS))
+        changed = list(MARKERS)
+        changed[3] = 121
+        self.assertFalse(cache.restore(FakeSchemaObject(changed)))
+
+    def test_ttl(self):
+        """Test: expired entries are not reused"""
+        cache = schemacache.SchemaCache(self.tmp, ttl=60)
+        cache.store(FakeSchemaObject(MARKERS))
+        index = cache._read_index()
+        for key in index:
+            index[key]['created'] = time.time() - 120
+        cache._write_index(index)
+        self.assertFalse(cache.restore(FakeSchemaObject(MARKERS)))
+
+    def test_lru_eviction(self):
+        """Test: the least recently used entries are evicted"""
+        cache = schemacache.SchemaCache(self.tmp, max_entries=2)
+        for host in ('a', 'b'):
+            cache.store(FakeSchemaObject(MARKERS, host=host))
+        time.sleep(0.01)
+        self.assertTrue(cache.restore(FakeSchemaObject(MARKERS, host='a')))
+        cache.store(FakeSchemaObject(MARKERS, host='c'))
+
+        index = cache._read_index()
+        self.assertEqual(['a:3306/sakila 5.7.22-log', 'c:3306/sakila 5.7.22-log'], sorted(index))
+        self.assertEqual(3, len(os.listdir(self.tmp)))
+
+if __name__ == "__main__":
+    unittest.main()
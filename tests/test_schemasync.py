@@ -0,0 +1,121 @@
+#!/usr/bin/python
+import os
+import copy
+import json
+import shutil
+import tempfile
+import unittest
+from schemasync import snapshot, schemasync
+from test_snapshot import SAKILA_RENTAL
+
+
+class TestApp(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        source = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        del target.selected.tables['rental'].columns['staff_id']
+        self.source = os.path.join(self.tmp, 'source.snap')
+        self.target = os.path.join(self.tmp, 'target.snap')
+        snapshot.dump(source, self.source)
+        snapshot.dump(target, self.target)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_keeps_statements(self):
+        """Test: the statements are only kept for a consumer"""
+        self.assertFalse(schemasync.keeps_statements(dict(stream=True)))
+        self.assertFalse(schemasync.keeps_statements(dict(apply=False, plan_waves=False,
+                                                          clusters=None, summary=None)))
+        self.assertTrue(schemasync.keeps_statements(dict(apply=True)))
+        self.assertTrue(schemasync.keeps_statements(dict(plan_waves=True)))
+        self.assertTrue(schemasync.keeps_statements(dict(summary={})))
+
+    def test_stream(self):
+        """Test: a --stream run without a consumer of the statements writes
+           the scripts, a summary receives the statements"""
+        rc = schemasync.app(sourcedb='snapshot://' + self.source,
+                            targetdb='snapshot://' + self.target,
+                            output_directory=self.tmp, stream=True, no_date=True)
+        self.assertEqual(0, rc)
+        patch = open(os.path.join(self.tmp, 'sakila.patch.sql')).read()
+        self.assertTrue('ADD COLUMN `staff_id`' in patch)
+
+        summary = {}
+        rc = schemasync.app(sourcedb='snapshot://' + self.source,
+                            targetdb='snapshot://' + self.target,
+                            output_directory=self.tmp, stream=True, no_date=True,
+                            summary=summary)
+        self.assertEqual(0, rc)
+        self.assertEqual(1, len(summary['statements']))
+        self.assertTrue('ADD COLUMN `staff_id`' in summary['statements'][0][0])
+        self.assertEqual(os.path.join(self.tmp, 'sakila.patch.sql'), summary['patch'])
+
+    def test_snapshot_loader(self):
+        """Test: a snapshot is not compared with a model of another loader"""
+        bulk = os.path.join(self.tmp, 'bulk.snap')
+        snapshot.dump(snapshot.load(self.source), bulk, 'loader=bulk')
+        rc = schemasync.app(sourcedb='snapshot://' + bulk,
+                            targetdb='snapshot://' + self.target,
+                            output_directory=self.tmp, no_date=True)
+        self.assertEqual(0, rc)
+
+        snapshot.dump(snapshot.load(self.target), self.target, 'loader=lazy')
+        rc = schemasync.app(sourcedb='snapshot://' + bulk,
+                            targetdb='snapshot://' + self.target,
+                            output_directory=self.tmp, no_date=True)
+        self.assertEqual(1, rc)
+
+        rc = schemasync.app(sourcedb='snapshot://' + bulk,
+                            targetdb='snapshot://' + self.target,
+                            output_directory=self.tmp, no_date=True, skip='routines')
+        self.assertEqual(0, rc)
+
+    def test_cluster_scripts(self):
+        """Test: the scripts of a drift cluster are written once, for all
+           of its targets"""
+        second = os.path.join(self.tmp, 'target2.snap')
+        shutil.copy(self.target, second)
+        for stream in (False, True):
+            rc = schemasync.app(sourcedb='snapshot://' + self.source,
+                                targets=['snapshot://' + self.target, 'snapshot://' + second],
+                                cluster_drift=True, stream=stream, no_date=True,
+                                output_directory=self.tmp)
+            self.assertEqual(0, rc)
+
+            manifest = json.load(open(os.path.join(self.tmp, 'sakila.drift.json')))
+            self.assertEqual(1, len(manifest['clusters']))
+            cluster = manifest['clusters'][0]
+            self.assertEqual(2, len(cluster['targets']))
+            patch = open(cluster['patch']).read()
+            self.assertTrue("-- Apply To: snapshot://%s\n--           snapshot://%s\n"
+                            % (self.target, second) in patch, patch)
+            self.assertTrue('ADD COLUMN `staff_id`' in patch)
+            os.unlink(cluster['patch'])
+            os.unlink(cluster['revert'])
+
+    def test_cluster_write_failure(self):
+        """Test: a cluster whose scripts cannot be written fails its targets"""
+        second = os.path.join(self.tmp, 'target2.snap')
+        shutil.copy(self.target, second)
+        save = schemasync.utils.PatchBuffer.save
+
+        def fail(buf):
+            raise OSError("disk full")
+        schemasync.utils.PatchBuffer.save = fail
+        try:
+            rc = schemasync.app(sourcedb='snapshot://' + self.source,
+                                targets=['snapshot://' + self.target, 'snapshot://' + second],
+                                cluster_drift=True, no_date=True, output_directory=self.tmp)
+        finally:
+            schemasync.utils.PatchBuffer.save = save
+
+        self.assertEqual(1, rc)
+        manifest = json.load(open(os.path.join(self.tmp, 'sakila.drift.json')))
+        self.assertEqual(2, len(manifest['failed']))
+        self.assertEqual(None, manifest['clusters'][0]['patch'])
+
+if __name__ == "__main__":
+    unittest.main()
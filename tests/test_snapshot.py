@@ -0,0 +1,136 @@
+#!/usr/bin/python
+import unittest
+import os
+import copy
+import gzip
+import tempfile
+import shutil
+from schemasync import snapshot, syncdb
+
+SAKILA_RENTAL = {
+    'format': snapshot.SNAPSHOT_FORMAT,
+    'host': 'localhost', 'port': 3306, 'user': 'root', 'version': '5.7.22-log',
+    'database': {
+        'name': 'sakila',
+        'options': [['charset', 'CHARACTER SET', 'utf8'],
+                    ['collation', 'COLLATE', 'utf8_general_ci']],
+        'tables': [{
+            'name': 'rental',
+            'create': "CREATE TABLE `rental` ( `rental_id` int(11) NOT NULL AUTO_INCREMENT, "
+                      "`staff_id` tinyint(3) unsigned NOT NULL, PRIMARY KEY (`rental_id`)) "
+                      "ENGINE=InnoDB AUTO_INCREMENT=16050 DEFAULT CHARSET=utf8;",
+            'options': [['engine', 'ENGINE', 'InnoDB'],
+                        ['charset', 'CHARSET', 'utf8'],
+                        ['collation', 'COLLATE', 'utf8_general_ci'],
+                        ['row_format', 'ROW_FORMAT', 'Compact'],
+                        ['auto_increment', 'AUTO_INCREMENT', 16050],
+                        ['create_options', None, ''],
+                        ['comment', 'COMMENT', '']],
+            'columns': [{'name': 'rental_id', 'ordinal_position': 1, 'type': 'int(11)',
+                         'charset': None, 'collation': None, 'null': False, 'key': 'PRI',
+                         'default': None, 'extra': 'auto_increment', 'comment': ''},
+                        {'name': 'staff_id', 'ordinal_position': 2, 'type': 'tinyint(3) unsigned',
+                         'charset': None, 'collation': None, 'null': False, 'key': 'MUL',
+                         'default': None, 'extra': '', 'comment': ''}],
+            'indexes': [{'name': 'PRIMARY', 'table_name': 'rental', 'non_unique': False,
+                         'type': 'BTREE', 'kind': 'PRIMARY', 'collation': 'A', 'comment': '',
+                         'fields': [['rental_id', 0]]}],
+            'foreign_keys': [],
+        }],
+        'views': [{'name': 'staff_list', 'definition': 'select 1 AS `ID`'}],
+        'triggers': [],
+        'procedures': [{'name': 'noop', 'definition': '() BEGIN END',
+                        'raw_definition': '()\nBEGIN\nEND'}],
+    },
+}
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'sakila.snapshot')
+        self.schema = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_snapshot_url(self):
+        """Test: snapshot:// urls are recognized"""
+        self.assertTrue(snapshot.is_snapshot_url("snapshot:///tmp/x.snapshot"))
+        self.assertFalse(snapshot.is_snapshot_url("mysql://root@localhost/sakila"))
+        self.assertEqual("/tmp/x.snapshot", snapshot.snapshot_path("snapshot:///tmp/x.snapshot"))
+
+    def test_model(self):
+        """Test: the snapshot model behaves like a SchemaObject model"""
+        self.assertEqual('sakila', self.schema.selected.name)
+        self.assertEqual('5.7.22-log', self.schema.version)
+        rental = self.schema.selected.tables['rental']
+        self.assertEqual(['rental_id', 'staff_id'], rental.columns.keys())
+        self.assertEqual("ADD COLUMN `staff_id` tinyint(3) unsigned NOT NULL AFTER `rental_id`",
+                         rental.columns['staff_id'].create(after='rental_id'))
+        self.assertEqual("ADD PRIMARY KEY (`rental_id`) USING BTREE", rental.indexes['PRIMARY'].create())
+        self.assertTrue(rental.create().startswith("CREATE TABLE `rental`"))
+
+    def test_round_trip(self):
+        """Test: dump and load a snapshot"""
+        snapshot.dump(self.schema, self.filename)
+        loaded = snapshot.load(self.filename)
+        self.assertEqual(snapshot.serialize(self.schema), snapshot.serialize(loaded))
+        self.assertEqual(self.schema.selected.tables['rental'], loaded.selected.tables['rental'])
+
+    def test_loader(self):
+        """Test: a snapshot records the loader of its model"""
+        snapshot.dump(self.schema, self.filename, 'loader=bulk')
+        loaded = snapshot.load(self.filename)
+        self.assertEqual('loader=bulk', loaded.loader)
+        snapshot.dump(loaded, self.filename)
+        self.assertEqual('loader=bulk', snapshot.load(self.filename).loader)
+        self.assertEqual(None, self.schema.loader)
+
+    def test_invalid_file(self):
+        """Test: loading a file that is not a snapshot"""
+        fh = gzip.open(self.filename, 'wb')
+        fh.write(b'[]')
+        fh.close()
+        self.assertRaises(ValueError, snapshot.load, self.filename)
+
+    def test_sync_snapshots(self):
+        """Test: syncdb runs against two snapshots"""
+        target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        del target.selected.tables['rental'].columns['staff_id']
+
+        options = dict(sync_auto_inc=False, sync_comments=False)
+        result = list(syncdb.sync_schema(self.schema.selected, target.selected, options))
+        self.assertEqual([("ALTER TABLE `rental` ADD COLUMN `staff_id` tinyint(3) unsigned "
+                           "NOT NULL AFTER `rental_id`;",
+                           "ALTER TABLE `rental` DROP COLUMN `staff_id`;")], result)
+
+        result = list(syncdb.sync_schema(self.schema.selected, self.schema.selected, options))
+        self.assertEqual([], result)
+
+    def test_equal_digests_skip_table(self):
+        """Test: tables with equal digests are not compared"""
+        target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        del target.selected.tables['rental'].columns['staff_id']
+
+        options = dict(sync_auto_inc=False, sync_comments=False,
+                       table_digests=({'rental': 'd1'}, {'rental': 'd1'}))
+        self.assertEqual([], list(syncdb.sync_schema(self.schema.selected, target.selected, options)))
+
+        options['table_digests'] = ({'rental': 'd1'}, {'rental': 'd2'})
+        self.assertEqual(1, len(list(syncdb.sync_schema(self.schema.selected, target.selected, options))))
+
+    def test_created_table(self):
+        """Test: CREATE TABLE statements come from the snapshot"""
+        target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        del target.selected.tables['rental']
+
+        options = dict(sync_auto_inc=False, sync_comments=False)
+        for p, r in syncdb.sync_schema(self.schema.selected, target.selected, options):
+            self.assertTrue(p.startswith("CREATE TABLE `rental`"))
+            self.assertFalse("AUTO_INCREMENT=16050" in p)
+            self.assertEqual("DROP TABLE `rental`;", r)
+
+if __name__ == "__main__":
+    unittest.main()
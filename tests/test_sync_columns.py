@@ -1,7 +1,16 @@
 #!/usr/bin/python
+import re
+import random
 import unittest
 import schemaobject
 from schemasync import syncdb
+from benchmarks.synthetic import make_columns
+
+REGEX_MOVE = re.compile(r"^MODIFY COLUMN `(?P<name>[^`]+)` .* (?:FIRST|AFTER `(?P<after>[^`]+)`)$")
+
+RENTAL_COLUMNS = ['rental_id', 'rental_date', 'inventory_id', 'customer_id',
+                  'return_date', 'staff_id', 'last_update']
+
 
 class TestSyncColumns(unittest.TestCase):
 
@@ -265,6 +274,84 @@ class TestSyncColumns(unittest.TestCase):
                 self.assertEqual(r, "MODIFY COLUMN `rental_date` DATETIME NOT NULL AFTER `rental_id`")
 
         self.assertEqual(i, 2)
+
+
+class TestColumnOrder(unittest.TestCase):
+
+    def moves(self, src, dest):
+        return [(p, r) for p, r in syncdb.sync_modified_columns(make_columns(src), make_columns(dest))]
+
+    def test_longest_increasing_subsequence(self):
+        """Test the indexes of a longest increasing subsequence"""
+        self.assertEqual(set(), syncdb.longest_increasing_subsequence([]))
+        self.assertEqual(set([0, 1, 2]), syncdb.longest_increasing_subsequence([1, 2, 3]))
+        self.assertEqual(set([3, 4, 5, 6]), syncdb.longest_increasing_subsequence([3, 2, 1, 0, 4, 5, 6]))
+        self.assertEqual(set([0, 4, 5, 6]), syncdb.longest_increasing_subsequence([0, 4, 5, 3, 1, 2, 6]))
+
+    def test_get_previous_items(self):
+        """Test mapping items to their previous item"""
+        self.assertEqual({'a': None, 'b': 'a', 'c': 'b'}, syncdb.get_previous_items(['a', 'b', 'c']))
+
+    def test_same_order(self):
+        """Columns in the same order are not moved"""
+        self.assertEqual([], self.moves(RENTAL_COLUMNS, RENTAL_COLUMNS))
+
+    def apply(self, names, statements):
+        """Move the columns of a list as a sequence of MODIFY COLUMN does"""
+        names = list(names)
+        for sql in statements:
+            m = REGEX_MOVE.match(sql)
+            names.remove(m.group('name'))
+            pos = names.index(m.group('after')) + 1 if m.group('after') else 0
+            names.insert(pos, m.group('name'))
+        return names
+
+    def assertRoundTrip(self, src, dest):
+        moves = self.moves(src, dest)
+        for p, r in moves:
+            self.assertEqual(REGEX_MOVE.match(p).group('name'), REGEX_MOVE.match(r).group('name'))
+
+        patched = self.apply(dest, [p for p, r in moves])
+        self.assertEqual(src, patched)
+        rlist = [r for p, r in moves]
+        order = syncdb.revert_order(rlist, make_columns(src), make_columns(dest))
+        self.assertEqual(dest, self.apply(patched, [rlist[i] for i in order]))
+        return moves
+
+    def test_minimal_moves(self):
+        """Only the columns outside the longest common run are moved,
+           the patch restores the source order and the revert the target order"""
+        dest = ['customer_id', 'inventory_id', 'rental_date', 'rental_id',
+                'return_date', 'staff_id', 'last_update']
+        moves = self.assertRoundTrip(RENTAL_COLUMNS, dest)
+        self.assertEqual(3, len(moves))
+
+    def test_random_permutations(self):
+        """Patch then revert of random column orders"""
+        rnd = random.Random(7)
+        for _ in range(200):
+            dest = RENTAL_COLUMNS[:]
+            rnd.shuffle(dest)
+            self.assertRoundTrip(RENTAL_COLUMNS, dest)
+
+    def test_revert_order(self):
+        """Only the column moves are reordered, the other clauses keep their place"""
+        src = ['a', 'b', 'c']
+        dest = ['c', 'b', 'a']
+        rlist = ["DROP COLUMN `x`"] + [r for p, r in self.moves(src, dest)] + ["DROP INDEX `i`"]
+        self.assertEqual([0, 2, 1, 3], syncdb.revert_order(rlist, make_columns(src), make_columns(dest)))
+        self.assertEqual([0, 1], syncdb.revert_order(["DROP COLUMN `x`", "ENGINE=InnoDB"],
+                                                    make_columns(src), make_columns(dest)))
+
+    def test_wide_table(self):
+        """Moving one column of a wide table yields a single move"""
+        src = ['c%d' % i for i in range(600)]
+        dest = src[:]
+        dest.insert(0, dest.pop(300))
+        moves = self.moves(src, dest)
+        self.assertEqual(1, len(moves))
+        self.assertEqual("MODIFY COLUMN `c300` int(11) NOT NULL AFTER `c299`", moves[0][0])
+
 if __name__ == "__main__":
     from test_all import get_database_url
     TestSyncColumns.database_url = get_database_url()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from schemasync import timing
+
+
+class FakeConnection(object):
+    def execute(self, sql, values=None):
+        return []
+
+
+class FakeSchemaObject(object):
+    def __init__(self):
+        self.connection = FakeConnection()
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_phases(self):
+        """Test: phases are recorded in order with their query counts"""
+        profiler = timing.Profiler()
+        source = FakeSchemaObject()
+        profiler.count_queries('source', source)
+        with profiler.phase('introspect'):
+            source.connection.execute("SELECT 1")
+            source.connection.execute("SELECT 2")
+        with profiler.phase('diff_schema'):
+            pass
+
+        self.assertEqual(['introspect', 'diff_schema'], [p['name'] for p in profiler.phases])
+        self.assertEqual(2, profiler.phases[0]['queries'])
+        self.assertEqual(0, profiler.phases[1]['queries'])
+        self.assertEqual(2, profiler.report()['queries']['source']['count'])
+
+    def test_count_queries_once(self):
+        """Test: a connection is wrapped in a single QueryCounter"""
+        profiler = timing.Profiler()
+        source = FakeSchemaObject()
+        profiler.count_queries('source', source)
+        counter = source.connection
+        profiler.count_queries('source', source)
+        self.assertTrue(source.connection is counter)
+
+    def test_tables(self):
+        """Test: the comparison of each table is timed"""
+        profiler = timing.Profiler()
+        with profiler.table('rental'):
+            pass
+        self.assertEqual(['rental'], list(profiler.tables))
+        self.assertTrue(profiler.tables['rental']['wall'] >= 0)
+
+    def test_filters(self):
+        """Test: the filters are timed as one accumulated phase"""
+        profiler = timing.Profiler()
+        filters = profiler.wrap_filters((lambda d: d.upper(), lambda d: d.strip()))
+        data = " drop table x; "
+        for f in filters:
+            data = f(data)
+        self.assertEqual("DROP TABLE X;", data)
+        self.assertEqual(['filter'], [p['name'] for p in profiler.phases])
+
+    def test_disabled(self):
+        """Test: a disabled profiler records nothing"""
+        profiler = timing.Profiler(enabled=False)
+        source = FakeSchemaObject()
+        profiler.count_queries('source', source)
+        with profiler.phase('introspect'):
+            with profiler.table('rental'):
+                pass
+        filters = (lambda d: d,)
+        self.assertTrue(profiler.wrap_filters(filters) is filters)
+        self.assertTrue(isinstance(source.connection, FakeConnection))
+        self.assertEqual([], profiler.phases)
+        self.assertEqual({}, profiler.tables)
+
+    def test_write(self):
+        """Test: the report is written as JSON, with a cProfile dump"""
+        directory = tempfile.mkdtemp()
+        try:
+            profiler = timing.Profiler(cprofile=True)
+            with profiler.phase('save'):
+                pass
+            report = os.path.join(directory, 'sakila.profile.json')
+            dump = os.path.join(directory, 'sakila.prof')
+            profiler.write(report, dump)
+
+            data = json.load(open(report))
+            self.assertEqual('save', data['phases'][0]['name'])
+            self.assertTrue(os.path.getsize(dump) > 0)
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
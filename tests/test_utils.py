@@ -3,7 +3,13 @@ import unittest
 import os
 import glob
 import datetime
-from schemasync.utils import versioned, create_pnames, compare_version, PatchBuffer
+import time
+import random
+import threading
+from schemasync.utils import versioned, create_pnames, compare_version, parallel_map, PatchBuffer, StreamingPatchBuffer
+from schemasync.utils import normalize_patch, REGEX_MULTI_SPACE, REGEX_DISTANT_SEMICOLIN, REGEX_SEMICOLON_EXPLODE_TO_NEWLINE
+from schemasync import snapshot, syncdb
+from benchmarks import synthetic
 
 
 class TestVersioned(unittest.TestCase):
@@ -90,6 +96,39 @@ class TestCompareVersion(unittest.TestCase):
         self.assertTrue(compare_version('5.0.0-mysql', '5.0.0-log') == 0)
         self.assertTrue(compare_version('5.0.0-mysql', '5.0.1-log') < 0)
 
+class TestParallelMap(unittest.TestCase):
+    def test_results_in_order(self):
+        self.assertEqual([(1, None), (4, None), (9, None)],
+                         parallel_map(lambda x: x * x, [1, 2, 3], jobs=2))
+
+    def test_errors(self):
+        results = parallel_map(lambda x: 1 // x, [1, 0], jobs=2)
+        self.assertEqual((1, None), results[0])
+        self.assertEqual(None, results[1][0])
+        self.assertTrue(isinstance(results[1][1], ZeroDivisionError))
+
+    def test_bounded_jobs(self):
+        """Test: at most jobs calls run at the same time"""
+        active = [0, 0]  # running calls, most calls seen running at once
+        cond = threading.Condition()
+
+        def slow(x):
+            with cond:
+                active[0] += 1
+                active[1] = max(active)
+                cond.notify_all()
+                # each call waits for a second one, which only runs if jobs allow
+                if active[0] < 2:
+                    cond.wait(5)
+                active[0] -= 1
+            return x
+
+        self.assertEqual([(x, None) for x in range(4)], parallel_map(slow, range(4), jobs=2))
+        self.assertEqual(2, active[1])
+
+    def test_empty(self):
+        self.assertEqual([], parallel_map(lambda x: x, [], jobs=4))
+
 class TestPatchBuffer(unittest.TestCase):
 
     def setUp(self):
@@ -156,5 +195,114 @@ class TestPatchBuffer(unittest.TestCase):
         self.p.delete()
         self.assertEqual(False, os.path.isfile(self.p.name))
 
+class TestStreamingPatchBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.p = StreamingPatchBuffer(name="patch.txt",
+                                      filters=[lambda d: d.upper()],
+                                      tpl="data in this file: %(data)s-- end %(x)s",
+                                      ctx={'x':'y'},
+                                      version_filename=True)
+
+    def tearDown(self):
+        if (os.path.isfile(self.p.name)):
+            os.unlink(self.p.name)
+
+    def test_save(self):
+        self.p.write("hello, ")
+        self.p.write("world\n")
+        self.assertEqual(False, os.path.isfile(self.p.name))
+        self.assertEqual(True, self.p.save())
+        f = open(self.p.name, 'r')
+        self.assertEqual("data in this file: HELLO, WORLD\n-- end y", f.read())
+        f.close()
+
+    def test_save_empty(self):
+        self.assertEqual(False, self.p.save())
+        self.assertEqual(False, os.path.isfile(self.p.name))
+
+    def test_save_new_header(self):
+        """Test: a header whose ctx changed after the first write is replaced"""
+        self.p = StreamingPatchBuffer(name="patch.txt", filters=[],
+                                      tpl="-- to %(to)s\n%(data)s-- end",
+                                      ctx={'to': 'a'})
+        self.p.write("hello\n")
+        self.p.ctx['to'] = 'a\n-- b'
+        self.assertEqual(True, self.p.save())
+        f = open(self.p.name, 'r')
+        self.assertEqual("-- to a\n-- b\nhello\n-- end", f.read())
+        f.close()
+        self.assertEqual([], glob.glob(".schemasync-*"))
+
+    def test_delete_unsaved(self):
+        self.p.write("hello, world")
+        tmp = self.p._tmp_name
+        self.assertEqual(True, os.path.isfile(tmp))
+        self.p.delete()
+        self.assertEqual(False, os.path.isfile(tmp))
+        self.assertEqual(False, os.path.isfile(self.p.name))
+
+class TestNormalizePatch(unittest.TestCase):
+
+    def three_pass(self, data):
+        data = REGEX_MULTI_SPACE.sub(' ', data)
+        data = REGEX_DISTANT_SEMICOLIN.sub(';', data)
+        return REGEX_SEMICOLON_EXPLODE_TO_NEWLINE.sub(";\n", data)
+
+    def test_same_as_regex_passes(self):
+        """Test: plain statements are normalized as by the three regex passes"""
+        data = ("USE `sakila`;\nSET FOREIGN_KEY_CHECKS = 0;  \n"
+                "ALTER TABLE `rental`  ADD COLUMN `staff_id` tinyint(3)\tunsigned  NOT NULL"
+                " AFTER `rental_id`, DROP INDEX `idx`; ALTER VIEW `v` AS select 2 AS `ID` ;\n")
+        self.assertEqual(self.three_pass(data), normalize_patch(data))
+        self.assertEqual("ALTER TABLE `a` ENGINE=InnoDB;", normalize_patch("ALTER TABLE `a`  ENGINE=InnoDB  ;"))
+        for data in ('a/ ; ', '; ;', '\t;\n\n', 'a;\t ;\n'):
+            self.assertEqual(self.three_pass(data), normalize_patch(data))
+
+    def test_unquoted_text(self):
+        """Test: text without quotes, comments or routine definitions is
+           normalized as by the three regex passes"""
+        rnd = random.Random(7)
+        for _ in range(5000):
+            data = ''.join(rnd.choice('ab /;\t\n,') for _ in range(rnd.randint(0, 12)))
+            self.assertEqual(self.three_pass(data), normalize_patch(data), repr(data))
+
+    def test_syncdb_statements(self):
+        """Test: the statements of syncdb, written one per line, are
+           normalized as by the three regex passes"""
+        source = synthetic.generate(tables=50, views=5, triggers=5, routines=0, seed=3)
+        target = synthetic.drift(source, 40, 4)
+        fromdb = snapshot.SnapshotObject(source).selected
+        todb = snapshot.SnapshotObject(target).selected
+        options = dict(sync_auto_inc=True, sync_comments=True)
+        result = list(syncdb.sync_schema(fromdb, todb, options))
+        result.extend(syncdb.sync_views(fromdb, todb))
+        result.extend(syncdb.sync_triggers(fromdb, todb))
+        statements = [s + '\n' for pair in result for s in pair if s]
+        self.assertTrue(len(statements) > 20)
+
+        data = ''.join(statements)
+        self.assertEqual(self.three_pass(data), normalize_patch(data))
+        for data in statements:
+            self.assertEqual(self.three_pass(data), normalize_patch(data))
+
+    def test_quoted(self):
+        """Test: quoted strings and identifiers are left as is"""
+        data = "ALTER TABLE `a  b` COMMENT 'it''s;  \\'two';\n"
+        self.assertEqual(data, normalize_patch(data))
+
+    def test_comments(self):
+        """Test: line comments keep their end of line"""
+        self.assertEqual("-- INPLACE,  no lock\nALTER TABLE `a` ENGINE=InnoDB;\n",
+                         normalize_patch("-- INPLACE,  no lock\n\nALTER TABLE `a` ENGINE=InnoDB;\n"))
+
+    def test_routine_body(self):
+        """Test: the body of a routine is left as is"""
+        data = ("DROP PROCEDURE IF EXISTS `p`; DELIMITER ;; CREATE PROCEDURE `p`()\n"
+                "BEGIN\n  SELECT 'a;  b';\n  SELECT 1;\nEND;; DELIMITER ; SELECT 1;\n")
+        self.assertEqual("DROP PROCEDURE IF EXISTS `p`;\nDELIMITER ;;\nCREATE PROCEDURE `p`()\n"
+                         "BEGIN\n  SELECT 'a;  b';\n  SELECT 1;\nEND;;\nDELIMITER ;\nSELECT 1;\n",
+                         normalize_patch(data))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
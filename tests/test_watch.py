@@ -0,0 +1,184 @@
+#!/usr/bin/python
+import os
+import copy
+import json
+import shutil
+import tempfile
+import unittest
+from schemaobject.collections import OrderedDict
+from schemaobject.database import DatabaseSchema
+from schemasync import snapshot, watch, fingerprint
+from test_snapshot import SAKILA_RENTAL
+
+OPTIONS = dict(sync_auto_inc=False, sync_comments=False)
+
+
+class FakeConnection(object):
+    """Serves the markers and the TABLES rows of a rental table"""
+
+    def __init__(self):
+        self.marker = 'm1'
+        self.queries = []
+        self.engine = 'InnoDB'
+        self.db = 'sakila'
+
+    def execute(self, sql, values=None):
+        self.queries.append((sql, values))
+        if sql == watch.SQL_MARKERS:
+            return [{'KIND': 'table', 'NAME': 'rental', 'MARKER': self.marker}]
+        if 'information_schema.`TABLES`' in sql:
+            return [{'TABLE_NAME': 'rental', 'ENGINE': self.engine, 'ROW_FORMAT': 'Compact',
+                     'AUTO_INCREMENT': 1, 'CREATE_OPTIONS': '',
+                     'TABLE_COLLATION': 'utf8_general_ci', 'TABLE_COMMENT': ''}]
+        return []
+
+
+class FakeDriver(object):
+    """Stands in for the pymysql connection, reconnects if closed"""
+
+    def __init__(self):
+        self.server_thread_id = (1,)
+        self.closed = False
+
+    def ping(self, reconnect=True):
+        if self.closed:
+            self.server_thread_id = (self.server_thread_id[0] + 1,)
+            self.closed = False
+
+
+class FakeInstance(object):
+    def __init__(self, version='5.7.22'):
+        self.connection = FakeConnection()
+        self.host = 'db2'
+        self.version = version
+        self.selected = DatabaseSchema(name='sakila', parent=self)
+        self.selected._tables = OrderedDict()
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.source = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+        self.target = snapshot.SnapshotObject(copy.deepcopy(SAKILA_RENTAL))
+
+    def test_changes(self):
+        """Test: changed, new and removed markers"""
+        previous = {('table', 'a'): '1', ('table', 'b'): '1', ('view', 'c'): 'x'}
+        current = {('table', 'a'): '1', ('table', 'b'): '2', ('view', 'd'): 'x'}
+        self.assertEqual(set([('table', 'b'), ('view', 'c'), ('view', 'd')]),
+                         watch.changes(previous, current))
+
+    def test_start(self):
+        """Test: one drift event per drifted object when the watch starts"""
+        del self.target.selected.tables['rental'].columns['staff_id']
+        self.target.selected.views['staff_list'].definition = 'select 2 AS `ID`'
+        watcher = watch.Watcher(self.source, self.target, OPTIONS)
+        events = watcher.start()
+        self.assertEqual([('drift', 'table', 'rental'), ('drift', 'view', 'staff_list')],
+                         [(e['event'], e['kind'], e['name']) for e in events])
+        self.assertEqual('column', events[0]['records'][0]['kind'])
+        self.assertEqual('mysql://localhost/sakila', events[0]['target'])
+
+    def test_in_sync(self):
+        """Test: no event for identical schemas, and no poll query for snapshots"""
+        watcher = watch.Watcher(self.source, self.target, OPTIONS)
+        self.assertEqual([], watcher.start())
+        self.assertEqual([], watcher.poll())
+
+    def test_poll_reloads_changed_tables(self):
+        """Test: only the objects whose markers moved are loaded again,
+           drift and resolved events follow the changes"""
+        del self.source.selected._views['staff_list']
+        del self.source.selected._procedures['noop']
+        rental = self.source.selected.tables['rental']
+        rental._columns, rental._indexes, rental._foreign_keys = (
+            OrderedDict(), OrderedDict(), OrderedDict())
+        target = FakeInstance()
+        target.connection.engine = 'MyISAM'
+        watch.reload(target, [('table', 'rental')])
+        target.selected._options = self.source.selected.options
+        target.selected._views = self.source.selected.views
+        target.selected._triggers = self.source.selected.triggers
+        target.selected._procedures = self.source.selected.procedures
+
+        watcher = watch.Watcher(self.source, target, OPTIONS)
+        events = watcher.start()
+        self.assertEqual([('drift', 'table_option')],
+                         [(e['event'], e['records'][0]['kind']) for e in events])
+
+        # markers unchanged: nothing is loaded
+        del target.connection.queries[:]
+        self.assertEqual([], watcher.poll())
+        self.assertEqual([watch.SQL_MARKERS], [q[0] for q in target.connection.queries])
+
+        # the table was altered back to InnoDB
+        target.connection.marker = 'm2'
+        target.connection.engine = 'InnoDB'
+        del target.connection.queries[:]
+        events = watcher.poll()
+        self.assertEqual([('resolved', 'table', 'rental')],
+                         [(e['event'], e['kind'], e['name']) for e in events])
+        tables_query = [q for q in target.connection.queries
+                        if q[0] != watch.SQL_MARKERS and 'TABLES' in q[0]][0]
+        self.assertTrue("LOWER(TABLE_NAME) REGEXP %s" in tables_query[0])
+        self.assertEqual(['rental'], list(target.selected.tables.keys()))
+        self.assertEqual({}, watcher.drift)
+
+    def test_index_change_marker(self):
+        """Test: the table markers cover the indexes and column types, an
+           index-only change (same CREATE_TIME) reloads the table"""
+        self.assertTrue('information_schema.STATISTICS' in watch.SQL_MARKERS)
+        self.assertTrue('QUOTE(COLUMN_TYPE)' in watch.SQL_MARKERS)
+
+        target = FakeInstance()
+        watch.reload(target, [('table', 'rental')])
+        previous = watch.markers(target)
+        target.connection.marker = '2020-01-01 00:00:00||d2'
+        self.assertEqual(set([('table', 'rental')]),
+                         watch.changes(previous, watch.markers(target)))
+
+    def test_statistics_cache(self):
+        """Test: the 8.0 statistics cache is disabled at start and after a reconnect"""
+        source = FakeInstance('8.0.21')
+        target = FakeInstance('8.0.21')
+        for instance in (source, target):
+            watch.reload(instance, [('table', 'rental')])
+            instance.selected._options = self.source.selected.options
+            instance.selected._views = OrderedDict()
+            instance.selected._triggers = OrderedDict()
+            instance.selected._procedures = OrderedDict()
+        target.connection._db = FakeDriver()
+        watcher = watch.Watcher(source, target, OPTIONS)
+        watcher.start()
+        queries = [q[0] for q in target.connection.queries]
+        self.assertTrue(queries.index(fingerprint.SQL_STATS_EXPIRY) < queries.index(watch.SQL_MARKERS))
+
+        # same session: the markers only
+        del target.connection.queries[:]
+        watcher.poll()
+        self.assertEqual([watch.SQL_MARKERS], [q[0] for q in target.connection.queries])
+
+        # a new session after the reconnect
+        target.connection._db.closed = True
+        del target.connection.queries[:]
+        watcher.poll()
+        self.assertEqual([fingerprint.SQL_STATS_EXPIRY, fingerprint.SQL_GROUP_CONCAT_MAX_LEN,
+                          watch.SQL_MARKERS], [q[0] for q in target.connection.queries])
+
+    def test_event_log(self):
+        """Test: events are appended to an NDJSON file"""
+        del self.target.selected.tables['rental'].columns['staff_id']
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'events.json')
+            watcher = watch.Watcher(self.source, self.target, OPTIONS,
+                                    sinks=[watch.LogSink(filename)])
+            watcher.run(0, polls=2, sleep=lambda seconds: None)
+            events = [json.loads(line) for line in open(filename)]
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(['drift'], [e['event'] for e in events])
+        self.assertEqual('staff_id', events[0]['records'][0]['name'])
+
+if __name__ == "__main__":
+    unittest.main()